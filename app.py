@@ -3,9 +3,12 @@ AI Interview Coach Backend
 A Flask application providing audio transcription, AI analysis, and progress tracking
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import os
+import json
+import math
+import tempfile
 from dotenv import load_dotenv
 import logging
 from datetime import datetime
@@ -13,11 +16,17 @@ from datetime import datetime
 # Import our custom modules
 from services.transcription_service import TranscriptionService
 from services.analysis_service import AnalysisService
+from services.follow_up_pool import FollowUpPool
 from services.database_service import DatabaseService
 from services.auth_service import AuthService
 from services.notification_service import NotificationService
-from utils.validators import validate_audio_file, validate_text_input
+from services.job_service import create_job_service, public_job, JobQueueFullError
+from services.usage_ledger import configure_usage_ledger, usage_context, summarize_usage
+from config import Config
+from utils.validators import validate_audio_file, validate_text_input, validate_callback_url
 from utils.error_handlers import register_error_handlers
+from utils.metrics import metrics
+from utils.quota import QuotaExceededError
 
 # Load environment variables
 load_dotenv()
@@ -32,21 +41,71 @@ logger = logging.getLogger(__name__)
 
 # Initialize services
 transcription_service = TranscriptionService()
-analysis_service = AnalysisService()
 database_service = DatabaseService()
+configure_usage_ledger(database_service.save_usage_records)
+analysis_service = AnalysisService(
+    follow_up_pool=FollowUpPool(
+        database_service.get_follow_up_pool,
+        refresh_seconds=Config.FOLLOW_UP_POOL_REFRESH_SECONDS,
+        min_score=Config.FOLLOW_UP_POOL_MIN_SCORE,
+        min_overlap=Config.FOLLOW_UP_POOL_MIN_OVERLAP
+    ) if Config.FOLLOW_UP_POOL_ENABLED else None
+)
 auth_service = AuthService()
 notification_service = NotificationService()
+job_service = create_job_service(
+    max_workers=Config.JOB_MAX_WORKERS,
+    store_path=Config.JOB_STORE_PATH,
+    ttl=Config.JOB_TTL_SECONDS,
+    callback_timeout=Config.JOB_CALLBACK_TIMEOUT_SECONDS,
+    callback_secret=Config.JOB_CALLBACK_SECRET,
+    callback_allowed_hosts=Config.JOB_CALLBACK_ALLOWED_HOSTS,
+    max_queued=Config.JOB_MAX_QUEUED
+)
 
 # Register error handlers
 register_error_handlers(app)
 
+# Long-form answers are analyzed in chunks; streaming and provisional scoring keep the 5,000 character cap
+MAX_ANSWER_CHARS = Config.LONG_FORM_MAX_CHARS if Config.LONG_FORM_ENABLED else 5000
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """
+    Health check endpoint
+    
+    Reports 'degraded' (still with 200, since local scores are served) while
+    the OpenAI circuit breaker of this worker is open or probing.
+    """
+    circuit = analysis_service.circuit_stats()
     return jsonify({
-        'status': 'healthy',
+        'status': 'healthy' if circuit.get('state', 'closed') == 'closed' else 'degraded',
         'timestamp': datetime.utcnow().isoformat(),
-        'version': '1.0.0'
+        'version': '1.0.0',
+        'circuit_breaker': circuit
+    }), 200
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Get in-process service metrics
+    
+    Returns:
+    - counters: object of counter values (calls, token usage)
+    - gauges: object of point-in-time values
+    - timings: object of latency summaries (count, mean, p50, p95, p99)
+    - models: recent p95 latency and parse success per routed model
+    - follow_up_pool: questions and candidates in the precomputed follow-up pool
+    - near_duplicates: hits, misses and size of the near-duplicate answer index
+    - circuit_breaker: state and window failure / slow-call rates of the OpenAI circuit
+    """
+    return jsonify({
+        'success': True,
+        'metrics': metrics.snapshot(),
+        'models': analysis_service.model_stats(),
+        'follow_up_pool': analysis_service.follow_up_pool_stats(),
+        'near_duplicates': analysis_service.near_duplicate_stats(),
+        'circuit_breaker': analysis_service.circuit_stats()
     }), 200
 
 @app.route('/transcribe', methods=['POST'])
@@ -82,18 +141,15 @@ def transcribe_audio():
                 return jsonify({'error': 'Invalid authentication'}), 401
         
         # Transcribe audio
-        result = transcription_service.transcribe(audio_file)
+        with usage_context(user_id):
+            result = transcription_service.transcribe(audio_file)
         
         logger.info(f"Audio transcribed successfully for user: {user_id}")
         
-        return jsonify({
-            'success': True,
-            'transcription': result['text'],
-            'duration': result['duration'],
-            'confidence': result.get('confidence', 0.95),
-            'timestamp': datetime.utcnow().isoformat()
-        }), 200
+        return jsonify(build_transcription_result(result)), 200
         
+    except QuotaExceededError:
+        raise  # Answered with 429 and Retry-After by the error handlers
     except Exception as e:
         logger.error(f"Transcription error: {str(e)}")
         return jsonify({'error': 'Transcription failed', 'details': str(e)}), 500
@@ -105,7 +161,7 @@ def analyze_response():
     
     Expected JSON:
     {
-        "text": "user's interview response",
+        "text": "user's interview response (long-form answers up to LONG_FORM_MAX_CHARS are analyzed in chunks)",
         "question": "original interview question",
         "user_id": "user123",
         "category": "behavioral|technical|general"
@@ -116,6 +172,55 @@ def analyze_response():
     - detailed_feedback: object with scores and comments
     - follow_up_question: string
     - improvement_suggestions: array of strings
+    - revision: object (only when a recent answer by the same user to the same
+      question was re-scored from the edits: changed_ratio, rescored_dimensions,
+      reused_dimensions, previous_session_id)
+    """
+    try:
+        data = request.get_json()
+        
+        # Validate input
+        if not validate_text_input(data, max_length=MAX_ANSWER_CHARS):
+            return jsonify({'error': 'Invalid input data'}), 400
+        
+        text = data['text']
+        question = data.get('question', '')
+        user_id = data.get('user_id')
+        category = data.get('category', 'general')
+        
+        # Optional: Validate user authentication
+        if user_id:
+            auth_header = request.headers.get('Authorization')
+            if not auth_service.verify_token(auth_header, user_id):
+                return jsonify({'error': 'Invalid authentication'}), 401
+        
+        result = run_analysis(text, question, category, user_id)
+        
+        logger.info(f"Analysis completed for user: {user_id}")
+        
+        return jsonify(result), 200
+        
+    except QuotaExceededError:
+        raise  # Answered with 429 and Retry-After by the error handlers
+    except Exception as e:
+        logger.error(f"Analysis error: {str(e)}")
+        return jsonify({'error': 'Analysis failed', 'details': str(e)}), 500
+
+@app.route('/analyze/stream', methods=['POST'])
+def analyze_response_stream():
+    """
+    Analyze interview response, streaming partial results as Server-Sent Events
+    
+    Expected JSON: same as /analyze
+    
+    Events (in order):
+    - filler_words: locally computed filler word analysis, sent immediately
+    - provisional: locally computed provisional scores, sent immediately
+    - score: one dimension score as soon as its JSON is complete
+    - feedback: strengths, areas for improvement or suggestions
+    - follow_up_token: next token of the follow-up question
+    - complete: same payload as /analyze
+    - error: analysis failed after the stream started (with retry_after when the OpenAI quota is exhausted)
     """
     try:
         data = request.get_json()
@@ -135,48 +240,429 @@ def analyze_response():
             if not auth_service.verify_token(auth_header, user_id):
                 return jsonify({'error': 'Invalid authentication'}), 401
         
-        # Analyze response
-        analysis_result = analysis_service.analyze_interview_response(
-            text=text,
-            question=question,
-            category=category
-        )
+    except Exception as e:
+        logger.error(f"Streaming analysis error: {str(e)}")
+        return jsonify({'error': 'Analysis failed', 'details': str(e)}), 500
+    
+    def generate():
+        try:
+            with usage_context(user_id):
+                for event, payload in analysis_service.stream_analysis(text=text, question=question, category=category):
+                    if event == 'complete':
+                        payload = build_analysis_result(payload)
+                        if user_id:
+                            save_analysis_session(user_id, question, text, category, payload)
+                        logger.info(f"Streaming analysis completed for user: {user_id}")
+                    yield format_sse(event, payload)
+        except QuotaExceededError as e:
+            logger.warning(f"Streaming analysis rejected: {str(e)}")
+            yield format_sse('error', {'error': 'Rate Limit Exceeded', 'details': str(e), 'retry_after': round(e.retry_after, 1)})
+        except Exception as e:
+            logger.error(f"Streaming analysis error: {str(e)}")
+            yield format_sse('error', {'error': 'Analysis failed', 'details': str(e)})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/analyze/provisional', methods=['POST'])
+def analyze_response_provisional():
+    """
+    Score interview response locally, without waiting for GPT-4
+    
+    Expected JSON: same as /analyze
+    
+    Returns (in a few milliseconds):
+    - overall_score: float (0-10)
+    - detailed_feedback: object with provisional scores and comments
+    - improvement_suggestions: array of strings
+    - provisional: true
+    """
+    try:
+        data = request.get_json()
         
-        # Generate follow-up question
-        follow_up = analysis_service.generate_follow_up_question(
-            original_question=question,
-            user_response=text,
-            category=category
+        # Validate input
+        if not validate_text_input(data):
+            return jsonify({'error': 'Invalid input data'}), 400
+        
+        result = analysis_service.provisional_analysis(
+            text=data['text'],
+            question=data.get('question', ''),
+            category=data.get('category', 'general')
         )
         
-        result = {
+        return jsonify({
             'success': True,
-            'overall_score': analysis_result['overall_score'],
-            'detailed_feedback': analysis_result['detailed_feedback'],
-            'follow_up_question': follow_up,
-            'improvement_suggestions': analysis_result['suggestions'],
+            'overall_score': result['overall_score'],
+            'detailed_feedback': result['detailed_feedback'],
+            'improvement_suggestions': result['suggestions'],
+            'provisional': True,
             'timestamp': datetime.utcnow().isoformat()
-        }
+        }), 200
         
-        # Save to database if user_id provided
+    except Exception as e:
+        logger.error(f"Provisional analysis error: {str(e)}")
+        return jsonify({'error': 'Analysis failed', 'details': str(e)}), 500
+
+@app.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """
+    Analyze a batch of interview responses with bounded concurrency
+    
+    Expected JSON:
+    {
+        "items": [{"text": "...", "question": "...", "category": "..."}, ...],
+        "user_id": "user123" (optional, results are saved as sessions),
+        "concurrency": 4 (optional, capped by BATCH_MAX_CONCURRENCY),
+        "stream": false (optional, stream results as Server-Sent Events)
+    }
+    
+    Returns:
+    - results: array in request order, each either an /analyze payload
+      or {"success": false, "error": "..."}
+    - succeeded: int
+    - failed: int
+    
+    When streaming, each finished item is sent as a 'result' event (with its
+    index) in completion order, followed by a 'complete' event with counts.
+    """
+    try:
+        data = request.get_json()
+        items = data.get('items') if isinstance(data, dict) else None
+        
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'items must be a non-empty list'}), 400
+        
+        if len(items) > Config.BATCH_MAX_ITEMS:
+            return jsonify({'error': f'At most {Config.BATCH_MAX_ITEMS} items are allowed per batch'}), 400
+        
+        user_id = data.get('user_id')
+        concurrency = data.get('concurrency')
+        if concurrency is not None and (not isinstance(concurrency, int) or concurrency < 1):
+            return jsonify({'error': 'concurrency must be a positive integer'}), 400
+        
+        # Optional: Validate user authentication
         if user_id:
-            session_data = {
-                'user_id': user_id,
-                'question': question,
-                'response': text,
-                'category': category,
-                'analysis': result,
-                'timestamp': datetime.utcnow()
-            }
-            database_service.save_session(session_data)
+            auth_header = request.headers.get('Authorization')
+            if not auth_service.verify_token(auth_header, user_id):
+                return jsonify({'error': 'Invalid authentication'}), 401
         
-        logger.info(f"Analysis completed for user: {user_id}")
+    except Exception as e:
+        logger.error(f"Batch analysis error: {str(e)}")
+        return jsonify({'error': 'Batch analysis failed', 'details': str(e)}), 500
+    
+    # Invalid items are reported individually instead of failing the batch
+    valid_items = {}
+    results = [None] * len(items)
+    for index, item in enumerate(items):
+        if validate_text_input(item, max_length=MAX_ANSWER_CHARS):
+            valid_items[index] = item
+        else:
+            results[index] = {'index': index, 'success': False, 'error': 'Invalid input data'}
+    
+    def run_batch():
+        indices = list(valid_items)
+        batch = [valid_items[index] for index in indices]
+        
+        with usage_context(user_id):
+            for position, analysis_result in analysis_service.analyze_batch(batch, concurrency):
+                index = indices[position]
+                item = valid_items[index]
+                
+                if 'error' in analysis_result:
+                    result = {'index': index, 'success': False, 'error': analysis_result['error']}
+                else:
+                    result = dict(build_analysis_result(analysis_result), index=index)
+                    if user_id:
+                        try:
+                            save_analysis_session(user_id, item.get('question', ''), item['text'],
+                                                  item.get('category', 'general'), result)
+                        except Exception as e:
+                            logger.error(f"Failed to save batch session {index}: {str(e)}")
+                
+                results[index] = result
+                yield result
+    
+    def summary():
+        succeeded = sum(1 for result in results if result and result['success'])
+        return {'success': True, 'succeeded': succeeded, 'failed': len(results) - succeeded}
+    
+    if data.get('stream'):
+        def generate():
+            for result in results:
+                if result is not None:
+                    yield format_sse('result', result)
+            try:
+                for result in run_batch():
+                    yield format_sse('result', result)
+            except Exception as e:
+                logger.error(f"Batch analysis error: {str(e)}")
+                yield format_sse('error', {'error': 'Batch analysis failed', 'details': str(e)})
+                return
+            yield format_sse('complete', summary())
+        
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+    
+    try:
+        for _ in run_batch():
+            pass
         
-        return jsonify(result), 200
+        logger.info(f"Batch analysis completed: {len(items)} items")
+        return jsonify(dict(summary(), results=results)), 200
         
     except Exception as e:
-        logger.error(f"Analysis error: {str(e)}")
-        return jsonify({'error': 'Analysis failed', 'details': str(e)}), 500
+        logger.error(f"Batch analysis error: {str(e)}")
+        return jsonify({'error': 'Batch analysis failed', 'details': str(e)}), 500
+
+@app.route('/jobs/analyze', methods=['POST'])
+def submit_analysis_job():
+    """
+    Queue an analysis in the background and return immediately
+    
+    Expected JSON: same as /analyze, plus
+    - callback_url: string (optional, receives the finished job as a POST)
+    
+    Returns (202):
+    - job_id: string
+    - status: 'queued'
+    - status_url: URL to poll for the result
+    
+    Returns 503 with Retry-After while too many jobs are queued.
+    """
+    try:
+        data = request.get_json()
+        
+        # Validate input
+        if not validate_text_input(data, max_length=MAX_ANSWER_CHARS):
+            return jsonify({'error': 'Invalid input data'}), 400
+        
+        callback_url = data.get('callback_url')
+        if callback_url is not None and not validate_callback_url(callback_url, job_service.callback_allowed_hosts):
+            return jsonify({'error': 'Invalid callback_url'}), 400
+        
+        user_id = data.get('user_id')
+        
+        # Optional: Validate user authentication
+        if user_id:
+            auth_header = request.headers.get('Authorization')
+            if not auth_service.verify_token(auth_header, user_id):
+                return jsonify({'error': 'Invalid authentication'}), 401
+        
+        job = job_service.submit(
+            'analyze', run_analysis,
+            data['text'], data.get('question', ''), data.get('category', 'general'), user_id,
+            user_id=user_id,
+            callback_url=callback_url
+        )
+        
+        return job_accepted_response(job)
+        
+    except JobQueueFullError as e:
+        return job_queue_full_response(e)
+    except Exception as e:
+        logger.error(f"Analysis job error: {str(e)}")
+        return jsonify({'error': 'Failed to queue analysis', 'details': str(e)}), 500
+
+@app.route('/jobs/transcribe', methods=['POST'])
+def submit_transcription_job():
+    """
+    Queue a transcription in the background and return immediately
+    
+    Expected form data: same as /transcribe, plus
+    - callback_url: string (optional, receives the finished job as a POST)
+    
+    Returns (202):
+    - job_id: string
+    - status: 'queued'
+    - status_url: URL to poll for the result
+    
+    Returns 503 with Retry-After while too many jobs are queued.
+    """
+    try:
+        # Validate request
+        if 'audio' not in request.files:
+            return jsonify({'error': 'No audio file provided'}), 400
+        
+        audio_file = request.files['audio']
+        user_id = request.form.get('user_id')
+        callback_url = request.form.get('callback_url')
+        
+        # Validate audio file
+        if not validate_audio_file(audio_file):
+            return jsonify({'error': 'Invalid audio file format'}), 400
+        
+        if callback_url is not None and not validate_callback_url(callback_url, job_service.callback_allowed_hosts):
+            return jsonify({'error': 'Invalid callback_url'}), 400
+        
+        # Optional: Validate user authentication
+        if user_id:
+            auth_header = request.headers.get('Authorization')
+            if not auth_service.verify_token(auth_header, user_id):
+                return jsonify({'error': 'Invalid authentication'}), 401
+        
+        # The upload stream closes with the request, so keep a copy for the worker
+        os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=Config.UPLOAD_FOLDER, suffix='.wav', delete=False) as temp_file:
+            audio_file.save(temp_file)
+        
+        try:
+            job = job_service.submit(
+                'transcribe', run_transcription, temp_file.name, user_id,
+                user_id=user_id,
+                callback_url=callback_url,
+                cleanup=lambda: os.unlink(temp_file.name)
+            )
+        except Exception:
+            # The job never ran, so its cleanup never will
+            os.unlink(temp_file.name)
+            raise
+        
+        return job_accepted_response(job)
+        
+    except JobQueueFullError as e:
+        return job_queue_full_response(e)
+    except Exception as e:
+        logger.error(f"Transcription job error: {str(e)}")
+        return jsonify({'error': 'Failed to queue transcription', 'details': str(e)}), 500
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Poll a background job
+    
+    Query parameters:
+    - user_id: string (required for jobs submitted with a user_id)
+    
+    Returns:
+    - job_id, kind, status ('queued', 'running', 'succeeded', 'failed')
+    - result: /analyze or /transcribe payload once succeeded
+    - error: string once failed
+    """
+    try:
+        job = job_service.get(job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        if job['user_id']:
+            user_id = request.args.get('user_id')
+            auth_header = request.headers.get('Authorization')
+            if user_id != job['user_id'] or not auth_service.verify_token(auth_header, user_id):
+                return jsonify({'error': 'Invalid authentication'}), 401
+        
+        return jsonify(dict(public_job(job), success=True)), 200
+        
+    except Exception as e:
+        logger.error(f"Error getting job {job_id}: {str(e)}")
+        return jsonify({'error': 'Failed to get job', 'details': str(e)}), 500
+
+def run_analysis(text, question, category, user_id=None):
+    """Analyze a response, save it as a session if user_id is set and return the /analyze payload"""
+    # Analyze response and generate follow-up question concurrently
+    with usage_context(user_id):
+        analysis_result = analysis_service.analyze_with_follow_up(
+            text=text,
+            question=question,
+            category=category,
+            previous=find_previous_attempt(user_id, question)
+        )
+    
+    result = build_analysis_result(analysis_result)
+    
+    # Save to database if user_id provided
+    if user_id:
+        save_analysis_session(user_id, question, text, category, result)
+    
+    return result
+
+def find_previous_attempt(user_id, question):
+    """Latest recent session of the user for the same question, used to re-score a revised answer"""
+    if not user_id or not question or not Config.REVISION_MODE_ENABLED:
+        return None
+    try:
+        return database_service.get_latest_session_for_question(
+            user_id, question, max_age_hours=Config.REVISION_MAX_AGE_HOURS
+        )
+    except Exception as e:
+        logger.warning(f"Previous attempt lookup failed, analyzing from scratch: {str(e)}")
+        return None
+
+def run_transcription(audio_path, user_id=None):
+    """Transcribe an audio file on disk and return the /transcribe payload"""
+    with usage_context(user_id):
+        return build_transcription_result(transcription_service.transcribe_path(audio_path))
+
+def job_accepted_response(job):
+    """Build the 202 response for a queued job"""
+    status_url = f"/jobs/{job['id']}"
+    response = jsonify({
+        'success': True,
+        'job_id': job['id'],
+        'status': job['status'],
+        'status_url': status_url
+    })
+    response.headers['Location'] = status_url
+    return response, 202
+
+def job_queue_full_response(error):
+    """Build the 503 response for a job refused because the queue is full"""
+    logger.warning(f"Job queue full: {str(error)}")
+    retry_after = max(1, math.ceil(error.retry_after))
+    response = jsonify({
+        'error': 'Service Unavailable',
+        'message': 'Too many jobs are queued. Please try again shortly',
+        'retry_after': retry_after,
+        'status_code': 503
+    })
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 503
+
+def build_transcription_result(result):
+    """Build the /transcribe response payload from a TranscriptionService result"""
+    return {
+        'success': True,
+        'transcription': result['text'],
+        'duration': result['duration'],
+        'confidence': result.get('confidence', 0.95),
+        'timestamp': datetime.utcnow().isoformat()
+    }
+
+def build_analysis_result(analysis_result):
+    """Build the /analyze response payload from an AnalysisService result"""
+    result = {
+        'success': True,
+        'overall_score': analysis_result['overall_score'],
+        'detailed_feedback': analysis_result['detailed_feedback'],
+        'follow_up_question': analysis_result['follow_up_question'],
+        'improvement_suggestions': analysis_result['suggestions'],
+        'usage': analysis_result['usage'],
+        'provisional': analysis_result.get('provisional', False),
+        'timestamp': datetime.utcnow().isoformat()
+    }
+    if 'revision' in analysis_result:
+        result['revision'] = analysis_result['revision']
+    return result
+
+def save_analysis_session(user_id, question, text, category, result):
+    """Save an analyzed practice session to the database"""
+    session_data = {
+        'user_id': user_id,
+        'question': question,
+        'response': text,
+        'category': category,
+        'analysis': result,
+        'timestamp': datetime.utcnow()
+    }
+    return database_service.save_session(session_data)
+
+def format_sse(event, data):
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 @app.route('/sessions', methods=['GET'])
 def get_user_sessions():
@@ -301,6 +787,43 @@ def get_user_stats():
         logger.error(f"Get stats error: {str(e)}")
         return jsonify({'error': 'Failed to fetch statistics', 'details': str(e)}), 500
 
+@app.route('/usage', methods=['GET'])
+def get_user_usage():
+    """
+    Get user's OpenAI usage: tokens, audio seconds and upstream latency
+    
+    Query parameters:
+    - user_id: string (required)
+    - days: int (optional, 1-90, default 7)
+    
+    Returns (records reach Firestore within USAGE_LEDGER_FLUSH_SECONDS):
+    - total: calls, cached (served without a call), errors, prompt_tokens,
+      completion_tokens, audio_seconds, latency_ms
+    - by_day: array of the same totals per UTC day, with 'date'
+    - by_stage: object of the same totals per stage (analysis, follow_up, transcription, ...)
+    """
+    try:
+        user_id = request.args.get('user_id')
+        if not user_id:
+            return jsonify({'error': 'user_id is required'}), 400
+        
+        # Validate authentication
+        auth_header = request.headers.get('Authorization')
+        if not auth_service.verify_token(auth_header, user_id):
+            return jsonify({'error': 'Invalid authentication'}), 401
+        
+        days = request.args.get('days', 7, type=int)
+        if not 1 <= days <= 90:
+            return jsonify({'error': 'days must be between 1 and 90'}), 400
+        
+        records = database_service.get_usage_records(user_id, days)
+        
+        return jsonify(dict(summarize_usage(records), success=True, days=days)), 200
+        
+    except Exception as e:
+        logger.error(f"Get usage error: {str(e)}")
+        return jsonify({'error': 'Failed to fetch usage', 'details': str(e)}), 500
+
 @app.route('/questions', methods=['GET'])
 def get_practice_questions():
     """
@@ -0,0 +1,178 @@
+"""
+Micro-benchmarks for the AnalysisService and DatabaseService hot paths
+
+Covers filler word analysis, analysis response parsing, overall score
+calculation, Firestore document conversion of deep session documents and
+the statistics aggregation behind /stats over synthetic histories.
+Reports ops/sec and memory per case and compares them with a stored
+baseline; the exit status is 1 if any case regressed by more than the
+threshold. Throughput baselines are machine-specific: the baseline is not
+kept in the repo, and throughput is only compared with one recorded on
+the same host.
+
+Usage:
+    python benchmarks/bench_hot_paths.py [--filter user_statistics] [--threshold 0.3]
+        [--save-baseline] [--baseline benchmarks/baseline.json] [--min-time 0.2]
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from harness import measure, load_baseline, save_baseline, compare, print_results, same_host_as
+from bench_filler_words import make_answer
+from services.analysis_schema import SCORE_DIMENSIONS
+from services.analysis_service import AnalysisService
+from services.database_service import DatabaseService, summarize_sessions
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+HISTORY_SIZES = (10, 1000, 100000)
+
+CATEGORIES = ('general', 'behavioral', 'technical')
+
+def make_analysis(rng: random.Random) -> Dict[str, Any]:
+    """A complete analysis result as returned by the model"""
+    analysis = {
+        dimension: {'score': rng.randint(3, 10), 'feedback': 'Specific, well organized and relevant to the question.'}
+        for dimension in SCORE_DIMENSIONS
+    }
+    analysis['strengths'] = ['Clear structure', 'Concrete example']
+    analysis['areas_for_improvement'] = ['Quantify the result', 'Shorter introduction']
+    analysis['suggestions'] = ['Use the STAR method', 'Lead with the outcome', 'Name the tools you used']
+    return analysis
+
+def make_session(rng: random.Random, timestamp: datetime) -> Dict[str, Any]:
+    """A stored practice session with nested analysis, usage and filler breakdown"""
+    analysis = make_analysis(rng)
+    analysis['filler_words'] = {
+        'score': 8,
+        'total_count': 4,
+        'percentage': 1.9,
+        'breakdown': {'um': 2, 'like': 1, 'you know': 1},
+        'feedback': 'Good! Minimal filler words.'
+    }
+    return {
+        'user_id': 'user-1',
+        'question': 'Describe a challenging situation you faced and how you handled it.',
+        'response_text': make_answer(1200, seed=rng.randint(0, 1000)),
+        'category': rng.choice(CATEGORIES),
+        'timestamp': timestamp,
+        'analysis': {
+            'overall_score': round(rng.uniform(3, 10), 1),
+            'detailed_feedback': analysis,
+            'follow_up_question': 'What would you do differently next time?',
+            'improvement_suggestions': analysis['suggestions'],
+            'usage': {
+                'mode': 'split',
+                'prompt_tokens': 812,
+                'completion_tokens': 301,
+                'calls': [
+                    {'stage': 'analysis', 'model': 'gpt-4', 'prompt_tokens': 640, 'completion_tokens': 280,
+                     'latency_ms': 5120.4, 'cache': 'miss', 'created_at': timestamp},
+                    {'stage': 'follow_up', 'model': 'gpt-3.5-turbo', 'prompt_tokens': 172, 'completion_tokens': 21,
+                     'latency_ms': 880.1, 'cache': 'miss', 'created_at': timestamp}
+                ]
+            }
+        }
+    }
+
+def make_history(count: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """Sessions spread over the last 30 days, oldest first (the order the stats query returns)"""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    step = timedelta(days=30) / count
+    return [
+        {
+            'category': rng.choice(CATEGORIES),
+            'timestamp': now - timedelta(days=30) + step * i,
+            'analysis': {'overall_score': round(rng.uniform(3, 10), 1)}
+        }
+        for i in range(count)
+    ]
+
+def build_cases() -> Dict[str, Callable[[], Any]]:
+    """Benchmark cases by name"""
+    rng = random.Random(42)
+    analysis_service = AnalysisService()
+    # Only the pure conversion helpers are exercised, so no Firestore connection is made
+    database_service = DatabaseService.__new__(DatabaseService)
+    
+    short_answer = make_answer(400)
+    long_answer = make_answer(12000)
+    
+    analysis = make_analysis(rng)
+    clean = json.dumps(analysis, indent=2)
+    fenced = f"Here is the analysis:\n```json\n{clean}\n```"
+    truncated = clean[:int(len(clean) * 0.7)]
+    unparseable = "I'm sorry, I can't produce a score for this response. " * 5
+    detailed_feedback = analysis_service._parse_analysis_response(clean)['detailed_feedback']
+    
+    session = make_session(rng, datetime.utcnow())
+    now = datetime.utcnow()
+    
+    cases = {
+        'filler_words/short': lambda: analysis_service._analyze_filler_words(short_answer),
+        'filler_words/long': lambda: analysis_service._analyze_filler_words(long_answer),
+        'parse_analysis/clean': lambda: analysis_service._parse_analysis_response(clean),
+        'parse_analysis/fenced': lambda: analysis_service._parse_analysis_response(fenced),
+        'parse_analysis/truncated': lambda: analysis_service._parse_analysis_response(truncated),
+        'parse_analysis/unparseable': lambda: analysis_service._parse_analysis_response(unparseable),
+        'overall_score': lambda: analysis_service._calculate_overall_score(detailed_feedback),
+        'prepare_from_firestore/session': lambda: database_service._prepare_from_firestore(session)
+    }
+    for size in HISTORY_SIZES:
+        history = make_history(size)
+        cases[f"user_statistics/{size}"] = lambda history=history: summarize_sessions(history, 'month', now)
+    return cases
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--filter', default='', help='only run cases whose name contains this text')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.3, help='tolerated slowdown or memory growth (fraction)')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds per timed round')
+    args = parser.parse_args()
+    
+    # Parse failures are logged as warnings; keep the output readable
+    logging.disable(logging.WARNING)
+    
+    cases = {name: fn for name, fn in build_cases().items() if args.filter in name}
+    results = {name: measure(fn, min_time=args.min_time) for name, fn in cases.items()}
+    
+    baseline = load_baseline(args.baseline)
+    print_results(results, baseline)
+    
+    if args.save_baseline:
+        if baseline and same_host_as(baseline):
+            # Keep cases that were filtered out of this run
+            results = dict(baseline['results'], **results)
+        save_baseline(args.baseline, results)
+        print(f"\nBaseline saved to {args.baseline}")
+        return
+    
+    if baseline is None:
+        print("\nNo baseline yet; run with --save-baseline to record one")
+        return
+    
+    if not same_host_as(baseline):
+        print(f"\nBaseline recorded on {baseline.get('host', 'another host')}; only memory is compared")
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"\nNo regressions above {args.threshold:.0%}")
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,424 @@
+"""
+Offline evaluation of the analysis prompts and model against a fixed answer corpus
+
+Replays a JSONL corpus of interview answers (one object per line with
+'id', 'question', 'answer' and 'category') through
+AnalysisService.analyze_interview_response with bounded concurrency and
+reports latency percentiles, token usage, the parse failure rate and the
+mean score per dimension. Each result is appended to a checkpoint file
+as soon as it finishes, so an interrupted run resumes where it stopped;
+items that failed are retried. The checkpoint is named after the corpus,
+model, backend and a hash of the prompt templates, so a prompt edit
+always starts a new run.
+
+Scores are compared item by item with a stored baseline, and the exit
+status is 1 if there is no baseline, any item failed, a dimension's mean
+score drifted by more than --max-drift, or the parse failure rate or p95
+latency regressed. Caching is disabled, so every item reaches the model.
+
+With --fake the calls go to scripts/fake_openai_server.py served in
+process, for fast CI-style checks of latency and the parsing pipeline.
+Its scores are derived from a hash of the prompt, so in that mode scores
+only drift when the prompts change. Fake runs are compared with their own
+baseline, benchmarks/eval_baseline_fake.json, which is kept in the repo
+and must be re-recorded (--fake --save-baseline) with any prompt change.
+
+Usage:
+    python benchmarks/evaluate.py [--corpus benchmarks/eval_corpus.jsonl] [--model gpt-4]
+        [--concurrency 4] [--fresh] [--save-baseline] [--baseline benchmarks/eval_baseline.json]
+        [--max-drift 0.5] [--fake] [--fake-latency fixed:50]
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from config import Config
+from services import prompt_builder
+from services.analysis_schema import SCORE_DIMENSIONS
+from services.analysis_service import AnalysisService, PROMPT_VERSION
+from services.model_router import ModelRouter
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'eval_corpus.jsonl')
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'eval_baseline.json')
+DEFAULT_FAKE_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'eval_baseline_fake.json')
+CHECKPOINT_DIR = os.path.join('temp_uploads', 'eval')
+
+# Score dimensions compared with the baseline, plus the overall score
+DRIFT_DIMENSIONS = SCORE_DIMENSIONS + ['overall']
+
+# Change of an item's score (in points) counted as a changed verdict
+CHANGED_SCORE = 2
+
+def load_corpus(path: str) -> List[Dict[str, Any]]:
+    """Load and check the evaluation corpus"""
+    items = []
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if not item.get('answer') or not item.get('question'):
+                raise ValueError(f"{path}:{number}: every item needs a 'question' and an 'answer'")
+            item.setdefault('category', 'general')
+            item.setdefault('id', hashlib.sha256(f"{item['question']}\n{item['answer']}".encode('utf-8')).hexdigest()[:12])
+            items.append(item)
+    
+    duplicates = [item_id for item_id, count in Counter(item['id'] for item in items).items() if count > 1]
+    if duplicates:
+        raise ValueError(f"{path}: duplicate item ids: {', '.join(duplicates)}")
+    return items
+
+def prompt_fingerprint() -> str:
+    """Short hash of the prompt version and every prompt template"""
+    templates = sorted(
+        (name, value) for name, value in vars(prompt_builder).items()
+        if name.endswith(('_PROMPT', '_ADDENDUM')) and isinstance(value, str)
+    )
+    return hashlib.sha256(json.dumps([PROMPT_VERSION, templates]).encode('utf-8')).hexdigest()[:10]
+
+def start_fake_server(latency: str, error_rate: float) -> str:
+    """Serve the fake OpenAI API from a background thread and return its base URL"""
+    from werkzeug.serving import make_server
+    from scripts.fake_openai_server import DEFAULT_SETTINGS, FakeOpenAI, create_app
+    
+    fake = FakeOpenAI(dict(DEFAULT_SETTINGS, latency=latency, error_rate=error_rate))
+    server = make_server('127.0.0.1', 0, create_app(fake), threaded=True)
+    threading.Thread(target=server.serve_forever, name='fake-openai', daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/v1"
+
+def evaluate_item(analysis_service: AnalysisService, item: Dict[str, Any]) -> Dict[str, Any]:
+    """Analyze one corpus item and record its latency, usage and scores (or its error)"""
+    record = {'id': item['id'], 'category': item['category']}
+    started = time.monotonic()
+    try:
+        result = analysis_service.analyze_interview_response(item['answer'], item['question'], item['category'])
+    except Exception as e:
+        record['error'] = f"{type(e).__name__}: {str(e)}"
+        record['latency_ms'] = round((time.monotonic() - started) * 1000, 1)
+        return record
+    
+    usage = result.get('usage') or {}
+    feedback = result['detailed_feedback']
+    record.update({
+        'latency_ms': round((time.monotonic() - started) * 1000, 1),
+        'model': usage.get('model'),
+        'prompt_tokens': usage.get('prompt_tokens', 0),
+        'completion_tokens': usage.get('completion_tokens', 0),
+        # Unparseable responses are scored locally; repaired ones have some dimensions scored locally
+        'parse_failed': bool(result.get('fallback')),
+        'provisional': bool(result.get('provisional')),
+        'scores': {dimension: feedback[dimension]['score'] for dimension in SCORE_DIMENSIONS if dimension in feedback},
+        'overall_score': result['overall_score']
+    })
+    return record
+
+def load_checkpoint(path: str) -> Dict[str, Dict[str, Any]]:
+    """Records of an earlier run by item id (the last record of an item wins)"""
+    records = {}
+    if not os.path.exists(path):
+        return records
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Line cut off by an interruption
+            records[record['id']] = record
+    return records
+
+def open_checkpoint(path: str):
+    """Open the checkpoint for appending, ending a line cut off by an interruption first"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    out = open(path, 'a+')
+    if out.tell():
+        out.seek(out.tell() - 1)
+        if out.read(1) != '\n':
+            out.write('\n')
+    return out
+
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+def summarize(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Aggregate latency, token usage, parse failures and scores of a run"""
+    scored = [record for record in records if 'error' not in record]
+    latencies = [record['latency_ms'] for record in scored]
+    
+    mean_scores = {}
+    for dimension in DRIFT_DIMENSIONS:
+        values = [
+            record['overall_score'] if dimension == 'overall' else record['scores'].get(dimension)
+            for record in scored
+        ]
+        values = [value for value in values if value is not None]
+        if values:
+            mean_scores[dimension] = round(sum(values) / len(values), 2)
+    
+    return {
+        'items': len(records),
+        'errors': len(records) - len(scored),
+        'parse_failure_rate': round(sum(record['parse_failed'] for record in scored) / len(scored), 3) if scored else 0.0,
+        'provisional_rate': round(sum(record['provisional'] for record in scored) / len(scored), 3) if scored else 0.0,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 1),
+            'p95': round(percentile(latencies, 95), 1),
+            'p99': round(percentile(latencies, 99), 1),
+            'max': round(max(latencies, default=0), 1)
+        },
+        'prompt_tokens': sum(record['prompt_tokens'] for record in scored),
+        'completion_tokens': sum(record['completion_tokens'] for record in scored),
+        'mean_scores': mean_scores,
+        'models': dict(Counter(record['model'] for record in scored))
+    }
+
+def item_scores(record: Dict[str, Any]) -> Dict[str, float]:
+    """Scores of one item as stored in the baseline"""
+    return dict(record['scores'], overall=record['overall_score'])
+
+def score_drift(records: List[Dict[str, Any]], baseline: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """
+    Per-dimension score change of the items scored in both runs
+    
+    Args:
+        records: Records of the current run
+        baseline: Loaded baseline
+    
+    Returns:
+        Dict of dimension to 'mean' (signed mean change), 'mean_abs' (mean
+        absolute change), 'changed' (items moving CHANGED_SCORE points or
+        more) and 'items' (items compared)
+    """
+    deltas = {dimension: [] for dimension in DRIFT_DIMENSIONS}
+    for record in records:
+        previous = baseline['scores'].get(record['id'])
+        if previous is None or 'error' in record:
+            continue
+        current = item_scores(record)
+        for dimension in DRIFT_DIMENSIONS:
+            if dimension in current and dimension in previous:
+                deltas[dimension].append(current[dimension] - previous[dimension])
+    
+    return {
+        dimension: {
+            'mean': round(sum(values) / len(values), 2),
+            'mean_abs': round(sum(abs(value) for value in values) / len(values), 2),
+            'changed': sum(1 for value in values if abs(value) >= CHANGED_SCORE),
+            'items': len(values)
+        }
+        for dimension, values in deltas.items() if values
+    }
+
+def compare(summary: Dict[str, Any], drift: Dict[str, Dict[str, float]], baseline: Dict[str, Any],
+            run: Dict[str, Any], max_drift: float, max_parse_increase: float,
+            latency_threshold: float) -> List[str]:
+    """
+    Find regressions against a baseline
+    
+    Latency is only compared when both runs used the same backend on the same host.
+    
+    Args:
+        summary: Summary of the current run
+        drift: Output of score_drift
+        baseline: Loaded baseline
+        run: Settings of the current run (backend, host, model, prompt fingerprint)
+        max_drift: Tolerated change of a dimension's mean score, in points
+        max_parse_increase: Tolerated increase of the parse failure rate
+        latency_threshold: Tolerated relative increase of p95 latency
+    
+    Returns:
+        One message per regression
+    """
+    regressions = []
+    for dimension, change in drift.items():
+        if abs(change['mean']) > max_drift:
+            regressions.append(
+                f"{dimension}: mean score moved {change['mean']:+.2f} over {change['items']} items "
+                f"({change['changed']} moved {CHANGED_SCORE}+ points)"
+            )
+    
+    previous = baseline['summary']
+    if summary['parse_failure_rate'] > previous['parse_failure_rate'] + max_parse_increase:
+        regressions.append(
+            f"parse failure rate {summary['parse_failure_rate']:.1%} is above the baseline {previous['parse_failure_rate']:.1%}"
+        )
+    
+    if baseline['run']['backend'] == run['backend'] and baseline['run'].get('host') == run['host']:
+        p95, previous_p95 = summary['latency_ms']['p95'], previous['latency_ms']['p95']
+        if previous_p95 and p95 > previous_p95 * (1 + latency_threshold):
+            regressions.append(f"p95 latency {p95:.0f} ms is {p95 / previous_p95 - 1:.0%} above the baseline {previous_p95:.0f} ms")
+    return regressions
+
+def save_baseline(path: str, records: List[Dict[str, Any]], summary: Dict[str, Any], run: Dict[str, Any]) -> None:
+    """Store a run's summary and per-item scores as the new baseline"""
+    data = {
+        'created_at': datetime.utcnow().isoformat(),
+        'run': run,
+        'summary': summary,
+        'scores': {record['id']: item_scores(record) for record in records}
+    }
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+def print_report(summary: Dict[str, Any], drift: Optional[Dict[str, Dict[str, float]]]) -> None:
+    """Print the run summary and the score drift against the baseline, if any"""
+    latency = summary['latency_ms']
+    scored = summary['items'] - summary['errors']
+    print(f"Items:       {summary['items']} ({summary['errors']} failed)")
+    print(f"Latency ms:  p50 {latency['p50']:.0f}  p95 {latency['p95']:.0f}  p99 {latency['p99']:.0f}  max {latency['max']:.0f}")
+    print(f"Tokens:      {summary['prompt_tokens']} prompt + {summary['completion_tokens']} completion "
+          f"({(summary['prompt_tokens'] + summary['completion_tokens']) / max(scored, 1):.0f} per item)")
+    print(f"Parsing:     {summary['parse_failure_rate']:.1%} failed, {summary['provisional_rate']:.1%} repaired with local scores")
+    print(f"Models:      {summary['models']}")
+    
+    print(f"\n{'dimension':<26} {'mean':>6} {'drift':>7} {'|drift|':>8} {'changed':>8}")
+    for dimension, mean in summary['mean_scores'].items():
+        change = (drift or {}).get(dimension)
+        if change:
+            print(f"{dimension:<26} {mean:>6.2f} {change['mean']:>+7.2f} {change['mean_abs']:>8.2f} "
+                  f"{change['changed']:>3}/{change['items']:<4}")
+        else:
+            print(f"{dimension:<26} {mean:>6.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS)
+    parser.add_argument('--model', default='', help='analyze every item with this model instead of routing')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--checkpoint', default='', help='results file (default: derived from the run settings)')
+    parser.add_argument('--fresh', action='store_true', help='discard the checkpoint instead of resuming')
+    parser.add_argument('--baseline', default='', help='baseline file (default: per backend, in benchmarks/)')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--max-drift', type=float, default=0.5, help='tolerated change of a mean score, in points')
+    parser.add_argument('--max-parse-increase', type=float, default=0.02, help='tolerated parse failure rate increase')
+    parser.add_argument('--latency-threshold', type=float, default=0.2, help='tolerated p95 latency increase (fraction)')
+    parser.add_argument('--fake', action='store_true', help='call an in-process fake OpenAI server')
+    parser.add_argument('--fake-latency', default='fixed:50', help='latency distribution of the fake server')
+    parser.add_argument('--fake-error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+    if not args.baseline:
+        args.baseline = DEFAULT_FAKE_BASELINE if args.fake else DEFAULT_BASELINE
+    
+    # Parse failures and failed items are logged, and counted in the report; keep the output readable
+    logging.disable(logging.ERROR)
+    
+    # Every item must reach the model: cached or near-duplicate results would hide prompt changes
+    Config.CACHE_ENABLED = False
+    Config.NEAR_DUPLICATE_ENABLED = False
+    Config.SINGLE_FLIGHT_ENABLED = False
+    if args.fake:
+        Config.OPENAI_BASE_URL = start_fake_server(args.fake_latency, args.fake_error_rate)
+        Config.USAGE_LEDGER_ENABLED = False
+        os.environ.setdefault('OPENAI_API_KEY', 'fake')
+    
+    analysis_service = AnalysisService()
+    if args.model:
+        analysis_service.router = ModelRouter(
+            fast_model=None,
+            quality_model=args.model,
+            latency_slo_ms=Config.MODEL_LATENCY_SLO_MS
+        )
+    
+    items = load_corpus(args.corpus)
+    run = {
+        'corpus': os.path.basename(args.corpus),
+        'model': args.model or 'routed',
+        'backend': 'fake' if args.fake else 'openai',
+        'host': socket.gethostname(),
+        'prompt_version': PROMPT_VERSION,
+        'prompt_fingerprint': prompt_fingerprint()
+    }
+    checkpoint = args.checkpoint or os.path.join(
+        CHECKPOINT_DIR,
+        f"{os.path.splitext(run['corpus'])[0]}-{run['model']}-{run['backend']}-{run['prompt_fingerprint']}.jsonl"
+    )
+    if args.fresh and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    
+    records = load_checkpoint(checkpoint)
+    pending = [item for item in items if item['id'] not in records or 'error' in records[item['id']]]
+    print(f"Evaluating {len(pending)} of {len(items)} items with {run['model']} on {run['backend']} "
+          f"(prompts {run['prompt_fingerprint']}), concurrency {args.concurrency}")
+    print(f"Checkpoint: {checkpoint}")
+    
+    started = time.monotonic()
+    executor = ThreadPoolExecutor(max_workers=args.concurrency)
+    try:
+        with open_checkpoint(checkpoint) as out:
+            futures = [executor.submit(evaluate_item, analysis_service, item) for item in pending]
+            for done, future in enumerate(as_completed(futures), 1):
+                record = future.result()
+                out.write(json.dumps(record) + '\n')
+                out.flush()
+                records[record['id']] = record
+                outcome = record.get('error') or f"{record['latency_ms']:.0f} ms, overall {record['overall_score']}"
+                print(f"  [{done}/{len(pending)}] {record['id']}: {outcome}")
+    except KeyboardInterrupt:
+        executor.shutdown(wait=False, cancel_futures=True)
+        print("\nInterrupted; run again with the same options to resume")
+        sys.exit(130)
+    executor.shutdown()
+    if pending:
+        print(f"Finished {len(pending)} items in {time.monotonic() - started:.1f}s\n")
+    
+    # Items removed from the corpus since the checkpoint was written are left out
+    ids = {item['id'] for item in items}
+    records = [record for item_id, record in records.items() if item_id in ids]
+    summary = summarize(records)
+    
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    drift = score_drift(records, baseline) if baseline else None
+    print_report(summary, drift)
+    
+    if summary['errors']:
+        print(f"\n{summary['errors']} item(s) failed; run again to retry them")
+        sys.exit(1)
+    
+    if args.save_baseline:
+        save_baseline(args.baseline, records, summary, run)
+        print(f"\nBaseline saved to {args.baseline}")
+        return
+    
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to record one")
+        sys.exit(1)
+    
+    if baseline['run']['prompt_fingerprint'] != run['prompt_fingerprint'] or baseline['run']['model'] != run['model']:
+        print(f"\nBaseline: {baseline['run']['model']} with prompts {baseline['run']['prompt_fingerprint']} "
+              f"on {baseline['run']['backend']}")
+    regressions = compare(summary, drift, baseline, run, args.max_drift, args.max_parse_increase, args.latency_threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s):")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("\nNo regressions against the baseline")
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,153 @@
+"""
+Shared measurement and baseline comparison for the benchmark scripts
+"""
+
+import gc
+import json
+import os
+import platform
+import socket
+import statistics
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+def measure(fn: Callable[[], Any], min_time: float = 0.2, repeat: int = 5) -> Dict[str, float]:
+    """
+    Measure throughput and memory of a callable
+    
+    Throughput is the median of several timed rounds, each running fn for
+    at least min_time seconds, so one unusually fast or slow round does
+    not decide the result. Memory is measured on a separate call under
+    tracemalloc, which is too slow to leave on while timing.
+    
+    Args:
+        fn: Callable to benchmark (called with no arguments)
+        min_time: Minimum seconds per timed round
+        repeat: Number of timed rounds
+    
+    Returns:
+        Dict with 'ops_per_sec', 'us_per_op', 'peak_kib' (peak memory
+        allocated during one call) and 'blocks' (memory blocks still
+        allocated after one call, e.g. caches filled by it)
+    """
+    fn()  # Warm up caches and lazily compiled patterns
+    
+    # Calibrate the number of calls per round
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time / 4 or number >= 1_000_000:
+            break
+        number *= 4
+    number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    
+    rounds = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for _ in range(number):
+                fn()
+            rounds.append((time.perf_counter() - started) / number)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        baseline_size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+    
+    median = statistics.median(rounds)
+    return {
+        'ops_per_sec': round(1 / median, 2),
+        'us_per_op': round(median * 1e6, 2),
+        'peak_kib': round(max(peak - baseline_size, 0) / 1024, 1),
+        'blocks': blocks
+    }
+
+def load_baseline(path: str) -> Optional[Dict[str, Any]]:
+    """Load a stored baseline, or None if there is none"""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def save_baseline(path: str, results: Dict[str, Dict[str, float]]) -> None:
+    """Store results as the new baseline, with the environment they were measured on"""
+    data = {
+        'host': socket.gethostname(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'results': results
+    }
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Any],
+            threshold: float) -> List[str]:
+    """
+    Find regressions against a baseline
+    
+    A case regresses when its throughput drops, or its peak memory grows,
+    by more than threshold (a fraction, e.g. 0.3 for 30%). Throughput is
+    only compared with a baseline recorded on this host, and memory with
+    one recorded on this Python version.
+    
+    Args:
+        results: Current results per case
+        baseline: Loaded baseline
+        threshold: Tolerated relative change
+    
+    Returns:
+        One message per regression
+    """
+    same_host = same_host_as(baseline)
+    same_python = baseline.get('python') == platform.python_version()
+    regressions = []
+    for name, result in results.items():
+        previous = baseline['results'].get(name)
+        if previous is None:
+            continue
+        
+        change = result['ops_per_sec'] / previous['ops_per_sec'] - 1
+        if same_host and change < -threshold:
+            regressions.append(
+                f"{name}: {result['ops_per_sec']:.1f} ops/s is {-change:.0%} slower than {previous['ops_per_sec']:.1f}"
+            )
+        
+        # Ignore tiny allocations, where a few bytes are a large relative change
+        if same_python and previous['peak_kib'] >= 4 and result['peak_kib'] > previous['peak_kib'] * (1 + threshold):
+            regressions.append(
+                f"{name}: peak {result['peak_kib']:.1f} KiB is above the baseline {previous['peak_kib']:.1f} KiB"
+            )
+    return regressions
+
+def same_host_as(baseline: Dict[str, Any]) -> bool:
+    """Check whether a baseline was recorded on this host, so its throughput is comparable"""
+    return baseline.get('host') == socket.gethostname()
+
+def print_results(results: Dict[str, Dict[str, float]], baseline: Optional[Dict[str, Any]] = None) -> None:
+    """Print a results table, with the throughput change against the baseline if given and from this host"""
+    if baseline and not same_host_as(baseline):
+        baseline = None
+    print(f"{'case':<40} {'ops/s':>12} {'us/op':>12} {'peak KiB':>10} {'blocks':>8} {'vs base':>8}")
+    for name, result in results.items():
+        previous = baseline['results'].get(name) if baseline else None
+        change = f"{result['ops_per_sec'] / previous['ops_per_sec'] - 1:+.0%}" if previous else ''
+        print(f"{name:<40} {result['ops_per_sec']:>12.1f} {result['us_per_op']:>12.1f} "
+              f"{result['peak_kib']:>10.1f} {result['blocks']:>8} {change:>8}")
\ No newline at end of file
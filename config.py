@@ -17,6 +17,115 @@ class Config:
     
     # OpenAI settings
     OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
+    OPENAI_BASE_URL = os.environ.get('OPENAI_BASE_URL') or None  # e.g. a local fake server for load tests
+    
+    # OpenAI call resilience
+    OPENAI_MAX_RETRIES = int(os.environ.get('OPENAI_MAX_RETRIES', 2))
+    OPENAI_RETRY_BUDGET_RATIO = float(os.environ.get('OPENAI_RETRY_BUDGET_RATIO', 0.1))  # retries per first attempt
+    OPENAI_HEDGE_ENABLED = os.environ.get('OPENAI_HEDGE_ENABLED', 'false').lower() == 'true'
+    OPENAI_HEDGE_PERCENTILE = float(os.environ.get('OPENAI_HEDGE_PERCENTILE', 90))
+    TRANSCRIPTION_TIMEOUT_SECONDS = float(os.environ.get('TRANSCRIPTION_TIMEOUT_SECONDS', 60))
+    
+    # Circuit breaker around the chat completion calls (per worker); while open, /analyze serves local scores
+    CIRCUIT_BREAKER_ENABLED = os.environ.get('CIRCUIT_BREAKER_ENABLED', 'true').lower() == 'true'
+    CIRCUIT_FAILURE_RATE = float(os.environ.get('CIRCUIT_FAILURE_RATE', 0.5))
+    CIRCUIT_SLOW_CALL_MS = float(os.environ.get('CIRCUIT_SLOW_CALL_MS', 20000))
+    CIRCUIT_SLOW_CALL_RATE = float(os.environ.get('CIRCUIT_SLOW_CALL_RATE', 0.8))
+    CIRCUIT_MIN_CALLS = int(os.environ.get('CIRCUIT_MIN_CALLS', 10))
+    CIRCUIT_WINDOW_SECONDS = float(os.environ.get('CIRCUIT_WINDOW_SECONDS', 60))
+    CIRCUIT_OPEN_SECONDS = float(os.environ.get('CIRCUIT_OPEN_SECONDS', 30))
+    
+    # Shared OpenAI HTTP connection pool (one per worker process, see services/openai_client.py)
+    OPENAI_MAX_CONNECTIONS = int(os.environ.get('OPENAI_MAX_CONNECTIONS', 32))
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get('OPENAI_MAX_KEEPALIVE_CONNECTIONS', 16))
+    OPENAI_KEEPALIVE_EXPIRY_SECONDS = float(os.environ.get('OPENAI_KEEPALIVE_EXPIRY_SECONDS', 60))
+    OPENAI_CONNECT_TIMEOUT_SECONDS = float(os.environ.get('OPENAI_CONNECT_TIMEOUT_SECONDS', 5))
+    OPENAI_HTTP2 = os.environ.get('OPENAI_HTTP2', 'false').lower() == 'true'  # needs the 'h2' package
+    OPENAI_WARM_CONNECTIONS = int(os.environ.get('OPENAI_WARM_CONNECTIONS', 4))
+    
+    # OpenAI quota governor (per model and minute, 0 disables; shared through RATELIMIT_STORAGE_URL)
+    OPENAI_RPM_LIMIT = int(os.environ.get('OPENAI_RPM_LIMIT', 0))
+    OPENAI_TPM_LIMIT = int(os.environ.get('OPENAI_TPM_LIMIT', 0))
+    OPENAI_MODEL_LIMITS = os.environ.get('OPENAI_MODEL_LIMITS', '')  # e.g. gpt-4=500:10000,whisper-1=50:0
+    OPENAI_QUOTA_MAX_WAIT_SECONDS = float(os.environ.get('OPENAI_QUOTA_MAX_WAIT_SECONDS', 10))
+    
+    # Analysis settings
+    ANALYSIS_MODE = os.environ.get('ANALYSIS_MODE', 'split')  # 'split' or 'combined'
+    ANALYSIS_MAX_WORKERS = int(os.environ.get('ANALYSIS_MAX_WORKERS', 8))
+    ANALYSIS_TIMEOUT_SECONDS = float(os.environ.get('ANALYSIS_TIMEOUT_SECONDS', 45))
+    FOLLOW_UP_TIMEOUT_SECONDS = float(os.environ.get('FOLLOW_UP_TIMEOUT_SECONDS', 20))
+    
+    # Filler word lexicon language (see utils/filler_words.py, FILLER_LEXICON_PATH adds overrides)
+    FILLER_LANGUAGE = os.environ.get('FILLER_LANGUAGE', 'en')
+    
+    # Batch analysis settings
+    BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', 50))
+    BATCH_MAX_CONCURRENCY = int(os.environ.get('BATCH_MAX_CONCURRENCY', 4))  # capped at ANALYSIS_MAX_WORKERS // 2
+    
+    # Analysis cache settings
+    CACHE_ENABLED = os.environ.get('CACHE_ENABLED', 'true').lower() == 'true'
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 1024))
+    CACHE_TTL_SECONDS = float(os.environ.get('CACHE_TTL_SECONDS', 24 * 3600))
+    CACHE_DISK_PATH = os.environ.get('CACHE_DISK_PATH')  # e.g. temp_uploads/analysis_cache.db
+    CACHE_DISK_MAX_ENTRIES = int(os.environ.get('CACHE_DISK_MAX_ENTRIES', 100000))
+    
+    # Reuse of analyses of near-identical answers to the same question (MinHash LSH, per worker)
+    NEAR_DUPLICATE_ENABLED = os.environ.get('NEAR_DUPLICATE_ENABLED', 'true').lower() == 'true'
+    NEAR_DUPLICATE_THRESHOLD = float(os.environ.get('NEAR_DUPLICATE_THRESHOLD', 0.85))  # estimated Jaccard similarity
+    NEAR_DUPLICATE_MAX_ENTRIES = int(os.environ.get('NEAR_DUPLICATE_MAX_ENTRIES', 2048))
+    NEAR_DUPLICATE_MIN_WORDS = int(os.environ.get('NEAR_DUPLICATE_MIN_WORDS', 20))
+    
+    # Coalescing of identical in-flight requests (the lock directory also needs CACHE_DISK_PATH)
+    SINGLE_FLIGHT_ENABLED = os.environ.get('SINGLE_FLIGHT_ENABLED', 'true').lower() == 'true'
+    SINGLE_FLIGHT_LOCK_DIR = os.environ.get('SINGLE_FLIGHT_LOCK_DIR')  # e.g. temp_uploads/locks
+    
+    # Prompt token budgets (long answers are truncated to fit)
+    PROMPT_TOKEN_BUDGET = int(os.environ.get('PROMPT_TOKEN_BUDGET', 2000))
+    FOLLOW_UP_TOKEN_BUDGET = int(os.environ.get('FOLLOW_UP_TOKEN_BUDGET', 800))
+    
+    # Ask for JSON-mode responses (needs a model that supports response_format, e.g. gpt-4-turbo)
+    OPENAI_JSON_MODE = os.environ.get('OPENAI_JSON_MODE', 'false').lower() == 'true'
+    
+    # Model routing: short answers and follow-ups go to FAST_MODEL, long technical answers to gpt-4
+    MODEL_ROUTING_ENABLED = os.environ.get('MODEL_ROUTING_ENABLED', 'true').lower() == 'true'
+    FAST_MODEL = os.environ.get('FAST_MODEL', 'gpt-3.5-turbo')
+    MODEL_LATENCY_SLO_MS = float(os.environ.get('MODEL_LATENCY_SLO_MS', 8000))
+    LONG_ANSWER_TOKENS = int(os.environ.get('LONG_ANSWER_TOKENS', 350))
+    MIN_PARSE_SUCCESS_RATE = float(os.environ.get('MIN_PARSE_SUCCESS_RATE', 0.95))
+    
+    # Revision mode: re-score a repeated answer to the same question from its edits (needs user_id)
+    REVISION_MODE_ENABLED = os.environ.get('REVISION_MODE_ENABLED', 'true').lower() == 'true'
+    REVISION_MAX_CHANGE_RATIO = float(os.environ.get('REVISION_MAX_CHANGE_RATIO', 0.4))  # share of words edited
+    REVISION_MAX_AGE_HOURS = float(os.environ.get('REVISION_MAX_AGE_HOURS', 24))
+    
+    # Long-form answers: above LONG_FORM_CHUNK_TOKENS they are analyzed in concurrent chunks and merged
+    LONG_FORM_ENABLED = os.environ.get('LONG_FORM_ENABLED', 'true').lower() == 'true'
+    LONG_FORM_MAX_CHARS = int(os.environ.get('LONG_FORM_MAX_CHARS', 40000))  # otherwise answers are capped at 5,000
+    LONG_FORM_CHUNK_TOKENS = int(os.environ.get('LONG_FORM_CHUNK_TOKENS', 1500))
+    LONG_FORM_MAX_CONCURRENCY = int(os.environ.get('LONG_FORM_MAX_CONCURRENCY', 4))
+    LONG_FORM_REDUCE_TIMEOUT_SECONDS = float(os.environ.get('LONG_FORM_REDUCE_TIMEOUT_SECONDS', 10))
+    
+    # Usage ledger of every OpenAI call (daily JSONL files, batched to the Firestore llm_usage collection)
+    USAGE_LEDGER_ENABLED = os.environ.get('USAGE_LEDGER_ENABLED', 'true').lower() == 'true'
+    USAGE_LEDGER_DIR = os.environ.get('USAGE_LEDGER_DIR', 'temp_uploads/usage')
+    USAGE_LEDGER_FLUSH_SECONDS = float(os.environ.get('USAGE_LEDGER_FLUSH_SECONDS', 10))
+    USAGE_LEDGER_BATCH_SIZE = int(os.environ.get('USAGE_LEDGER_BATCH_SIZE', 200))
+    
+    # Precomputed follow-up pool (built by scripts/build_follow_up_pool.py)
+    FOLLOW_UP_POOL_ENABLED = os.environ.get('FOLLOW_UP_POOL_ENABLED', 'true').lower() == 'true'
+    FOLLOW_UP_POOL_SIZE = int(os.environ.get('FOLLOW_UP_POOL_SIZE', 8))  # candidates per question
+    FOLLOW_UP_POOL_MIN_SCORE = float(os.environ.get('FOLLOW_UP_POOL_MIN_SCORE', 0.25))
+    FOLLOW_UP_POOL_MIN_OVERLAP = int(os.environ.get('FOLLOW_UP_POOL_MIN_OVERLAP', 2))
+    FOLLOW_UP_POOL_REFRESH_SECONDS = float(os.environ.get('FOLLOW_UP_POOL_REFRESH_SECONDS', 3600))
+    
+    # Background job settings (JOB_STORE_PATH is shared by all workers; empty keeps jobs in memory)
+    JOB_MAX_WORKERS = int(os.environ.get('JOB_MAX_WORKERS', 4))
+    JOB_MAX_QUEUED = int(os.environ.get('JOB_MAX_QUEUED', 100))  # per worker; more submissions get 503
+    JOB_STORE_PATH = os.environ.get('JOB_STORE_PATH', 'temp_uploads/jobs.db')
+    JOB_TTL_SECONDS = float(os.environ.get('JOB_TTL_SECONDS', 24 * 3600))
+    JOB_CALLBACK_TIMEOUT_SECONDS = float(os.environ.get('JOB_CALLBACK_TIMEOUT_SECONDS', 10))
+    JOB_CALLBACK_SECRET = os.environ.get('JOB_CALLBACK_SECRET')
+    JOB_CALLBACK_ALLOWED_HOSTS = os.environ.get('JOB_CALLBACK_ALLOWED_HOSTS', '')  # comma-separated; empty allows any public host
     
     # Firebase settings
     FIREBASE_PROJECT_ID = os.environ.get('FIREBASE_PROJECT_ID')
@@ -26,8 +135,8 @@ class Config:
     MAX_CONTENT_LENGTH = 25 * 1024 * 1024  # 25MB max file size
     UPLOAD_FOLDER = 'temp_uploads'
     
-    # API rate limiting
-    RATELIMIT_STORAGE_URL = os.environ.get('REDIS_URL', 'memory://')
+    # API rate limiting state: 'sqlite:///path' is shared by all workers, 'memory://' is per worker
+    RATELIMIT_STORAGE_URL = os.environ.get('RATELIMIT_STORAGE_URL', 'sqlite:///temp_uploads/quota.db')
     
     # Logging
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
@@ -0,0 +1,31 @@
+"""
+Gunicorn settings for production (used by the Dockerfile)
+"""
+
+import os
+import threading
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+# Sockets must not be shared between workers: each worker creates its own OpenAI client after fork
+preload_app = False
+
+def post_fork(server, worker):
+    """Drop any OpenAI client inherited from the master process"""
+    from services.openai_client import reset_openai_client
+    reset_openai_client()
+
+def post_worker_init(worker):
+    """Open keep-alive connections to the OpenAI API in the background once the app is loaded"""
+    from config import Config
+    from services.openai_client import warm_up_openai_client
+    
+    if Config.OPENAI_WARM_CONNECTIONS > 0:
+        threading.Thread(
+            target=warm_up_openai_client,
+            args=(Config.OPENAI_WARM_CONNECTIONS,),
+            name='openai-warm-up',
+            daemon=True
+        ).start()
\ No newline at end of file
@@ -0,0 +1,79 @@
+"""
+Pre-generate follow-up question candidates for every practice question
+
+Covers the Firestore practice_questions collection and the built-in default
+questions, and stores one follow_up_pool document per question. /analyze
+picks a stored candidate by keyword overlap with the answer instead of
+making a live follow-up call. Run it after changing the question catalog,
+e.g. from a nightly cron job; questions already in the pool are skipped
+unless --refresh is given.
+
+Usage:
+    python scripts/build_follow_up_pool.py [--count 8] [--refresh] [--workers 4]
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from config import Config
+from services.analysis_service import AnalysisService
+from services.database_service import DatabaseService
+from services.follow_up_pool import question_key
+
+def build_entry(analysis_service: AnalysisService, question: dict, count: int) -> dict:
+    """Generate the pool entry for one practice question"""
+    category = question.get('category', 'general')
+    candidates = analysis_service.generate_follow_up_candidates(question['question'], category, count)
+    return {
+        'question': question['question'],
+        'category': category,
+        'candidates': candidates
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=Config.FOLLOW_UP_POOL_SIZE, help='candidates per question')
+    parser.add_argument('--refresh', action='store_true', help='regenerate questions already in the pool')
+    parser.add_argument('--workers', type=int, default=4, help='concurrent generation calls')
+    args = parser.parse_args()
+    
+    database_service = DatabaseService()
+    analysis_service = AnalysisService()
+    
+    questions = database_service.get_all_practice_questions()
+    if not args.refresh:
+        pooled = {question_key(entry['question']) for entry in database_service.get_follow_up_pool()}
+        questions = [question for question in questions if question_key(question['question']) not in pooled]
+    
+    print(f"Generating follow-ups for {len(questions)} questions...")
+    
+    failed = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {
+            executor.submit(build_entry, analysis_service, question, args.count): question
+            for question in questions
+        }
+        for future in as_completed(futures):
+            question = futures[future]['question']
+            try:
+                entry = future.result()
+                database_service.save_follow_up_pool_entry(question_key(question), entry)
+                print(f"  {len(entry['candidates'])} follow-ups: {question}")
+            except Exception as e:
+                failed += 1
+                print(f"  FAILED: {question} ({str(e)})")
+    
+    print(f"\nDone: {len(questions) - failed} stored, {failed} failed")
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,426 @@
+"""
+OpenAI-compatible stand-in server for offline load and latency testing
+
+Implements the routes the backend uses (chat completions, streamed or not,
+and audio transcriptions) with configurable latency distributions, error
+rates, rate limiting and slow or hanging requests. Response content is
+derived from a hash of the request, so identical requests always get
+identical answers; latency and failures are drawn from a seeded generator
+so a run can be reproduced.
+
+Point the backend at it with OPENAI_BASE_URL:
+
+    python scripts/fake_openai_server.py --port 8080 --latency lognormal:1200:600 --error-rate 0.02
+    OPENAI_BASE_URL=http://localhost:8080/v1 OPENAI_API_KEY=fake python run.py
+
+Settings can be changed while the server runs (POST /_fake/config with a
+JSON object of settings) and request counts are exposed at GET /_fake/stats.
+
+Usage:
+    python scripts/fake_openai_server.py [--port 8080] [--latency fixed:800]
+        [--stream-chunk-ms 30] [--error-rate 0] [--rate-limit-rate 0] [--rpm 0]
+        [--hang-rate 0] [--truncate-rate 0] [--seed 42]
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from typing import Dict, Any, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, Response, request, jsonify, stream_with_context
+
+from services.analysis_schema import SCORE_DIMENSIONS
+
+DEFAULT_SETTINGS = {
+    'latency': 'lognormal:1200:500',       # completion latency distribution (ms)
+    'transcription_latency': 'fixed:1500',  # transcription latency distribution (ms)
+    'stream_chunk_ms': 30,                  # delay between streamed chunks
+    'error_rate': 0.0,                      # share of requests failing with a 500
+    'rate_limit_rate': 0.0,                 # share of requests answered with a 429
+    'retry_after': 1.0,                     # Retry-After seconds sent with injected 429s
+    'rpm': 0,                               # requests per minute before 429s (0 = unlimited)
+    'hang_rate': 0.0,                       # share of requests that stall for hang_seconds
+    'hang_seconds': 120.0,
+    'truncate_rate': 0.0                    # share of completions cut off with finish_reason 'length'
+}
+
+FEEDBACK = {
+    'low': 'The answer lacks concrete detail; add a specific example and its outcome.',
+    'mid': 'A solid answer that would be stronger with measurable results.',
+    'high': 'Clear, specific and well structured with a convincing result.'
+}
+
+FOLLOW_UPS = [
+    "What was the measurable outcome of that decision?",
+    "How would you approach the same situation differently today?",
+    "What did your teammates think of your approach, and how did you handle disagreement?",
+    "Which part of that project was hardest for you personally, and why?",
+    "How did you decide what to prioritize when time was short?",
+    "Can you walk me through the trade-offs you considered?",
+    "What feedback did you receive afterwards, and what did you change?",
+    "How did you know the problem was actually solved?"
+]
+
+TRANSCRIPT_SENTENCES = [
+    "In my last role I led a small team responsible for our billing platform.",
+    "Um, the main challenge was that releases kept slipping because testing was manual.",
+    "I proposed automating the regression suite and, like, got buy-in from my manager.",
+    "We cut the release cycle from three weeks to five days.",
+    "I learned that, you know, showing data early makes it much easier to convince people.",
+    "Looking back I would involve the support team sooner."
+]
+
+class LatencyModel:
+    """Latency distribution parsed from 'kind:mean_ms[:spread_ms]'"""
+    
+    KINDS = ('fixed', 'uniform', 'normal', 'lognormal')
+    
+    def __init__(self, spec: str):
+        """
+        Parse a distribution spec
+        
+        Args:
+            spec: 'fixed:MEAN', 'uniform:MEAN:HALF_WIDTH', 'normal:MEAN:STDEV' or 'lognormal:MEAN:STDEV'
+        """
+        parts = str(spec).split(':')
+        if parts[0] not in self.KINDS or len(parts) not in (2, 3):
+            raise ValueError(f"Invalid latency distribution: {spec}")
+        self.spec = spec
+        self.kind = parts[0]
+        self.mean_ms = float(parts[1])
+        self.spread_ms = float(parts[2]) if len(parts) == 3 else 0.0
+    
+    def sample(self, rng: random.Random) -> float:
+        """Draw one latency in seconds (never negative)"""
+        if self.kind == 'fixed' or self.spread_ms <= 0:
+            latency_ms = self.mean_ms
+        elif self.kind == 'uniform':
+            latency_ms = rng.uniform(self.mean_ms - self.spread_ms, self.mean_ms + self.spread_ms)
+        elif self.kind == 'normal':
+            latency_ms = rng.gauss(self.mean_ms, self.spread_ms)
+        else:
+            # Parameters of the underlying normal giving the requested mean and standard deviation
+            sigma = math.sqrt(math.log(1 + (self.spread_ms / self.mean_ms) ** 2))
+            mu = math.log(self.mean_ms) - sigma ** 2 / 2
+            latency_ms = rng.lognormvariate(mu, sigma)
+        return max(latency_ms, 0.0) / 1000
+
+class FakeOpenAI:
+    """State of the fake server: settings, seeded randomness, rate limiter and request statistics"""
+    
+    def __init__(self, settings: Dict[str, Any], seed: int = 42):
+        """
+        Initialize the fake server state
+        
+        Args:
+            settings: Values for the keys of DEFAULT_SETTINGS
+            seed: Seed of the generator drawing latencies and failures
+        """
+        self.settings = dict(DEFAULT_SETTINGS)
+        self.latency = None
+        self.transcription_latency = None
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.stats = Counter()
+        self._requests = deque()
+        self._lock = threading.Lock()
+        self.configure(settings)
+    
+    def configure(self, settings: Dict[str, Any]) -> None:
+        """Validate and apply new settings"""
+        unknown = set(settings) - set(DEFAULT_SETTINGS)
+        if unknown:
+            raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+        
+        updated = dict(self.settings, **settings)
+        latency = LatencyModel(updated['latency'])
+        transcription_latency = LatencyModel(updated['transcription_latency'])
+        with self._lock:
+            self.settings = updated
+            self.latency = latency
+            self.transcription_latency = transcription_latency
+    
+    def reset(self) -> None:
+        """Clear statistics and the rate limiter and reseed the generator"""
+        with self._lock:
+            self.rng = random.Random(self.seed)
+            self.stats.clear()
+            self._requests.clear()
+    
+    def plan(self, route: str, latency: LatencyModel) -> Tuple[Optional[Tuple[int, Dict[str, Any], Dict[str, str]]], float]:
+        """
+        Decide the fate of one request
+        
+        Returns:
+            Tuple of an (status, body, headers) error response or None, and the latency in seconds
+        """
+        with self._lock:
+            self.stats[f"{route}.requests"] += 1
+            settings = self.settings
+            
+            wait = self._rate_limit_wait(settings['rpm'])
+            if wait is not None:
+                self.stats[f"{route}.rate_limited"] += 1
+                return error_response(429, 'Rate limit reached for requests', 'rate_limit_exceeded',
+                                      retry_after=wait), 0.0
+            
+            if self.rng.random() < settings['rate_limit_rate']:
+                self.stats[f"{route}.rate_limited"] += 1
+                return error_response(429, 'Rate limit reached for requests', 'rate_limit_exceeded',
+                                      retry_after=settings['retry_after']), 0.0
+            
+            if self.rng.random() < settings['error_rate']:
+                self.stats[f"{route}.errors"] += 1
+                return error_response(500, 'The server had an error while processing your request', 'server_error'), 0.0
+            
+            if self.rng.random() < settings['hang_rate']:
+                self.stats[f"{route}.hangs"] += 1
+                return None, settings['hang_seconds']
+            
+            return None, latency.sample(self.rng)
+    
+    def should_truncate(self) -> bool:
+        """Draw whether a completion is cut off"""
+        with self._lock:
+            truncate = self.rng.random() < self.settings['truncate_rate']
+            if truncate:
+                self.stats['chat.truncated'] += 1
+            return truncate
+    
+    def _rate_limit_wait(self, rpm: int) -> Optional[float]:
+        """Seconds until a request slot frees up if the per-minute limit is reached, else None"""
+        if not rpm:
+            return None
+        
+        now = time.monotonic()
+        while self._requests and self._requests[0] <= now - 60:
+            self._requests.popleft()
+        if len(self._requests) >= rpm:
+            return round(self._requests[0] + 60 - now, 2)
+        
+        self._requests.append(now)
+        return None
+
+def error_response(status: int, message: str, code: str,
+                   retry_after: Optional[float] = None) -> Tuple[int, Dict[str, Any], Dict[str, str]]:
+    """Build an error in the OpenAI API error format"""
+    body = {'error': {
+        'message': message,
+        'type': 'requests' if status == 429 else 'server_error',
+        'param': None,
+        'code': code
+    }}
+    headers = {'retry-after': str(retry_after)} if retry_after is not None else {}
+    return status, body, headers
+
+def request_digest(payload: Any) -> int:
+    """Stable integer derived from a request, so identical requests get identical content"""
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+    return int(hashlib.sha256(encoded).hexdigest(), 16)
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)"""
+    return max(1, len(text) // 4)
+
+def completion_content(messages: List[Dict[str, str]]) -> str:
+    """Produce a plausible reply for the backend's prompts"""
+    system = messages[0]['content'] if messages else ''
+    user = messages[-1]['content'] if messages else ''
+    digest = request_digest(messages)
+    
+    if '"follow_ups"' in system:
+        count = next((int(word) for word in user.split() if word.isdigit()), 5)
+        follow_ups = [
+            {'question': FOLLOW_UPS[(digest + i) % len(FOLLOW_UPS)], 'keywords': ['project', 'team', 'result', 'decision']}
+            for i in range(count)
+        ]
+        return json.dumps({'follow_ups': follow_ups})
+    
+    if 'content_quality' in system:
+        analysis = {}
+        for i, dimension in enumerate(SCORE_DIMENSIONS):
+            score = 4 + (digest >> (4 * i)) % 6
+            level = 'low' if score < 6 else 'mid' if score < 8 else 'high'
+            analysis[dimension] = {'score': score, 'feedback': FEEDBACK[level]}
+        analysis['strengths'] = ['Relevant experience', 'Clear ownership of the work']
+        analysis['areas_for_improvement'] = ['Quantify the impact', 'Tighten the structure']
+        analysis['suggestions'] = [
+            'Use the STAR method to structure the answer',
+            'Add one number that shows the result',
+            'End with what you learned'
+        ]
+        if 'follow_up_question' in system:
+            analysis['follow_up_question'] = FOLLOW_UPS[digest % len(FOLLOW_UPS)]
+        return json.dumps(analysis, indent=2)
+    
+    return FOLLOW_UPS[digest % len(FOLLOW_UPS)]
+
+def create_app(fake: FakeOpenAI) -> Flask:
+    """Create the Flask app serving the fake API"""
+    app = Flask(__name__)
+    
+    def send_error(error: Tuple[int, Dict[str, Any], Dict[str, str]]):
+        status, body, headers = error
+        return jsonify(body), status, headers
+    
+    @app.route('/v1/models', methods=['GET'])
+    def list_models():
+        return jsonify({'object': 'list', 'data': [
+            {'id': model, 'object': 'model', 'created': 0, 'owned_by': 'fake'}
+            for model in ('gpt-4', 'gpt-3.5-turbo', 'whisper-1')
+        ]}), 200
+    
+    @app.route('/v1/chat/completions', methods=['POST'])
+    def chat_completions():
+        body = request.get_json(force=True)
+        messages = body.get('messages', [])
+        model = body.get('model', 'gpt-4')
+        
+        error, latency = fake.plan('chat', fake.latency)
+        if error:
+            return send_error(error)
+        
+        content = completion_content(messages)
+        finish_reason = 'stop'
+        max_tokens = body.get('max_tokens')
+        if fake.should_truncate() or (max_tokens and estimate_tokens(content) > max_tokens):
+            content = content[:len(content) // 2]
+            finish_reason = 'length'
+        
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        prompt_tokens = sum(estimate_tokens(message.get('content', '')) + 4 for message in messages) + 3
+        
+        if body.get('stream'):
+            return Response(
+                stream_with_context(stream_chunks(fake, completion_id, model, content, finish_reason, latency)),
+                mimetype='text/event-stream'
+            )
+        
+        time.sleep(latency)
+        return jsonify({
+            'id': completion_id,
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': finish_reason
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': estimate_tokens(content),
+                'total_tokens': prompt_tokens + estimate_tokens(content)
+            }
+        }), 200
+    
+    @app.route('/v1/audio/transcriptions', methods=['POST'])
+    def audio_transcriptions():
+        audio = request.files.get('file')
+        if audio is None:
+            return send_error(error_response(400, "Missing required parameter: 'file'", 'missing_file'))
+        
+        error, latency = fake.plan('audio', fake.transcription_latency)
+        if error:
+            return send_error(error)
+        
+        data = audio.read()
+        # Roughly 32 kB per second of 16 kHz mono 16-bit audio, about 2.5 spoken words per second
+        duration = max(len(data) / 32000, 1.0)
+        digest = request_digest(hashlib.sha256(data).hexdigest())
+        sentence_count = max(1, int(duration * 2.5 / 12))
+        text = ' '.join(TRANSCRIPT_SENTENCES[(digest + i) % len(TRANSCRIPT_SENTENCES)] for i in range(sentence_count))
+        
+        time.sleep(latency)
+        response_format = request.form.get('response_format', 'json')
+        if response_format == 'text':
+            return Response(text, mimetype='text/plain')
+        if response_format == 'verbose_json':
+            return jsonify({
+                'task': 'transcribe',
+                'language': request.form.get('language', 'english'),
+                'duration': round(duration, 2),
+                'text': text,
+                'segments': []
+            }), 200
+        return jsonify({'text': text}), 200
+    
+    @app.route('/_fake/config', methods=['GET', 'POST'])
+    def fake_config():
+        if request.method == 'POST':
+            try:
+                fake.configure(request.get_json(force=True) or {})
+            except (ValueError, TypeError) as e:
+                return jsonify({'error': str(e)}), 400
+        return jsonify(fake.settings), 200
+    
+    @app.route('/_fake/stats', methods=['GET'])
+    def fake_stats():
+        return jsonify(dict(fake.stats)), 200
+    
+    @app.route('/_fake/reset', methods=['POST'])
+    def fake_reset():
+        fake.reset()
+        return jsonify({'success': True}), 200
+    
+    return app
+
+def stream_chunks(fake: FakeOpenAI, completion_id: str, model: str, content: str,
+                  finish_reason: str, latency: float):
+    """Yield a completion as chat.completion.chunk events, the first after the sampled latency"""
+    def chunk(delta: Dict[str, Any], finish: Optional[str] = None) -> str:
+        event = {
+            'id': completion_id,
+            'object': 'chat.completion.chunk',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish}]
+        }
+        return f"data: {json.dumps(event)}\n\n"
+    
+    time.sleep(latency)
+    yield chunk({'role': 'assistant', 'content': ''})
+    
+    chunk_delay = fake.settings['stream_chunk_ms'] / 1000
+    for start in range(0, len(content), 16):
+        yield chunk({'content': content[start:start + 16]})
+        time.sleep(chunk_delay)
+    
+    yield chunk({}, finish_reason)
+    yield "data: [DONE]\n\n"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--seed', type=int, default=42, help='seed for latencies and failures')
+    parser.add_argument('--latency', default=DEFAULT_SETTINGS['latency'],
+                        help="completion latency: fixed:MEAN, uniform:MEAN:HALF_WIDTH, normal:MEAN:STDEV or lognormal:MEAN:STDEV (ms)")
+    parser.add_argument('--transcription-latency', default=DEFAULT_SETTINGS['transcription_latency'])
+    parser.add_argument('--stream-chunk-ms', type=float, default=DEFAULT_SETTINGS['stream_chunk_ms'])
+    parser.add_argument('--error-rate', type=float, default=DEFAULT_SETTINGS['error_rate'])
+    parser.add_argument('--rate-limit-rate', type=float, default=DEFAULT_SETTINGS['rate_limit_rate'])
+    parser.add_argument('--retry-after', type=float, default=DEFAULT_SETTINGS['retry_after'])
+    parser.add_argument('--rpm', type=int, default=DEFAULT_SETTINGS['rpm'])
+    parser.add_argument('--hang-rate', type=float, default=DEFAULT_SETTINGS['hang_rate'])
+    parser.add_argument('--hang-seconds', type=float, default=DEFAULT_SETTINGS['hang_seconds'])
+    parser.add_argument('--truncate-rate', type=float, default=DEFAULT_SETTINGS['truncate_rate'])
+    args = parser.parse_args()
+    
+    settings = {key: getattr(args, key) for key in DEFAULT_SETTINGS}
+    fake = FakeOpenAI(settings, seed=args.seed)
+    print(f"Fake OpenAI API on http://{args.host}:{args.port}/v1 with {json.dumps(fake.settings)}")
+    create_app(fake).run(host=args.host, port=args.port, threaded=True)
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,156 @@
+"""
+Concurrent load test for the backend's /analyze, /analyze/stream and /transcribe endpoints
+
+Meant to run against a backend pointed at scripts/fake_openai_server.py,
+so retries, caching and coalescing can be measured offline. A share of the
+requests repeats earlier answers to exercise the analysis cache.
+
+Usage:
+    python scripts/load_test.py [--url http://localhost:5000] [--endpoint analyze]
+        [--requests 200] [--concurrency 16] [--repeat-ratio 0.3] [--seed 42]
+"""
+
+import argparse
+import io
+import json
+import random
+import struct
+import sys
+import time
+import wave
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
+
+import requests
+
+ENDPOINTS = ('analyze', 'stream', 'transcribe')
+
+QUESTIONS = [
+    ('Tell me about yourself.', 'general'),
+    ('Describe a challenging situation you faced and how you handled it.', 'general'),
+    ('Tell me about a time you worked in a team.', 'behavioral'),
+    ('How would you optimize a slow-performing application?', 'technical')
+]
+
+SENTENCES = [
+    "I led the migration of our billing service to a new platform.",
+    "The main challenge was that releases kept slipping because testing was manual.",
+    "Um, I proposed automating the regression suite and got buy-in from my manager.",
+    "We reduced latency by forty percent and cut the release cycle to five days.",
+    "I learned that showing data early makes it much easier to convince people.",
+    "Looking back, I would involve the support team sooner.",
+    "I profiled the slowest endpoints first and found an N+1 query.",
+    "Like, we added caching for the hottest reads and measured the hit rate."
+]
+
+def make_answers(count: int, repeat_ratio: float, rng: random.Random) -> List[Dict[str, str]]:
+    """Build request bodies, repeating earlier ones for roughly repeat_ratio of them"""
+    bodies = []
+    for i in range(count):
+        if bodies and rng.random() < repeat_ratio:
+            bodies.append(rng.choice(bodies))
+            continue
+        question, category = rng.choice(QUESTIONS)
+        text = ' '.join(rng.sample(SENTENCES, rng.randint(3, len(SENTENCES))))
+        bodies.append({'text': f"{text} (answer {i})", 'question': question, 'category': category})
+    return bodies
+
+def make_wav(seconds: float, sample_rate: int = 16000) -> bytes:
+    """Build a mono 16-bit WAV file of a quiet tone"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        frames = int(seconds * sample_rate)
+        wav.writeframes(b''.join(struct.pack('<h', (i % 64) * 8) for i in range(frames)))
+    return buffer.getvalue()
+
+def send(session: requests.Session, url: str, endpoint: str, body: Any, timeout: float) -> Dict[str, Any]:
+    """Send one request and record its status, latency and cache outcome"""
+    started = time.monotonic()
+    outcome = {'status': None, 'latency_ms': None, 'first_event_ms': None, 'cache': []}
+    try:
+        if endpoint == 'transcribe':
+            response = session.post(f"{url}/transcribe", files={'audio': ('answer.wav', body, 'audio/wav')},
+                                    timeout=timeout)
+            result = response.json()
+        elif endpoint == 'stream':
+            response = session.post(f"{url}/analyze/stream", json=body, stream=True, timeout=timeout)
+            data = None
+            for line in response.iter_lines(decode_unicode=True):
+                if outcome['first_event_ms'] is None and line.startswith('event:'):
+                    outcome['first_event_ms'] = (time.monotonic() - started) * 1000
+                if line.startswith('data:'):
+                    data = line[5:]
+            # The last event is 'complete' (or 'error')
+            result = json.loads(data) if data else {}
+        else:
+            response = session.post(f"{url}/analyze", json=body, timeout=timeout)
+            result = response.json()
+        
+        outcome['status'] = response.status_code
+        outcome['cache'] = [call.get('cache', 'none') for call in result.get('usage', {}).get('calls', [])]
+    except (requests.RequestException, ValueError) as e:
+        outcome['status'] = type(e).__name__
+    outcome['latency_ms'] = (time.monotonic() - started) * 1000
+    return outcome
+
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+def report(outcomes: List[Dict[str, Any]], elapsed: float) -> None:
+    """Print throughput, status counts, latency percentiles and cache outcomes"""
+    latencies = [outcome['latency_ms'] for outcome in outcomes if outcome['status'] == 200]
+    first_events = [outcome['first_event_ms'] for outcome in outcomes if outcome['first_event_ms'] is not None]
+    statuses = Counter(str(outcome['status']) for outcome in outcomes)
+    caches = Counter(cache for outcome in outcomes for cache in outcome['cache'])
+    
+    print(f"Requests:    {len(outcomes)} in {elapsed:.1f}s ({len(outcomes) / elapsed:.1f} req/s)")
+    print(f"Statuses:    {dict(statuses)}")
+    print(f"Latency ms:  p50 {percentile(latencies, 50):.0f}  p95 {percentile(latencies, 95):.0f}  "
+          f"p99 {percentile(latencies, 99):.0f}  max {max(latencies, default=0):.0f}")
+    if first_events:
+        print(f"First event: p50 {percentile(first_events, 50):.0f}  p95 {percentile(first_events, 95):.0f}")
+    if caches:
+        print(f"Calls:       {dict(caches)}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--endpoint', choices=ENDPOINTS, default='analyze')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--repeat-ratio', type=float, default=0.3, help='share of requests repeating an earlier answer')
+    parser.add_argument('--audio-seconds', type=float, default=20, help='length of the generated audio for /transcribe')
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    
+    rng = random.Random(args.seed)
+    if args.endpoint == 'transcribe':
+        bodies = [make_wav(args.audio_seconds)] * args.requests
+    else:
+        bodies = make_answers(args.requests, args.repeat_ratio, rng)
+    
+    session = requests.Session()
+    session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency))
+    
+    print(f"Sending {args.requests} {args.endpoint} requests to {args.url} with concurrency {args.concurrency}...")
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        outcomes = list(executor.map(
+            lambda body: send(session, args.url, args.endpoint, body, args.timeout), bodies
+        ))
+    report(outcomes, time.monotonic() - started)
+    
+    if any(outcome['status'] != 200 for outcome in outcomes):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
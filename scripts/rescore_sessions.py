@@ -0,0 +1,343 @@
+"""
+Re-score historical practice sessions with the current prompts and model
+
+Streams every practice_sessions document from Firestore in document id
+order, one page at a time, re-analyzes its answer and stores the new
+scores under the session's rescores.<version> field. The original
+analysis is left untouched, so scores of different prompt versions can be
+compared side by side. Sessions that already have the version are
+skipped, so a finished run can be repeated safely.
+
+At most --concurrency analyses run at once, and every call goes through
+the OpenAI quota governor. With RATELIMIT_STORAGE_URL pointing at the
+shared SQLite store, the job draws from the same buckets as the API
+workers; --rpm caps its own rate further to leave room for live traffic.
+Calls rejected by the governor or the circuit breaker are retried after
+their retry_after instead of failing the session.
+
+Results are stored in batched writes of --batch-size sessions. After
+each write the cursor (the last session id up to which everything is
+stored) is checkpointed, so an interrupted run resumes from there.
+Throughput and ETA are printed every --report-seconds. Sessions that
+failed are listed in the checkpoint; run again with --fresh to rescan
+from the start and retry them, as stored sessions are skipped.
+
+Usage:
+    python scripts/rescore_sessions.py [--version v2] [--model gpt-4] [--concurrency 4]
+        [--rpm 0] [--batch-size 100] [--page-size 200] [--limit 0] [--force] [--fresh]
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterator, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from config import Config
+from services.analysis_service import AnalysisService, PROMPT_VERSION
+from services.database_service import DatabaseService
+from services.model_router import ModelRouter
+from services.usage_ledger import configure_usage_ledger
+from utils.circuit_breaker import CircuitOpenError
+from utils.quota import MemoryBucketStore, QuotaExceededError, QuotaGovernor
+
+CHECKPOINT_DIR = os.path.join('temp_uploads', 'rescore')
+
+# Versions become a Firestore field path segment, which must not need quoting
+VERSION_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+
+# Quota or circuit breaker rejections a session waits out before it counts as failed
+MAX_REJECTIONS = 5
+
+# Failed session ids kept in the checkpoint
+MAX_FAILED_IDS = 1000
+
+def iter_sessions(database_service: DatabaseService, after_id: Optional[str],
+                  page_size: int) -> Iterator[Dict[str, Any]]:
+    """Yield all sessions after a cursor, fetching one page at a time"""
+    while True:
+        page = database_service.get_sessions_page(after_id, page_size)
+        yield from page
+        if len(page) < page_size:
+            return
+        after_id = page[-1]['id']
+
+def rescore(analysis_service: AnalysisService, session: Dict[str, Any],
+            job_governor: Optional[QuotaGovernor]) -> Dict[str, Any]:
+    """Re-analyze one session, waiting out quota and circuit breaker rejections"""
+    for attempt in range(MAX_REJECTIONS + 1):
+        if job_governor is not None:
+            job_governor.acquire('rescore')
+        try:
+            result = analysis_service.analyze_interview_response(
+                session['response'], session.get('question', ''), session.get('category', 'general')
+            )
+            break
+        except (QuotaExceededError, CircuitOpenError) as e:
+            if attempt == MAX_REJECTIONS:
+                raise
+            time.sleep(e.retry_after + random.uniform(0, 1))
+    
+    # Default scores of an unparseable response are not comparable; leave the session for a later run
+    if result.get('fallback'):
+        raise ValueError('analysis response could not be parsed')
+    
+    usage = result.get('usage') or {}
+    return {
+        'overall_score': result['overall_score'],
+        'detailed_feedback': result['detailed_feedback'],
+        'improvement_suggestions': result['suggestions'],
+        'provisional': result.get('provisional', False),
+        'model': usage.get('model'),
+        'prompt_version': PROMPT_VERSION,
+        'prompt_tokens': usage.get('prompt_tokens', 0),
+        'completion_tokens': usage.get('completion_tokens', 0),
+        'rescored_at': datetime.utcnow()
+    }
+
+def format_duration(seconds: float) -> str:
+    """Render a duration as 1h02m, 3m05s or 12s"""
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+class Progress:
+    """Counts and cursor of a run, checkpointed to disk, with throughput and ETA reporting"""
+    
+    def __init__(self, path: str, total: Optional[int], report_seconds: float):
+        """
+        Load the checkpoint of an earlier run, if any
+        
+        Args:
+            path: Checkpoint file
+            total: Number of sessions in the collection, if known
+            report_seconds: Seconds between progress lines
+        """
+        self.path = path
+        self.total = total
+        self.report_seconds = report_seconds
+        self.cursor = None
+        self.counts = Counter()
+        self.failed_ids = []
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            self.cursor = state['cursor']
+            self.counts.update(state['counts'])
+            self.failed_ids = state['failed_ids']
+        
+        self.started = time.monotonic()
+        self.scanned_at_start = self.counts['scanned']
+        self.last_report = self.started
+    
+    def record(self, session_id: str, outcome: str, tokens: int = 0) -> None:
+        """Count one session leaving the window ('rescored', 'skipped' or 'failed')"""
+        self.counts['scanned'] += 1
+        self.counts[outcome] += 1
+        self.counts['tokens'] += tokens
+        if outcome == 'failed' and len(self.failed_ids) < MAX_FAILED_IDS:
+            self.failed_ids.append(session_id)
+    
+    def store_failed(self, session_id: str) -> None:
+        """Count a rescored session that could not be stored as failed"""
+        self.counts['rescored'] -= 1
+        self.counts['failed'] += 1
+        if len(self.failed_ids) < MAX_FAILED_IDS:
+            self.failed_ids.append(session_id)
+    
+    def save(self, cursor: Optional[str]) -> None:
+        """Checkpoint the cursor once everything up to it is stored"""
+        self.cursor = cursor
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Write and rename, so an interruption never leaves a half-written checkpoint
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({'cursor': cursor, 'counts': self.counts, 'failed_ids': self.failed_ids}, f)
+        os.replace(temp_path, self.path)
+    
+    def report(self, force: bool = False) -> None:
+        """Print counts, throughput and ETA, at most every report_seconds unless forced"""
+        now = time.monotonic()
+        if not force and now - self.last_report < self.report_seconds:
+            return
+        self.last_report = now
+        
+        elapsed = max(now - self.started, 1e-9)
+        scanned = self.counts['scanned']
+        rate = (scanned - self.scanned_at_start) / elapsed
+        position = f"{scanned}/{self.total} ({scanned / self.total:.1%})" if self.total else f"{scanned}"
+        eta = ''
+        if self.total and rate > 0:
+            eta = f", ETA {format_duration(max(self.total - scanned, 0) / rate)}"
+        print(f"{position} scanned: {self.counts['rescored']} rescored, {self.counts['skipped']} skipped, "
+              f"{self.counts['failed']} failed | {rate * 60:.0f} sessions/min, "
+              f"{self.counts['tokens'] / elapsed * 60:.0f} tokens/min{eta}")
+
+def collect(window: Deque[Tuple[str, Optional[Future]]], writes: Dict[str, Dict[str, Any]],
+            progress: Progress, block: bool) -> Optional[str]:
+    """
+    Move finished sessions from the front of the window to the write buffer
+    
+    Sessions leave the window in cursor order, so everything up to the
+    returned id is either buffered or needs no write.
+    
+    Args:
+        window: (session id, future or None if skipped) in cursor order
+        writes: Buffer of rescores to store
+        progress: Progress of the run
+        block: Wait for the first session if it has not finished
+    
+    Returns:
+        Id of the last session that left the window, or None
+    """
+    last_id = None
+    while window and (window[0][1] is None or window[0][1].done() or block):
+        # Sessions cancelled by an interruption stay ahead of the cursor
+        if window[0][1] is not None and window[0][1].cancelled():
+            break
+        block = False
+        session_id, future = window.popleft()
+        last_id = session_id
+        if future is None:
+            progress.record(session_id, 'skipped')
+            continue
+        try:
+            rescore = future.result()
+        except Exception as e:
+            print(f"  FAILED: {session_id} ({str(e)})")
+            progress.record(session_id, 'failed')
+            continue
+        writes[session_id] = rescore
+        progress.record(session_id, 'rescored', rescore['prompt_tokens'] + rescore['completion_tokens'])
+    return last_id
+
+def store(database_service: DatabaseService, version: str, writes: Dict[str, Dict[str, Any]],
+          progress: Progress) -> None:
+    """Store buffered rescores in batched writes, one by one if a batch fails (e.g. a deleted session)"""
+    if not writes:
+        return
+    try:
+        database_service.save_session_rescores(version, writes)
+    except Exception:
+        for session_id, rescore in writes.items():
+            try:
+                database_service.save_session_rescores(version, {session_id: rescore})
+            except Exception as e:
+                print(f"  FAILED to store: {session_id} ({str(e)})")
+                progress.store_failed(session_id)
+    writes.clear()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--version', default='', help=f"label of the new scores (default: v{PROMPT_VERSION}, plus the model if given)")
+    parser.add_argument('--model', default='', help='analyze with this model instead of routing')
+    parser.add_argument('--concurrency', type=int, default=4, help='concurrent analyses')
+    parser.add_argument('--rpm', type=int, default=0, help="cap of this job's analyses per minute (0 for none)")
+    parser.add_argument('--batch-size', type=int, default=100, help='sessions per batched write and checkpoint')
+    parser.add_argument('--page-size', type=int, default=200, help='sessions fetched per Firestore query')
+    parser.add_argument('--limit', type=int, default=0, help='stop after analyzing this many sessions (0 for all)')
+    parser.add_argument('--force', action='store_true', help='re-analyze sessions that already have the version')
+    parser.add_argument('--fresh', action='store_true', help='discard the checkpoint and start from the first session')
+    parser.add_argument('--report-seconds', type=float, default=10)
+    args = parser.parse_args()
+    
+    version = args.version or f"v{PROMPT_VERSION}" + (f"-{re.sub(r'[^A-Za-z0-9_-]', '_', args.model)}" if args.model else '')
+    if not VERSION_PATTERN.match(version):
+        parser.error('--version may only contain letters, digits, - and _')
+    
+    logging.basicConfig(level=logging.WARNING)
+    
+    # Near-duplicate results belong to other answers; every session needs its own analysis
+    Config.CACHE_ENABLED = False
+    Config.NEAR_DUPLICATE_ENABLED = False
+    
+    database_service = DatabaseService()
+    configure_usage_ledger(database_service.save_usage_records)
+    analysis_service = AnalysisService()
+    if args.model:
+        analysis_service.router = ModelRouter(
+            fast_model=None,
+            quality_model=args.model,
+            latency_slo_ms=Config.MODEL_LATENCY_SLO_MS
+        )
+    job_governor = QuotaGovernor(MemoryBucketStore(), rpm=args.rpm, max_wait=float('inf')) if args.rpm else None
+    
+    checkpoint = os.path.join(CHECKPOINT_DIR, f"{version}.json")
+    if args.fresh and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    progress = Progress(checkpoint, database_service.count_sessions(), args.report_seconds)
+    
+    resume = f" from session {progress.cursor}" if progress.cursor else ''
+    print(f"Re-scoring sessions as rescores.{version}{resume} with concurrency {args.concurrency}...")
+    
+    # Sessions in flight or finished but not yet stored, in cursor order; a few
+    # pages of lookahead keep every worker busy behind a slow session
+    window: Deque[Tuple[str, Optional[Future]]] = deque()
+    max_window = args.concurrency * 4
+    writes: Dict[str, Dict[str, Any]] = {}
+    done_id = progress.cursor
+    unsaved = 0
+    submitted = 0
+    executor = ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix='rescore')
+    try:
+        for session in iter_sessions(database_service, progress.cursor, args.page_size):
+            if args.limit and submitted >= args.limit:
+                break
+            if not session.get('response') or (version in (session.get('rescores') or {}) and not args.force):
+                window.append((session['id'], None))
+            else:
+                window.append((session['id'], executor.submit(rescore, analysis_service, session, job_governor)))
+                submitted += 1
+            
+            before = len(window)
+            done_id = collect(window, writes, progress, block=len(window) >= max_window) or done_id
+            unsaved += before - len(window)
+            if unsaved >= args.batch_size:
+                store(database_service, version, writes, progress)
+                progress.save(done_id)
+                unsaved = 0
+            progress.report()
+        
+        while window:
+            done_id = collect(window, writes, progress, block=True) or done_id
+        store(database_service, version, writes, progress)
+        progress.save(done_id)
+    
+    except KeyboardInterrupt:
+        executor.shutdown(wait=False, cancel_futures=True)
+        # Keep what finished in cursor order; the rest is analyzed again on resume
+        done_id = collect(window, writes, progress, block=False) or done_id
+        store(database_service, version, writes, progress)
+        progress.save(done_id)
+        progress.report(force=True)
+        print(f"\nInterrupted; checkpoint saved at session {done_id}, run again to resume")
+        sys.exit(130)
+    
+    executor.shutdown()
+    progress.report(force=True)
+    print(f"\nDone: {progress.counts['rescored']} rescored, {progress.counts['skipped']} skipped, "
+          f"{progress.counts['failed']} failed")
+    if progress.counts['failed']:
+        print(f"Failed sessions are listed in {checkpoint}; run again with --fresh to retry them")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
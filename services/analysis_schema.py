@@ -0,0 +1,92 @@
+"""
+JSON schema for GPT-4 analysis responses, compiled once at import
+"""
+
+from typing import Dict, Any, List
+
+from jsonschema import Draft7Validator
+
+SCORE_DIMENSIONS = [
+    'content_quality',
+    'communication_clarity',
+    'confidence_level',
+    'structure_organization',
+    'professionalism'
+]
+
+LIST_FIELDS = ['strengths', 'areas_for_improvement', 'suggestions']
+
+SCORED_FEEDBACK_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'score': {'type': 'number', 'minimum': 0, 'maximum': 10},
+        'feedback': {'type': 'string'}
+    },
+    'required': ['score']
+}
+
+STRING_LIST_SCHEMA = {
+    'type': 'array',
+    'items': {'type': 'string'}
+}
+
+ANALYSIS_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        **{dimension: SCORED_FEEDBACK_SCHEMA for dimension in SCORE_DIMENSIONS},
+        **{field: STRING_LIST_SCHEMA for field in LIST_FIELDS},
+        'follow_up_question': {'type': 'string'}
+    },
+    # Lists may be lost when a truncated response is repaired; the scores may not
+    'required': SCORE_DIMENSIONS
+}
+
+# A repaired (truncated) response may be missing trailing dimensions, but needs at least one
+PARTIAL_ANALYSIS_SCHEMA = {
+    **ANALYSIS_SCHEMA,
+    'required': [],
+    'anyOf': [{'required': [dimension]} for dimension in SCORE_DIMENSIONS]
+}
+
+# A re-scored revision only contains the dimensions and lists its edits changed
+REVISION_SCHEMA = {
+    **ANALYSIS_SCHEMA,
+    'required': []
+}
+
+Draft7Validator.check_schema(ANALYSIS_SCHEMA)
+Draft7Validator.check_schema(PARTIAL_ANALYSIS_SCHEMA)
+Draft7Validator.check_schema(REVISION_SCHEMA)
+ANALYSIS_VALIDATOR = Draft7Validator(ANALYSIS_SCHEMA)
+PARTIAL_ANALYSIS_VALIDATOR = Draft7Validator(PARTIAL_ANALYSIS_SCHEMA)
+REVISION_VALIDATOR = Draft7Validator(REVISION_SCHEMA)
+
+def validate_analysis(data: Any, partial: bool = False, revision: bool = False) -> List[str]:
+    """
+    Validate a decoded analysis response against the schema
+    
+    Args:
+        data: Decoded JSON response
+        partial: Accept responses missing some score dimensions (for repaired responses)
+        revision: Accept any subset of the members (for re-scored revisions)
+    
+    Returns:
+        List of error messages (empty if valid)
+    """
+    if revision:
+        validator = REVISION_VALIDATOR
+    else:
+        validator = PARTIAL_ANALYSIS_VALIDATOR if partial else ANALYSIS_VALIDATOR
+    return [
+        f"{'/'.join(str(part) for part in error.path) or '<root>'}: {error.message}"
+        for error in validator.iter_errors(data)
+    ]
+
+def fill_analysis_defaults(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Add empty feedback text and lists that a valid but partial response left out"""
+    for dimension in SCORE_DIMENSIONS:
+        if dimension in data:
+            data[dimension].setdefault('feedback', '')
+    for field in LIST_FIELDS:
+        data.setdefault(field, [])
+    return data
\ No newline at end of file
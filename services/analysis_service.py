@@ -3,63 +3,312 @@ AI Analysis Service using OpenAI GPT-4 for interview response analysis
 """
 
 import openai
-import os
-import json
+import copy
 import logging
+import queue
 import re
-from typing import Dict, Any, List
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
+from typing import Dict, Any, List, Optional, Tuple, Callable, Iterator
+
+from config import Config
+from services.openai_client import get_openai_client, admit_openai_call, get_retry_budget
+from services.answer_diff import diff_answers, format_spans
+from services.analysis_schema import SCORE_DIMENSIONS, LIST_FIELDS, validate_analysis, fill_analysis_defaults
+from services.cache_service import AnalysisCache, create_analysis_cache
+from services.follow_up_pool import FollowUpPool
+from services.heuristic_scorer import HeuristicScorer
+from services.model_router import ModelRouter
+from services.near_duplicate_index import NearDuplicateIndex
+from services.prompt_builder import PromptBuilder
+from services.usage_ledger import record_usage, submit_in_context
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from utils.filler_words import get_filler_matcher
+from utils.json_repair import extract_json_object
+from utils.json_stream import IncrementalObjectParser
+from utils.metrics import metrics
+from utils.quota import QuotaExceededError
+from utils.resilience import ResilientCaller, DeadlineExceededError, RETRYABLE_ERRORS
+from utils.single_flight import SingleFlight, StripedFileLock
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_MODEL = "gpt-4"
+
+# Bump whenever the prompts change so cached results are not reused
+PROMPT_VERSION = "2"
+
+DEFAULT_FOLLOW_UP_QUESTION = "Can you provide a specific example from your experience that demonstrates this skill?"
+
+class AnalysisTimeoutError(Exception):
+    """Raised when the upstream analysis call times out"""
+
 class AnalysisService:
-    def __init__(self):
-        """Initialize the analysis service with OpenAI API key"""
-        self.client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+    def __init__(self, follow_up_pool: Optional[FollowUpPool] = None):
+        """
+        Initialize the analysis service
         
-    def analyze_interview_response(self, text: str, question: str = "", category: str = "general") -> Dict[str, Any]:
+        Args:
+            follow_up_pool: Optional pool of precomputed follow-up questions tried before a live call
         """
-        Analyze interview response using GPT-4
+        self.caller = ResilientCaller(
+            'openai.chat',
+            get_retry_budget(),
+            max_retries=Config.OPENAI_MAX_RETRIES,
+            hedge=Config.OPENAI_HEDGE_ENABLED,
+            hedge_percentile=Config.OPENAI_HEDGE_PERCENTILE
+        )
+        # Only upstream failures count; quota rejections and bad requests say nothing about OpenAI's health
+        self.breaker = CircuitBreaker(
+            'openai.chat',
+            failure_rate=Config.CIRCUIT_FAILURE_RATE,
+            slow_call_ms=Config.CIRCUIT_SLOW_CALL_MS,
+            slow_call_rate=Config.CIRCUIT_SLOW_CALL_RATE,
+            min_calls=Config.CIRCUIT_MIN_CALLS,
+            window_seconds=Config.CIRCUIT_WINDOW_SECONDS,
+            open_seconds=Config.CIRCUIT_OPEN_SECONDS,
+            failure_types=RETRYABLE_ERRORS + (DeadlineExceededError,)
+        ) if Config.CIRCUIT_BREAKER_ENABLED else None
+        self.executor = ThreadPoolExecutor(
+            max_workers=Config.ANALYSIS_MAX_WORKERS,
+            thread_name_prefix='analysis'
+        )
+        # Chunks of long-form answers get their own pool: they are submitted from analysis tasks
+        # already running on self.executor, which could otherwise starve waiting on themselves
+        self.chunk_executor = ThreadPoolExecutor(
+            max_workers=Config.LONG_FORM_MAX_CONCURRENCY,
+            thread_name_prefix='analysis-chunk'
+        ) if Config.LONG_FORM_ENABLED else None
+        self.heuristic_scorer = HeuristicScorer()
+        self.prompts = PromptBuilder(DEFAULT_MODEL)
+        self.router = ModelRouter(
+            fast_model=Config.FAST_MODEL if Config.MODEL_ROUTING_ENABLED else None,
+            quality_model=DEFAULT_MODEL,
+            latency_slo_ms=Config.MODEL_LATENCY_SLO_MS,
+            long_answer_tokens=Config.LONG_ANSWER_TOKENS,
+            min_parse_success=Config.MIN_PARSE_SUCCESS_RATE
+        )
+        self.cache = create_analysis_cache(
+            max_entries=Config.CACHE_MAX_ENTRIES,
+            ttl=Config.CACHE_TTL_SECONDS,
+            disk_path=Config.CACHE_DISK_PATH,
+            disk_max_entries=Config.CACHE_DISK_MAX_ENTRIES
+        ) if Config.CACHE_ENABLED else None
+        self.near_duplicates = NearDuplicateIndex(
+            threshold=Config.NEAR_DUPLICATE_THRESHOLD,
+            max_entries=Config.NEAR_DUPLICATE_MAX_ENTRIES,
+            ttl=Config.CACHE_TTL_SECONDS,
+            min_words=Config.NEAR_DUPLICATE_MIN_WORDS
+        ) if Config.NEAR_DUPLICATE_ENABLED else None
+        self.single_flight = SingleFlight() if Config.SINGLE_FLIGHT_ENABLED else None
+        self.worker_lock = self._create_worker_lock()
+        self.follow_up_pool = follow_up_pool
+    
+    @property
+    def client(self):
+        """OpenAI client shared by all services in this worker process"""
+        return get_openai_client()
+        
+    def analyze_with_follow_up(self, text: str, question: str = "", category: str = "general",
+                               previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Analyze a response and generate its follow-up question
+        
+        In 'split' mode (default) the analysis and follow-up GPT-4 calls are
+        submitted concurrently to the shared bounded executor, so the request
+        waits roughly as long as the slower of the two. In 'combined' mode a
+        single completion returns the scores, suggestions and follow-up.
+        Long-form answers always use 'split' mode, so their analysis can be
+        chunked (see _run_long_form_analysis). While the OpenAI circuit is
+        open, local scores and a pooled or cached follow-up are served at once.
         
         Args:
             text: User's interview response
             question: Original interview question
             category: Question category (behavioral, technical, general)
+            previous: Earlier session for the same question; in 'split' mode the
+                answer is then re-scored from its edits (see analyze_revision)
             
         Returns:
-            Dict containing analysis results and scores
+            Dict containing analysis results, scores, the follow-up question
+            and token usage / latency for the request
         """
-        try:
-            # Create analysis prompt
-            prompt = self._create_analysis_prompt(text, question, category)
+        started = time.monotonic()
+        
+        if Config.ANALYSIS_MODE == 'combined' and not self._is_long_form(text):
+            combined_future = submit_in_context(self.executor, self.analyze_combined, text, question, category)
+            try:
+                analysis_result = combined_future.result(
+                    timeout=self._remaining(started, Config.ANALYSIS_TIMEOUT_SECONDS)
+                )
+            except (FutureTimeoutError, AnalysisTimeoutError):
+                logger.error(f"Combined analysis timed out after {Config.ANALYSIS_TIMEOUT_SECONDS}s, serving local scores")
+                return self._degraded_analysis(text, question, category, started)
+            except CircuitOpenError:
+                return self._circuit_open_analysis(text, question, category, started)
             
-            # Get analysis from GPT-4
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": self._get_system_prompt()},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=1500
+            analysis_result['usage'] = self._summarize_usage('combined', [analysis_result.pop('usage')], started)
+            return analysis_result
+        
+        if previous is not None:
+            analysis_future = submit_in_context(self.executor, self.analyze_revision, text, question, category, previous)
+        else:
+            analysis_future = submit_in_context(self.executor, self.analyze_interview_response, text, question, category)
+        follow_up_future = submit_in_context(self.executor, self._generate_follow_up_safely, question, text, category)
+        
+        try:
+            analysis_result = analysis_future.result(
+                timeout=self._remaining(started, Config.ANALYSIS_TIMEOUT_SECONDS)
             )
+        except (FutureTimeoutError, AnalysisTimeoutError):
+            follow_up_future.cancel()
+            logger.error(f"Analysis timed out after {Config.ANALYSIS_TIMEOUT_SECONDS}s, serving local scores")
+            return self._degraded_analysis(text, question, category, started)
+        except CircuitOpenError:
+            follow_up_future.cancel()
+            return self._circuit_open_analysis(text, question, category, started)
+        
+        try:
+            follow_up, follow_up_usage = follow_up_future.result(
+                timeout=self._remaining(started, Config.FOLLOW_UP_TIMEOUT_SECONDS)
+            )
+        except FutureTimeoutError:
+            logger.warning(f"Follow-up generation timed out after {Config.FOLLOW_UP_TIMEOUT_SECONDS}s")
+            follow_up, follow_up_usage = self._fallback_follow_up(question, text), None
+        
+        calls = [analysis_result.pop('usage'), follow_up_usage]
+        analysis_result['follow_up_question'] = follow_up
+        analysis_result['usage'] = self._summarize_usage('split', calls, started)
+        return analysis_result
+    
+    def provisional_analysis(self, text: str, question: str = "", category: str = "general") -> Dict[str, Any]:
+        """
+        Score a response locally in a few milliseconds, without calling GPT-4
+        
+        Args:
+            text: User's interview response
+            question: Original interview question
+            category: Question category (behavioral, technical, general)
             
-            # Parse the response
-            analysis_text = response.choices[0].message.content
-            analysis_result = self._parse_analysis_response(analysis_text)
+        Returns:
+            Dict with the same analysis shape and 'provisional' set to True
+        """
+        started = time.monotonic()
+        filler_analysis = self._analyze_filler_words(text)
+        result = self.heuristic_scorer.score(text, question, category, filler_analysis)
+        metrics.observe('analysis.provisional.latency_ms', (time.monotonic() - started) * 1000)
+        return result
+    
+    def analyze_combined(self, text: str, question: str = "", category: str = "general") -> Dict[str, Any]:
+        """
+        Analyze a response and generate its follow-up question in one GPT-4 call
+        
+        Args:
+            text: User's interview response
+            question: Original interview question
+            category: Question category (behavioral, technical, general)
             
-            # Add filler word analysis
-            filler_analysis = self._analyze_filler_words(text)
-            analysis_result['detailed_feedback']['filler_words'] = filler_analysis
+        Returns:
+            Dict containing analysis results, scores, the follow-up question
+            and the usage of the single completion
+        """
+        try:
+            model = self._route('combined', text, category)
+            return self._cached('combined', text, question, category, model,
+                                lambda: self._run_combined_analysis(text, question, category, model))
             
-            # Calculate overall score
-            analysis_result['overall_score'] = self._calculate_overall_score(analysis_result['detailed_feedback'])
+        except (openai.APITimeoutError, DeadlineExceededError) as e:
+            raise AnalysisTimeoutError(f"Failed to analyze response: {str(e)}")
+        except (QuotaExceededError, CircuitOpenError):
+            raise
+        except Exception as e:
+            logger.error(f"Combined analysis failed: {str(e)}")
+            raise Exception(f"Failed to analyze response: {str(e)}")
+    
+    def analyze_interview_response(self, text: str, question: str = "", category: str = "general") -> Dict[str, Any]:
+        """
+        Analyze interview response using GPT-4
+        
+        Answers longer than LONG_FORM_CHUNK_TOKENS are analyzed in chunks
+        instead of being truncated to the prompt budget.
+        
+        Args:
+            text: User's interview response
+            question: Original interview question
+            category: Question category (behavioral, technical, general)
             
-            return analysis_result
+        Returns:
+            Dict containing analysis results and scores
+        """
+        try:
+            model = self._route('analysis', text, category)
+            if self._is_long_form(text):
+                compute = lambda: self._run_long_form_analysis(text, question, category, model)
+            else:
+                compute = lambda: self._run_analysis(text, question, category, model)
+            return self._cached('analysis', text, question, category, model, compute)
             
+        except (openai.APITimeoutError, DeadlineExceededError) as e:
+            raise AnalysisTimeoutError(f"Failed to analyze response: {str(e)}")
+        except (QuotaExceededError, CircuitOpenError):
+            raise
         except Exception as e:
             logger.error(f"Analysis failed: {str(e)}")
             raise Exception(f"Failed to analyze response: {str(e)}")
     
+    def analyze_revision(self, text: str, question: str, category: str,
+                         previous: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Re-score a revised answer from its edits and the scores of the previous attempt
+        
+        Only the changed passages (with a few surrounding words) and the
+        previous scores are sent, so the prompt and completion are a
+        fraction of a full analysis. Dimensions the edits do not affect keep
+        their previous feedback. A full analysis is run instead when the
+        previous attempt has no complete scores, the answer changed by more
+        than REVISION_MAX_CHANGE_RATIO or the re-scoring response is unusable.
+        
+        Args:
+            text: User's revised interview response
+            question: Original interview question
+            category: Question category (behavioral, technical, general)
+            previous: Previous session for the question ('id', 'response' and 'analysis')
+            
+        Returns:
+            Dict like analyze_interview_response, with a 'revision' entry
+            (previous session id, changed ratio, re-scored and reused dimensions)
+            when the answer was re-scored from its edits
+        """
+        baseline = self._revision_baseline(previous)
+        if baseline is None:
+            return self.analyze_interview_response(text, question, category)
+        
+        model = self._route('analysis', text, category)
+        cached = self._cache_lookup('analysis', text, question, category, model)
+        if cached is not None:
+            return cached
+        
+        diff = diff_answers(previous['response'], text)
+        if diff['changed_ratio'] > Config.REVISION_MAX_CHANGE_RATIO:
+            metrics.increment('analysis.revision.too_different')
+            return self.analyze_interview_response(text, question, category)
+        
+        try:
+            result = self._run_revision(text, question, category, model, baseline, diff)
+        except (openai.APITimeoutError, DeadlineExceededError) as e:
+            raise AnalysisTimeoutError(f"Failed to analyze response: {str(e)}")
+        except (QuotaExceededError, CircuitOpenError):
+            raise
+        except Exception as e:
+            logger.warning(f"Revision re-scoring failed, running a full analysis: {str(e)}")
+            metrics.increment('analysis.revision.failures')
+            return self.analyze_interview_response(text, question, category)
+        
+        result['revision']['previous_session_id'] = previous.get('id')
+        metrics.increment('analysis.revision.requests')
+        metrics.increment('analysis.revision.reused_dimensions', len(result['revision']['reused_dimensions']))
+        return result
+    
     def generate_follow_up_question(self, original_question: str, user_response: str, category: str = "general") -> str:
         """
         Generate a follow-up interview question based on the user's response
@@ -73,128 +322,1091 @@ class AnalysisService:
             Follow-up question string
         """
         try:
-            prompt = f"""
-            Based on the following interview exchange, generate ONE thoughtful follow-up question that:
-            1. Digs deeper into the candidate's experience
-            2. Tests their problem-solving or critical thinking
-            3. Is relevant to the {category} category
-            4. Encourages specific examples or details
+            return self._generate_follow_up(original_question, user_response, category)[0]
+            
+        except Exception as e:
+            logger.error(f"Follow-up generation failed: {str(e)}")
+            return self._fallback_follow_up(original_question, user_response)
+    
+    def analyze_batch(self, items: List[Dict[str, Any]],
+                      max_concurrency: Optional[int] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Analyze many responses with bounded concurrency, yielding results as they finish
+        
+        Each item is analyzed with analyze_with_follow_up on a pool sized to
+        the requested concurrency (capped by BATCH_MAX_CONCURRENCY). Every
+        item runs two tasks on the shared analysis pool, so the concurrency is
+        also capped at half of ANALYSIS_MAX_WORKERS: tasks queued behind other
+        items would spend their timeout waiting. A failing item never affects
+        the others.
+        
+        Args:
+            items: List of dicts with 'text' and optional 'question' and 'category'
+            max_concurrency: Requested number of items analyzed at once
             
-            Original Question: {original_question}
-            Candidate's Response: {user_response}
+        Yields:
+            Tuples of (item index, result) in completion order. The result is
+            either an analyze_with_follow_up dict or {'error': message}
+        """
+        concurrency = min(max_concurrency or Config.BATCH_MAX_CONCURRENCY, Config.BATCH_MAX_CONCURRENCY,
+                          Config.ANALYSIS_MAX_WORKERS // 2)
+        
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='analysis-batch') as pool:
+            futures = {
+                submit_in_context(
+                    pool,
+                    self.analyze_with_follow_up,
+                    item['text'],
+                    item.get('question', ''),
+                    item.get('category', 'general')
+                ): index
+                for index, item in enumerate(items)
+            }
             
-            Generate a single, well-crafted follow-up question:
-            """
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    yield index, future.result()
+                except Exception as e:
+                    logger.warning(f"Batch item {index} failed: {str(e)}")
+                    metrics.increment('analysis.batch.item_failures')
+                    yield index, {'error': str(e)}
+    
+    def stream_analysis(self, text: str, question: str = "",
+                        category: str = "general") -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Analyze a response, yielding partial results as soon as they are available
+        
+        Events are yielded in this order: 'filler_words' and 'provisional'
+        (computed locally in milliseconds), one 'score' per dimension as the streamed JSON completes, 'feedback'
+        for strengths, improvements and suggestions, 'follow_up_token' for each
+        token of the follow-up question (generated concurrently) and finally
+        'complete' with the same result shape as analyze_with_follow_up.
+        
+        Args:
+            text: User's interview response
+            question: Original interview question
+            category: Question category (behavioral, technical, general)
             
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are an expert interviewer who asks insightful follow-up questions."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=200
-            )
+        Yields:
+            Tuples of (event name, event data)
+        """
+        started = time.monotonic()
+        filler_analysis = self._analyze_filler_words(text)
+        yield 'filler_words', filler_analysis
+        provisional = self.heuristic_scorer.score(text, question, category, filler_analysis)
+        yield 'provisional', provisional
+        
+        follow_up_tokens = queue.Queue()
+        submit_in_context(self.executor, self._stream_follow_up_into, follow_up_tokens, question, text, category)
+        
+        model = self._route('analysis', text, category)
+        analysis_result = self._cache_lookup('analysis', text, question, category, model)
+        if analysis_result is not None:
+            for key, value in analysis_result['detailed_feedback'].items():
+                event = self._partial_event(key, value)
+                if event:
+                    yield event
+        else:
+            parser = IncrementalObjectParser()
+            chunks = []
+            usage = {}
             
-            follow_up = response.choices[0].message.content.strip()
+            messages, prompt_meta = self.prompts.analysis_messages(
+                text, question, category, budget=Config.PROMPT_TOKEN_BUDGET
+            )
             
-            # Clean up the response (remove quotes, extra formatting)
-            follow_up = re.sub(r'^["\']*|["\']*$', '', follow_up)
+            try:
+                for delta in self._stream_complete(
+                    stage='analysis',
+                    model=model,
+                    messages=messages,
+                    temperature=0.3,
+                    max_tokens=1500,
+                    timeout=Config.ANALYSIS_TIMEOUT_SECONDS,
+                    usage=usage,
+                    prompt_meta=prompt_meta,
+                    json_mode=True
+                ):
+                    chunks.append(delta)
+                    for key, value in parser.feed(delta):
+                        event = self._partial_event(key, value)
+                        if event:
+                            yield event
+                
+                analysis_result = self._parse_analysis_response(''.join(chunks))
+                self.router.record_parse(model, not analysis_result['fallback'])
+                analysis_result = self._finalize_analysis(analysis_result, text, question, category, filler_analysis)
+                analysis_result['usage'] = usage
+                self._cache_store('analysis', text, question, category, model, analysis_result)
+            except CircuitOpenError:
+                # The stream was never opened; the provisional scores are the result
+                metrics.increment('analysis.circuit_open')
+                analysis_result = dict(provisional, usage=None)
+            except (openai.APITimeoutError, DeadlineExceededError) as e:
+                # The client already has the provisional scores; complete with them, as /analyze degrades on timeout
+                logger.warning(f"Streaming analysis timed out, completing with provisional scores: {str(e)}")
+                metrics.increment('analysis.timeouts')
+                analysis_result = dict(provisional, usage=usage)
+        
+        tokens = []
+        follow_up_usage = None
+        while True:
+            try:
+                token, follow_up_usage = follow_up_tokens.get(
+                    timeout=self._remaining(started, Config.FOLLOW_UP_TIMEOUT_SECONDS)
+                )
+            except queue.Empty:
+                logger.warning(f"Follow-up streaming timed out after {Config.FOLLOW_UP_TIMEOUT_SECONDS}s")
+                break
+            if token is None:
+                break
+            tokens.append(token)
+            yield 'follow_up_token', {'token': token}
+        
+        follow_up = self._clean_follow_up(''.join(tokens)) if tokens else self._fallback_follow_up(question, text)
+        calls = [analysis_result.pop('usage'), follow_up_usage]
+        analysis_result['follow_up_question'] = follow_up
+        analysis_result['usage'] = self._summarize_usage('stream', calls, started)
+        yield 'complete', analysis_result
+    
+    def generate_follow_up_candidates(self, question: str, category: str = "general",
+                                      count: int = 8) -> List[Dict[str, Any]]:
+        """
+        Pre-generate follow-up candidates for a practice question
+        
+        Used by scripts/build_follow_up_pool.py to fill the follow-up pool
+        offline, so /analyze can skip the live follow-up call.
+        
+        Args:
+            question: Practice question
+            category: Question category
+            count: Number of candidates to ask for
+        
+        Returns:
+            List of dicts with a follow-up 'question' and its trigger 'keywords'
+        
+        Raises:
+            ValueError: If the response contains no usable candidates
+        """
+        messages, prompt_meta = self.prompts.follow_up_pool_messages(question, category, count)
+        content, _ = self._complete(
+            stage='follow_up_pool',
+            messages=messages,
+            temperature=0.7,
+            max_tokens=150 * count,
+            timeout=Config.ANALYSIS_TIMEOUT_SECONDS,
+            prompt_meta=prompt_meta,
+            json_mode=True
+        )
+        
+        data, _ = extract_json_object(content)
+        candidates = []
+        for item in (data or {}).get('follow_ups', []):
+            if not isinstance(item, dict) or not isinstance(item.get('question'), str) or not item['question'].strip():
+                continue
+            keywords = [keyword.lower().strip() for keyword in item.get('keywords', []) if isinstance(keyword, str)]
+            candidates.append({'question': self._clean_follow_up(item['question']), 'keywords': keywords})
+        
+        if not candidates:
+            raise ValueError(f"No follow-up candidates in response for question: {question}")
+        return candidates
+    
+    def follow_up_pool_stats(self) -> Dict[str, Any]:
+        """Get the size of the precomputed follow-up pool"""
+        return self.follow_up_pool.stats() if self.follow_up_pool else {}
+    
+    def model_stats(self) -> Dict[str, Any]:
+        """Get the recent p95 latency and parse success rate of each routed model"""
+        return self.router.stats()
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Get analysis cache hit/miss counters, or an empty dict if caching is disabled"""
+        return self.cache.stats() if self.cache else {}
+    
+    def near_duplicate_stats(self) -> Dict[str, Any]:
+        """Get near-duplicate index hit/miss counters, or an empty dict if it is disabled"""
+        return self.near_duplicates.stats() if self.near_duplicates else {}
+    
+    def _run_analysis(self, text: str, question: str, category: str, model: str) -> Dict[str, Any]:
+        """Run the GPT-4 analysis call and score the result"""
+        # Create analysis prompt within the token budget
+        messages, prompt_meta = self.prompts.analysis_messages(
+            text, question, category, budget=Config.PROMPT_TOKEN_BUDGET
+        )
+        
+        # Get analysis from GPT-4
+        analysis_text, usage = self._complete(
+            stage='analysis',
+            model=model,
+            messages=messages,
+            temperature=0.3,
+            max_tokens=1500,
+            timeout=Config.ANALYSIS_TIMEOUT_SECONDS,
+            prompt_meta=prompt_meta,
+            json_mode=True
+        )
+        
+        # Parse the response
+        analysis_result = self._parse_analysis_response(analysis_text)
+        self.router.record_parse(model, not analysis_result['fallback'])
+        
+        # Add filler word analysis and overall score
+        analysis_result = self._finalize_analysis(analysis_result, text, question, category)
+        analysis_result['usage'] = usage
+        
+        return analysis_result
+    
+    def _is_long_form(self, text: str) -> bool:
+        """Whether an answer is too long for one analysis prompt and is analyzed in chunks"""
+        return self.chunk_executor is not None and self.prompts.count_tokens(text) > Config.LONG_FORM_CHUNK_TOKENS
+    
+    def _run_long_form_analysis(self, text: str, question: str, category: str, model: str) -> Dict[str, Any]:
+        """
+        Analyze a long answer in chunks and merge the chunk results (map-reduce)
+        
+        The chunks are analyzed concurrently, so latency follows the slowest
+        chunk rather than the length of the answer, and every prompt stays
+        within PROMPT_TOKEN_BUDGET. Scores are merged locally, weighted by
+        chunk length; one small FAST_MODEL call then merges the feedback,
+        which falls back to the feedback of the longest chunk if it fails.
+        """
+        started = time.monotonic()
+        chunks = self.prompts.split_into_chunks(text, Config.LONG_FORM_CHUNK_TOKENS)
+        # Leave time for the reduce call within the overall analysis timeout
+        map_timeout = max(Config.ANALYSIS_TIMEOUT_SECONDS - Config.LONG_FORM_REDUCE_TIMEOUT_SECONDS, 1.0)
+        
+        futures = [
+            submit_in_context(self.chunk_executor, self._analyze_chunk, chunk, index, len(chunks), question,
+                              category, model, started, map_timeout)
+            for index, chunk in enumerate(chunks, 1)
+        ]
+        try:
+            chunk_results = [future.result(timeout=self._remaining(started, map_timeout)) for future in futures]
+        except FutureTimeoutError:
+            raise DeadlineExceededError(f"Chunk analysis did not finish within {map_timeout:.0f}s")
+        finally:
+            # Chunks still queued are not worth starting once one has failed
+            for future in futures:
+                future.cancel()
+        
+        weights = [self.prompts.count_tokens(chunk) for chunk in chunks]
+        parsed = [(feedback, weight) for (feedback, _), weight in zip(chunk_results, weights) if feedback is not None]
+        calls = [usage for _, usage in chunk_results]
+        
+        if parsed:
+            detailed_feedback = self._merge_chunks(parsed)
+            reduce_usage = self._reduce_chunks(question, category, detailed_feedback, parsed, model, started)
+            if reduce_usage:
+                calls.append(reduce_usage)
+            analysis_result = {
+                'detailed_feedback': detailed_feedback,
+                'suggestions': detailed_feedback['suggestions'],
+                'fallback': False
+            }
+            missing = [field for field in SCORE_DIMENSIONS + LIST_FIELDS if field not in detailed_feedback]
+            if missing:
+                analysis_result['missing_fields'] = missing
+        else:
+            analysis_result, reduce_usage = self._get_default_analysis(), None
+        
+        analysis_result = self._finalize_analysis(analysis_result, text, question, category)
+        latency_ms = (time.monotonic() - started) * 1000
+        analysis_result['usage'] = {
+            'stage': 'long_form',
+            'model': model,
+            'prompt_tokens': sum(call['prompt_tokens'] for call in calls),
+            'completion_tokens': sum(call['completion_tokens'] for call in calls),
+            'truncated': any(call.get('truncated') for call in calls),
+            'latency_ms': round(latency_ms, 1),
+            'chunks': len(chunks),
+            'reduce': 'model' if reduce_usage else 'local',
+            'calls': calls
+        }
+        
+        metrics.increment('analysis.long_form.requests')
+        metrics.increment('analysis.long_form.chunks', len(chunks))
+        metrics.observe('analysis.long_form.latency_ms', latency_ms)
+        return analysis_result
+    
+    def _analyze_chunk(self, chunk: str, index: int, total: int, question: str, category: str, model: str,
+                       started: float, timeout: float) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+        """Analyze one chunk of a long answer; the feedback is None if the response was unusable"""
+        messages, prompt_meta = self.prompts.chunk_messages(
+            chunk, question, category, index, total, budget=Config.PROMPT_TOKEN_BUDGET
+        )
+        content, usage = self._complete(
+            stage='chunk',
+            model=model,
+            messages=messages,
+            temperature=0.3,
+            max_tokens=1500,
+            timeout=self._remaining(started, timeout),
+            prompt_meta=prompt_meta,
+            json_mode=True
+        )
+        
+        result = self._parse_analysis_response(content)
+        self.router.record_parse(model, not result['fallback'])
+        if result['fallback']:
+            return None, usage
+        # Fields lost to truncation were filled with defaults; leave them out of the merge
+        missing = set(result.get('missing_fields', []))
+        return {key: value for key, value in result['detailed_feedback'].items() if key not in missing}, usage
+    
+    def _merge_chunks(self, parsed: List[Tuple[Dict[str, Any], int]]) -> Dict[str, Any]:
+        """Merge chunk feedback locally: length-weighted scores, feedback of the longest chunk, deduplicated lists"""
+        merged = {}
+        for dimension in SCORE_DIMENSIONS:
+            scored = [(feedback[dimension], weight) for feedback, weight in parsed if dimension in feedback]
+            if not scored:
+                continue
+            score = sum(entry['score'] * weight for entry, weight in scored) / sum(weight for _, weight in scored)
+            longest = max(scored, key=lambda item: item[1])[0]
+            merged[dimension] = {'score': round(score, 1), 'feedback': longest.get('feedback', '')}
+        
+        for field in LIST_FIELDS:
+            items = {}
+            # Interleave the chunks so every part of the answer is represented
+            lists = [feedback.get(field) or [] for feedback, _ in parsed]
+            for position in range(max(len(entries) for entries in lists)):
+                for entries in lists:
+                    if position < len(entries):
+                        items.setdefault(entries[position].strip().lower(), entries[position])
+            if items:
+                merged[field] = list(items.values())[:4]
+        return merged
+    
+    def _reduce_chunks(self, question: str, category: str, merged: Dict[str, Any],
+                       parsed: List[Tuple[Dict[str, Any], int]], model: str,
+                       started: float) -> Optional[Dict[str, Any]]:
+        """Merge the chunk feedback into the merged analysis with a cheap model call; returns its usage or None"""
+        if len(parsed) < 2:
+            return None
+        
+        scores = '\n'.join(
+            f"{dimension}: {merged[dimension]['score']}/10" for dimension in SCORE_DIMENSIONS if dimension in merged
+        )
+        parts = '\n\n'.join(
+            f"Part {index} of {len(parsed)}:\n{self._format_scores(feedback)}"
+            for index, (feedback, _) in enumerate(parsed, 1)
+        )
+        messages, prompt_meta = self.prompts.reduce_messages(
+            question, category, scores, parts, budget=Config.PROMPT_TOKEN_BUDGET
+        )
+        try:
+            content, usage = self._complete(
+                stage='reduce',
+                model=Config.FAST_MODEL if Config.MODEL_ROUTING_ENABLED else model,
+                messages=messages,
+                temperature=0.3,
+                max_tokens=1000,
+                timeout=min(Config.LONG_FORM_REDUCE_TIMEOUT_SECONDS,
+                            self._remaining(started, Config.ANALYSIS_TIMEOUT_SECONDS)),
+                prompt_meta=prompt_meta,
+                json_mode=True
+            )
+            reduced, _ = extract_json_object(content or '')
+            errors = ['no JSON object found'] if reduced is None else validate_analysis(reduced, revision=True)
+            if errors:
+                raise ValueError(f"Reduce response failed validation: {'; '.join(errors[:3])}")
+        except Exception as e:
+            logger.warning(f"Merging long-form feedback failed, keeping chunk feedback: {str(e)}")
+            metrics.increment('analysis.long_form.reduce_failures')
+            return None
+        
+        # Scores stay the weighted means; only the wording and lists come from the reduce call
+        for dimension in SCORE_DIMENSIONS:
+            if dimension in merged and reduced.get(dimension, {}).get('feedback'):
+                merged[dimension]['feedback'] = reduced[dimension]['feedback']
+        for field in LIST_FIELDS:
+            if reduced.get(field):
+                merged[field] = reduced[field]
+        return usage
+    
+    def _run_combined_analysis(self, text: str, question: str, category: str, model: str) -> Dict[str, Any]:
+        """Run the single GPT-4 call returning analysis and follow-up question"""
+        messages, prompt_meta = self.prompts.analysis_messages(
+            text, question, category, budget=Config.PROMPT_TOKEN_BUDGET, combined=True
+        )
+        
+        analysis_text, usage = self._complete(
+            stage='combined',
+            model=model,
+            messages=messages,
+            temperature=0.3,
+            max_tokens=1700,
+            timeout=Config.ANALYSIS_TIMEOUT_SECONDS,
+            prompt_meta=prompt_meta,
+            json_mode=True
+        )
+        
+        analysis_result = self._parse_analysis_response(analysis_text)
+        self.router.record_parse(model, not analysis_result['fallback'])
+        follow_up = analysis_result['detailed_feedback'].pop('follow_up_question', None)
+        analysis_result['follow_up_question'] = (
+            self._clean_follow_up(follow_up) if follow_up else self._fallback_follow_up(question, text)
+        )
+        
+        analysis_result = self._finalize_analysis(analysis_result, text, question, category)
+        analysis_result['usage'] = usage
+        
+        return analysis_result
+    
+    def _run_revision(self, text: str, question: str, category: str, model: str,
+                      baseline: Dict[str, Any], diff: Dict[str, Any]) -> Dict[str, Any]:
+        """Re-score the changed passages and merge the result into the previous feedback"""
+        detailed_feedback = copy.deepcopy(baseline)
+        
+        if diff['spans']:
+            messages, prompt_meta = self.prompts.revision_messages(
+                question, category, self._format_scores(baseline), format_spans(diff['spans']),
+                budget=Config.PROMPT_TOKEN_BUDGET
+            )
+            content, usage = self._complete(
+                stage='revision',
+                model=model,
+                messages=messages,
+                temperature=0.3,
+                max_tokens=1000,
+                timeout=Config.ANALYSIS_TIMEOUT_SECONDS,
+                prompt_meta=prompt_meta,
+                json_mode=True
+            )
             
-            return follow_up
+            changes, _ = extract_json_object(content or '')
+            errors = ['no JSON object found'] if changes is None else validate_analysis(changes, revision=True)
+            if errors:
+                raise ValueError(f"Revision response failed validation: {'; '.join(errors[:3])}")
             
+            for dimension in SCORE_DIMENSIONS:
+                if dimension in changes:
+                    detailed_feedback[dimension] = dict(changes[dimension], feedback=changes[dimension].get('feedback', ''))
+            for field in LIST_FIELDS:
+                if changes.get(field):
+                    detailed_feedback[field] = changes[field]
+            rescored = [dimension for dimension in SCORE_DIMENSIONS if dimension in changes]
+        else:
+            # Only whitespace changed, so the previous scores still apply
+            usage = {
+                'stage': 'revision',
+                'model': None,
+                'prompt_tokens': 0,
+                'completion_tokens': 0,
+                'latency_ms': 0.0
+            }
+            rescored = []
+        
+        result = self._finalize_analysis(
+            {'detailed_feedback': detailed_feedback, 'suggestions': detailed_feedback['suggestions'], 'fallback': False},
+            text, question, category
+        )
+        result['usage'] = usage
+        result['revision'] = {
+            'changed_ratio': diff['changed_ratio'],
+            'changed_spans': len(diff['spans']),
+            'rescored_dimensions': rescored,
+            'reused_dimensions': [dimension for dimension in SCORE_DIMENSIONS if dimension not in rescored]
+        }
+        return result
+    
+    def _revision_baseline(self, previous: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Detailed feedback of a previous session if it is complete enough to revise, else None"""
+        if not previous or not previous.get('response'):
+            return None
+        analysis = previous.get('analysis') or {}
+        feedback = analysis.get('detailed_feedback') or {}
+        # Locally scored (provisional) sessions are not a reliable baseline
+        if analysis.get('provisional') or validate_analysis(feedback):
+            return None
+        return fill_analysis_defaults({
+            key: value for key, value in feedback.items() if key in SCORE_DIMENSIONS or key in LIST_FIELDS
+        })
+    
+    def _format_scores(self, feedback: Dict[str, Any]) -> str:
+        """Compact previous scores: one line per dimension with the first sentence of its feedback"""
+        lines = []
+        for dimension in SCORE_DIMENSIONS:
+            if dimension not in feedback:
+                continue
+            summary = re.split(r'(?<=[.!?])\s', feedback[dimension].get('feedback', '').strip(), maxsplit=1)[0]
+            lines.append(f"{dimension}: {feedback[dimension]['score']}/10 - {summary}")
+        for field in LIST_FIELDS:
+            lines.append(f"{field}: {'; '.join(feedback.get(field, []))}")
+        return '\n'.join(lines)
+    
+    def _generate_follow_up_safely(self, original_question: str, user_response: str,
+                                   category: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """Generate a follow-up question and its usage, falling back to the default question"""
+        try:
+            return self._generate_follow_up(original_question, user_response, category)
+        except CircuitOpenError:
+            return self._fallback_follow_up(original_question, user_response), None
         except Exception as e:
             logger.error(f"Follow-up generation failed: {str(e)}")
-            return "Can you provide a specific example from your experience that demonstrates this skill?"
-    
-    def _get_system_prompt(self) -> str:
-        """Get the system prompt for GPT-4 analysis"""
-        return """
-        You are an expert interview coach and HR professional. Your job is to analyze interview responses and provide constructive feedback.
-        
-        Analyze the response across these dimensions:
-        1. Content Quality (0-10): Relevance, depth, and substance of the answer
-        2. Communication Clarity (0-10): How clearly and effectively the message is conveyed
-        3. Confidence Level (0-10): Apparent confidence and conviction in the response
-        4. Structure & Organization (0-10): Logical flow and organization of thoughts
-        5. Professionalism (0-10): Professional tone and appropriate language use
-        
-        Provide your analysis in this exact JSON format:
-        {
-            "content_quality": {"score": X, "feedback": "detailed feedback"},
-            "communication_clarity": {"score": X, "feedback": "detailed feedback"},
-            "confidence_level": {"score": X, "feedback": "detailed feedback"},
-            "structure_organization": {"score": X, "feedback": "detailed feedback"},
-            "professionalism": {"score": X, "feedback": "detailed feedback"},
-            "strengths": ["strength 1", "strength 2"],
-            "areas_for_improvement": ["improvement 1", "improvement 2"],
-            "suggestions": ["specific suggestion 1", "specific suggestion 2", "specific suggestion 3"]
+            return self._fallback_follow_up(original_question, user_response), None
+    
+    def _generate_follow_up(self, original_question: str, user_response: str,
+                            category: str) -> Tuple[str, Dict[str, Any]]:
+        """Pick a precomputed follow-up question or generate (or fetch from cache) one, with its usage"""
+        pooled = self._pooled_follow_up(original_question, user_response)
+        if pooled is not None:
+            return pooled
+        
+        model = self._route('follow_up', user_response, category)
+        result = self._cached('follow_up', user_response, original_question, category, model,
+                              lambda: self._run_follow_up(original_question, user_response, category, model))
+        return result['follow_up_question'], result['usage']
+    
+    def _run_follow_up(self, original_question: str, user_response: str, category: str,
+                       model: str) -> Dict[str, Any]:
+        """Generate a follow-up question with GPT-4"""
+        messages, prompt_meta = self.prompts.follow_up_messages(
+            original_question, user_response, category, budget=Config.FOLLOW_UP_TOKEN_BUDGET
+        )
+        
+        follow_up, usage = self._complete(
+            stage='follow_up',
+            model=model,
+            messages=messages,
+            temperature=0.7,
+            max_tokens=200,
+            timeout=Config.FOLLOW_UP_TIMEOUT_SECONDS,
+            prompt_meta=prompt_meta
+        )
+        
+        return {
+            'follow_up_question': self._clean_follow_up(follow_up),
+            'usage': usage
         }
+    
+    def _stream_follow_up_into(self, tokens: queue.Queue, original_question: str,
+                               user_response: str, category: str) -> None:
+        """
+        Stream a follow-up question into a queue of (token, usage) pairs
         
-        Be constructive, specific, and encouraging in your feedback.
+        A (None, usage) pair marks the end of the stream. On failure before
+        any token was produced a fallback follow-up question is sent instead.
+        A matching precomputed follow-up is sent as a single token.
         """
+        pooled = self._pooled_follow_up(original_question, user_response)
+        if pooled is not None:
+            tokens.put((pooled[0], None))
+            tokens.put((None, pooled[1]))
+            return
+        
+        model = self._route('follow_up', user_response, category)
+        cached = self._cache_lookup('follow_up', user_response, original_question, category, model)
+        if cached is not None:
+            tokens.put((cached['follow_up_question'], None))
+            tokens.put((None, cached['usage']))
+            return
+        
+        usage = {}
+        produced = []
+        try:
+            messages, prompt_meta = self.prompts.follow_up_messages(
+                original_question, user_response, category, budget=Config.FOLLOW_UP_TOKEN_BUDGET
+            )
+            
+            for delta in self._stream_complete(
+                stage='follow_up',
+                model=model,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=200,
+                timeout=Config.FOLLOW_UP_TIMEOUT_SECONDS,
+                usage=usage,
+                prompt_meta=prompt_meta
+            ):
+                produced.append(delta)
+                tokens.put((delta, None))
+            
+            result = {'follow_up_question': self._clean_follow_up(''.join(produced)), 'usage': usage}
+            self._cache_store('follow_up', user_response, original_question, category, model, result)
+        except Exception as e:
+            if not isinstance(e, CircuitOpenError):
+                logger.error(f"Follow-up streaming failed: {str(e)}")
+            if not produced:
+                tokens.put((self._fallback_follow_up(original_question, user_response), None))
+        finally:
+            tokens.put((None, usage or None))
+    
+    def _partial_event(self, key: str, value: Any) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Map a completed top-level analysis member to a streaming event"""
+        if key in SCORE_DIMENSIONS and isinstance(value, dict):
+            return 'score', dict(value, dimension=key)
+        if key in ('strengths', 'areas_for_improvement', 'suggestions'):
+            return 'feedback', {key: value}
+        return None
     
-    def _create_analysis_prompt(self, text: str, question: str, category: str) -> str:
-        """Create the analysis prompt for GPT-4"""
-        return f"""
-        Please analyze this interview response:
+    def _finalize_analysis(self, analysis_result: Dict[str, Any], text: str, question: str, category: str,
+                           filler_analysis: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Add filler word analysis and the overall score to a parsed analysis
         
-        Question Category: {category}
-        Original Question: {question if question else "Not provided"}
+        When the GPT-4 output could not be parsed, the hard-coded default
+        scores are replaced by the local heuristic scores. Fields missing
+        from a repaired response are filled in the same way.
+        """
+        filler_analysis = filler_analysis or self._analyze_filler_words(text)
+        missing = analysis_result.pop('missing_fields', None)
         
-        Candidate's Response:
-        "{text}"
+        if analysis_result.get('fallback'):
+            provisional = self.heuristic_scorer.score(text, question, category, filler_analysis)
+            analysis_result['detailed_feedback'] = provisional['detailed_feedback']
+            analysis_result['suggestions'] = provisional['suggestions']
+            analysis_result['provisional'] = True
+        else:
+            if missing:
+                provisional = self.heuristic_scorer.score(text, question, category, filler_analysis)
+                for field in missing:
+                    analysis_result['detailed_feedback'][field] = provisional['detailed_feedback'][field]
+                analysis_result['suggestions'] = analysis_result['detailed_feedback']['suggestions']
+                analysis_result['provisional'] = any(field in SCORE_DIMENSIONS for field in missing)
+            analysis_result['detailed_feedback']['filler_words'] = filler_analysis
         
-        Provide a comprehensive analysis following the JSON format specified in your instructions.
+        analysis_result['overall_score'] = self._calculate_overall_score(analysis_result['detailed_feedback'])
+        return analysis_result
+    
+    def _degraded_analysis(self, text: str, question: str, category: str, started: float) -> Dict[str, Any]:
+        """Build a complete /analyze result from local scores when GPT-4 is too slow"""
+        metrics.increment('analysis.degraded')
+        analysis_result = self.provisional_analysis(text, question, category)
+        analysis_result['follow_up_question'] = self._fallback_follow_up(question, text)
+        analysis_result['usage'] = self._summarize_usage('degraded', [], started)
+        return analysis_result
+    
+    def _circuit_open_analysis(self, text: str, question: str, category: str, started: float) -> Dict[str, Any]:
+        """Build a complete /analyze result from local scores and a pooled or cached follow-up while the circuit is open"""
+        metrics.increment('analysis.circuit_open')
+        analysis_result = self.provisional_analysis(text, question, category)
+        analysis_result['follow_up_question'] = self._offline_follow_up(question, text, category)
+        analysis_result['usage'] = self._summarize_usage('circuit_open', [], started)
+        return analysis_result
+    
+    def _offline_follow_up(self, question: str, text: str, category: str) -> str:
+        """Follow-up question found without calling OpenAI: pooled, cached or the fallback question"""
+        pooled = self._pooled_follow_up(question, text)
+        if pooled is not None:
+            return pooled[0]
+        cached = self._cache_lookup('follow_up', text, question, category, self._route('follow_up', text, category))
+        if cached is not None:
+            return cached['follow_up_question']
+        return self._fallback_follow_up(question, text)
+    
+    def circuit_stats(self) -> Dict[str, Any]:
+        """Get the state of the OpenAI circuit breaker (empty if disabled)"""
+        return self.breaker.stats() if self.breaker else {}
+    
+    def _cached(self, kind: str, text: str, question: str, category: str, model: str,
+                compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Serve a result from the analysis cache or compute and store it
+        
+        Identical calls already in flight in this worker are joined rather
+        than repeated. With a disk cache and a lock directory, identical
+        calls in other gunicorn workers wait for the first one and read its
+        result from the shared cache.
+        
+        Results produced by fallback parsing are never cached. The 'usage'
+        entry of the returned dict reports whether the cache was hit, the
+        result of a near-duplicate answer was reused ('near_duplicate') or
+        the result was shared with a concurrent call ('coalesced').
         """
+        result = self._cache_lookup(kind, text, question, category, model)
+        if result is not None:
+            return result
+        
+        def compute_and_store() -> Dict[str, Any]:
+            result = self._compute_across_workers(kind, text, question, category, model, compute)
+            self._cache_store(kind, text, question, category, model, result)
+            return result
+        
+        if self.single_flight is None:
+            return compute_and_store()
+        
+        started = time.monotonic()
+        result, shared = self.single_flight.do(self._cache_key(kind, text, question, category, model), compute_and_store)
+        if shared:
+            metrics.increment(f"analysis.{kind}.coalesced")
+            result['usage'] = self._shared_usage(kind, result['usage'], started, 'coalesced')
+            record_usage(result['usage'])
+        return result
     
-    def _parse_analysis_response(self, analysis_text: str) -> Dict[str, Any]:
-        """Parse GPT-4 analysis response into structured data"""
+    def _compute_across_workers(self, kind: str, text: str, question: str, category: str, model: str,
+                                compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Compute a result while holding the cross-worker lock, reusing another worker's result if it finished first"""
+        if self.worker_lock is None:
+            return compute()
+        
+        key = self._cache_key(kind, text, question, category, model)
+        with self.worker_lock.hold(key, timeout=Config.ANALYSIS_TIMEOUT_SECONDS) as waited:
+            # Another worker may have stored the result between our cache miss and taking the lock
+            if waited or self.cache.on_disk(key):
+                result = self._cache_lookup(kind, text, question, category, model)
+                if result is not None:
+                    metrics.increment(f"analysis.{kind}.coalesced_across_workers")
+                    return result
+            return compute()
+    
+    def _route(self, stage: str, text: str, category: str) -> str:
+        """Pick the model for a call from the answer length, category and model metrics"""
+        return self.router.choose(stage, self.prompts.count_tokens(text), category)
+    
+    def _cache_key(self, kind: str, text: str, question: str, category: str, model: str) -> str:
+        """Hash of the normalized inputs identifying a call"""
+        return AnalysisCache.make_key(kind, text, question, category, model, PROMPT_VERSION)
+    
+    def _cache_lookup(self, kind: str, text: str, question: str, category: str,
+                      model: str) -> Optional[Dict[str, Any]]:
+        """Get a cached result for the answer or a near-duplicate of it, with its usage rewritten as a cache hit, or None"""
+        started = time.monotonic()
+        if self.cache is not None:
+            result = self.cache.get(self._cache_key(kind, text, question, category, model))
+            if result is not None:
+                result['usage'] = self._shared_usage(kind, result['usage'], started, 'hit')
+                record_usage(result['usage'])
+                return result
+        
+        if self.near_duplicates is None:
+            return None
+        
+        match = self.near_duplicates.lookup(self._cache_key(kind, '', question, category, model), text)
+        if match is None:
+            return None
+        
+        result, similarity = match
+        result = self._adapt_near_duplicate(kind, result, text)
+        result['usage'] = dict(self._shared_usage(kind, result['usage'], started, 'near_duplicate'),
+                               similarity=round(similarity, 3))
+        record_usage(result['usage'])
+        return result
+    
+    def _cache_store(self, kind: str, text: str, question: str, category: str, model: str,
+                     result: Dict[str, Any]) -> None:
+        """Mark a freshly computed result as a cache miss and store it unless it is a fallback"""
+        if (self.cache is None and self.near_duplicates is None) or \
+                result['usage'].get('cache') in ('hit', 'near_duplicate'):
+            return
+        
+        result['usage']['cache'] = 'miss'
+        if result.get('fallback'):
+            return
+        if self.cache is not None:
+            self.cache.set(self._cache_key(kind, text, question, category, model), result)
+        if self.near_duplicates is not None:
+            self.near_duplicates.add(self._cache_key(kind, '', question, category, model), text, result)
+    
+    def _adapt_near_duplicate(self, kind: str, result: Dict[str, Any], text: str) -> Dict[str, Any]:
+        """Recompute the parts of a reused result that depend on the exact wording of the new answer"""
+        if kind in ('analysis', 'combined'):
+            result['detailed_feedback']['filler_words'] = self._analyze_filler_words(text)
+            result['overall_score'] = self._calculate_overall_score(result['detailed_feedback'])
+        return result
+    
+    def _shared_usage(self, kind: str, usage: Dict[str, Any], started: float, source: str) -> Dict[str, Any]:
+        """Usage of a result reused from elsewhere: no tokens were spent on it"""
+        return {
+            'stage': kind,
+            'model': usage['model'],
+            'prompt_tokens': 0,
+            'completion_tokens': 0,
+            'latency_ms': round((time.monotonic() - started) * 1000, 1),
+            'cache': source
+        }
+    
+    def _create_worker_lock(self) -> Optional[StripedFileLock]:
+        """Create the cross-worker lock if a lock directory and a shared disk cache are configured"""
+        if not Config.SINGLE_FLIGHT_LOCK_DIR or self.cache is None or self.cache.disk_store is None:
+            return None
         try:
-            # Try to extract JSON from the response
-            json_match = re.search(r'\{.*\}', analysis_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                analysis_data = json.loads(json_str)
-            else:
-                # Fallback parsing if JSON is not properly formatted
-                analysis_data = self._fallback_parse(analysis_text)
-            
-            return {
-                'detailed_feedback': analysis_data,
-                'suggestions': analysis_data.get('suggestions', [])
-            }
+            return StripedFileLock(Config.SINGLE_FLIGHT_LOCK_DIR)
+        except OSError as e:
+            logger.warning(f"Cross-worker request coalescing disabled: {str(e)}")
+            return None
+    
+    def _pooled_follow_up(self, question: str, text: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """A precomputed follow-up matching the answer with its (token-free) usage, or None"""
+        if self.follow_up_pool is None:
+            return None
+        
+        started = time.monotonic()
+        match = self.follow_up_pool.match(question, text)
+        if match is None:
+            return None
+        
+        usage = {
+            'stage': 'follow_up',
+            'model': None,
+            'prompt_tokens': 0,
+            'completion_tokens': 0,
+            'latency_ms': round((time.monotonic() - started) * 1000, 1),
+            'cache': 'pool',
+            'match_score': match['score']
+        }
+        record_usage(usage)
+        return match['question'], usage
+    
+    def _fallback_follow_up(self, question: str, text: str) -> str:
+        """Closest precomputed follow-up for the question, or the generic default question"""
+        if self.follow_up_pool is not None:
+            try:
+                follow_up = self.follow_up_pool.fallback(question, text)
+                if follow_up:
+                    metrics.increment('follow_up_pool.fallbacks')
+                    return follow_up
+            except Exception as e:
+                logger.warning(f"Follow-up pool fallback failed: {str(e)}")
+        return DEFAULT_FOLLOW_UP_QUESTION
+    
+    def _clean_follow_up(self, follow_up: str) -> str:
+        """Clean up a generated follow-up question (remove quotes, extra formatting)"""
+        return re.sub(r'^["\']*|["\']*$', '', follow_up.strip())
+    
+    def _complete(self, stage: str, messages: List[Dict[str, str]], temperature: float,
+                  max_tokens: int, timeout: float, model: str = DEFAULT_MODEL,
+                  prompt_meta: Optional[Dict[str, Any]] = None,
+                  json_mode: bool = False) -> Tuple[str, Dict[str, Any]]:
+        """
+        Run one chat completion and record its token usage and latency
+        
+        Args:
+            stage: Name of the pipeline stage, used as the metrics prefix
+            messages: Chat messages to send
+            temperature: Sampling temperature
+            max_tokens: Completion token limit
+            timeout: Request timeout in seconds
+            model: OpenAI model name
+            prompt_meta: Local prompt token estimate and truncation flag from the PromptBuilder
+            json_mode: Request a JSON object response (if OPENAI_JSON_MODE is enabled)
             
+        Returns:
+            Tuple of the completion text and a usage dict
+        """
+        started = time.monotonic()
+        prompt_meta = prompt_meta or {}
+        quota_tokens = self._quota_tokens(messages, max_tokens, prompt_meta)
+        try:
+            response = self._guarded(lambda: self.caller.call(
+                lambda attempt_timeout: self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    timeout=admit_openai_call(model, quota_tokens, attempt_timeout),
+                    **self._response_format(json_mode)
+                ),
+                deadline=timeout
+            ))
         except Exception as e:
-            logger.warning(f"Failed to parse analysis response: {str(e)}")
-            return self._get_default_analysis()
+            self._record_failed_call(stage, model, started, e)
+            raise
+        latency_ms = (time.monotonic() - started) * 1000
+        
+        if response.choices[0].finish_reason == 'length':
+            metrics.increment(f"openai.{stage}.length_cutoffs")
+        
+        content = response.choices[0].message.content
+        
+        usage = {
+            'stage': stage,
+            'model': model,
+            # Fall back to local counts when the response carries no usage block
+            'prompt_tokens': response.usage.prompt_tokens if response.usage else prompt_meta.get('prompt_tokens', 0),
+            'completion_tokens': response.usage.completion_tokens if response.usage else self.prompts.count_tokens(content),
+            'estimated_prompt_tokens': prompt_meta.get('prompt_tokens'),
+            'truncated': prompt_meta.get('truncated', False),
+            'latency_ms': round(latency_ms, 1)
+        }
+        
+        self._record_prompt_metrics(stage, usage)
+        metrics.increment(f"openai.{stage}.calls")
+        metrics.increment(f"openai.{stage}.prompt_tokens", usage['prompt_tokens'])
+        metrics.increment(f"openai.{stage}.completion_tokens", usage['completion_tokens'])
+        metrics.observe(f"openai.{stage}.latency_ms", latency_ms)
+        self.router.record_latency(model, latency_ms)
+        record_usage(usage, cache='miss')
+        
+        return content, usage
     
-    def _fallback_parse(self, text: str) -> Dict[str, Any]:
-        """Fallback parsing method if JSON parsing fails"""
-        return {
-            'content_quality': {'score': 7, 'feedback': 'Analysis parsing failed, using default scores'},
-            'communication_clarity': {'score': 7, 'feedback': 'Please try again'},
-            'confidence_level': {'score': 7, 'feedback': 'Analysis temporarily unavailable'},
-            'structure_organization': {'score': 7, 'feedback': 'Default feedback'},
-            'professionalism': {'score': 7, 'feedback': 'Default feedback'},
-            'strengths': ['Response provided'],
-            'areas_for_improvement': ['Try speaking more clearly'],
-            'suggestions': ['Practice your response structure', 'Provide specific examples']
+    def _stream_complete(self, stage: str, messages: List[Dict[str, str]], temperature: float,
+                         max_tokens: int, timeout: float, usage: Dict[str, Any],
+                         model: str = DEFAULT_MODEL,
+                         prompt_meta: Optional[Dict[str, Any]] = None,
+                         json_mode: bool = False) -> Iterator[str]:
+        """
+        Run one streaming chat completion, yielding content deltas
+        
+        The usage dict is filled in once the stream ends. Streamed responses
+        carry no token counts, so they are counted locally from the prompt
+        and the streamed text.
+        """
+        started = time.monotonic()
+        first_token_ms = None
+        produced = []
+        prompt_meta = prompt_meta or {}
+        quota_tokens = self._quota_tokens(messages, max_tokens, prompt_meta)
+        
+        # Only opening the stream is retried; hedging would duplicate the tokens
+        try:
+            stream = self._guarded(lambda: self.caller.call(
+                lambda attempt_timeout: self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    timeout=admit_openai_call(model, quota_tokens, attempt_timeout),
+                    stream=True,
+                    **self._response_format(json_mode)
+                ),
+                deadline=timeout,
+                hedge=False
+            ))
+        except Exception as e:
+            self._record_failed_call(stage, model, started, e)
+            raise
+        
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            if chunk.choices[0].finish_reason == 'length':
+                metrics.increment(f"openai.{stage}.length_cutoffs")
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            if first_token_ms is None:
+                first_token_ms = (time.monotonic() - started) * 1000
+                metrics.observe(f"openai.{stage}.first_token_ms", first_token_ms)
+            produced.append(delta)
+            yield delta
+        
+        latency_ms = (time.monotonic() - started) * 1000
+        
+        usage.update({
+            'stage': stage,
+            'model': model,
+            'prompt_tokens': prompt_meta.get('prompt_tokens', 0),
+            'completion_tokens': self.prompts.count_tokens(''.join(produced)),
+            'estimated_prompt_tokens': prompt_meta.get('prompt_tokens'),
+            'truncated': prompt_meta.get('truncated', False),
+            'latency_ms': round(latency_ms, 1),
+            'first_token_ms': round(first_token_ms, 1) if first_token_ms is not None else None
+        })
+        
+        self._record_prompt_metrics(stage, usage)
+        metrics.increment(f"openai.{stage}.calls")
+        metrics.increment(f"openai.{stage}.prompt_tokens", usage['prompt_tokens'])
+        metrics.increment(f"openai.{stage}.completion_tokens", usage['completion_tokens'])
+        metrics.observe(f"openai.{stage}.latency_ms", latency_ms)
+        self.router.record_latency(model, latency_ms)
+        record_usage(usage, cache='miss')
+    
+    def _record_failed_call(self, stage: str, model: str, started: float, error: Exception) -> None:
+        """Record a failed OpenAI call in the usage ledger (calls rejected locally never reached OpenAI)"""
+        if isinstance(error, (QuotaExceededError, CircuitOpenError)):
+            return
+        record_usage({
+            'stage': stage,
+            'model': model,
+            'prompt_tokens': 0,
+            'completion_tokens': 0,
+            'latency_ms': round((time.monotonic() - started) * 1000, 1)
+        }, cache='miss', error=type(error).__name__)
+    
+    def _quota_tokens(self, messages: List[Dict[str, str]], max_tokens: int, prompt_meta: Dict[str, Any]) -> int:
+        """Tokens a call counts against the TPM quota: the prompt plus the completion limit"""
+        prompt_tokens = prompt_meta.get('prompt_tokens')
+        if prompt_tokens is None:
+            prompt_tokens = self.prompts.count_message_tokens(messages)
+        return prompt_tokens + max_tokens
+    
+    def _response_format(self, json_mode: bool) -> Dict[str, Any]:
+        """Extra completion arguments enabling JSON mode, if requested and configured"""
+        if json_mode and Config.OPENAI_JSON_MODE:
+            return {'response_format': {'type': 'json_object'}}
+        return {}
+    
+    def _record_prompt_metrics(self, stage: str, usage: Dict[str, Any]) -> None:
+        """Record prompt truncation and how far the local token estimate is off"""
+        if usage['truncated']:
+            metrics.increment(f"prompt.{stage}.truncated")
+        if usage['estimated_prompt_tokens'] and usage['prompt_tokens']:
+            metrics.observe(
+                f"prompt.{stage}.estimate_error_pct",
+                abs(usage['estimated_prompt_tokens'] - usage['prompt_tokens']) / usage['prompt_tokens'] * 100
+            )
+    
+    def _guarded(self, fn: Callable[[], Any]) -> Any:
+        """Make an OpenAI call through the circuit breaker, if enabled"""
+        return self.breaker.call(fn) if self.breaker is not None else fn()
+    
+    def _summarize_usage(self, mode: str, calls: List[Optional[Dict[str, Any]]], started: float) -> Dict[str, Any]:
+        """Aggregate per-call usage for one /analyze request and record it per mode"""
+        calls = [call for call in calls if call]
+        latency_ms = (time.monotonic() - started) * 1000
+        summary = {
+            'mode': mode,
+            'prompt_tokens': sum(call['prompt_tokens'] for call in calls),
+            'completion_tokens': sum(call['completion_tokens'] for call in calls),
+            'truncated': any(call.get('truncated') for call in calls),
+            'latency_ms': round(latency_ms, 1),
+            'calls': calls
         }
+        
+        metrics.increment(f"analysis.{mode}.requests")
+        metrics.increment(f"analysis.{mode}.prompt_tokens", summary['prompt_tokens'])
+        metrics.increment(f"analysis.{mode}.completion_tokens", summary['completion_tokens'])
+        metrics.observe(f"analysis.{mode}.latency_ms", latency_ms)
+        
+        return summary
     
-    def _analyze_filler_words(self, text: str) -> Dict[str, Any]:
-        """Analyze filler words in the response"""
-        filler_words = ['um', 'uh', 'like', 'you know', 'so', 'well', 'actually', 'basically', 'literally']
+    def _remaining(self, started: float, timeout: float) -> float:
+        """Seconds left of a timeout measured from a monotonic start time"""
+        return max(0.0, timeout - (time.monotonic() - started))
+    
+    def _parse_analysis_response(self, analysis_text: str) -> Dict[str, Any]:
+        """
+        Parse GPT-4 analysis response into structured data
+        
+        The JSON object is decoded (repairing a truncated one if needed) and
+        validated against the analysis schema. Fields lost to truncation are
+        listed in 'missing_fields' and filled from the local scores.
+        Responses that cannot be used fall back to default scores and are
+        counted, so wasted completions show up in /metrics.
+        """
+        analysis_data, repaired = extract_json_object(analysis_text or '')
+        if repaired:
+            metrics.increment('analysis.parse.repaired')
+        
+        if analysis_data is None:
+            metrics.increment('analysis.parse.failures')
+            logger.warning("Failed to parse analysis response: no JSON object found")
+            return self._get_default_analysis()
         
-        text_lower = text.lower()
-        filler_count = {}
-        total_fillers = 0
+        errors = validate_analysis(analysis_data, partial=repaired)
+        if errors:
+            metrics.increment('analysis.parse.failures')
+            metrics.increment('analysis.parse.schema_errors')
+            logger.warning(f"Analysis response failed schema validation: {'; '.join(errors[:3])}")
+            return self._get_default_analysis()
         
-        for filler in filler_words:
-            count = len(re.findall(r'\b' + re.escape(filler) + r'\b', text_lower))
-            if count > 0:
-                filler_count[filler] = count
-                total_fillers += count
+        metrics.increment('analysis.parse.success')
+        missing = [field for field in SCORE_DIMENSIONS + LIST_FIELDS if field not in analysis_data]
+        analysis_data = fill_analysis_defaults(analysis_data)
+        result = {
+            'detailed_feedback': analysis_data,
+            'suggestions': analysis_data['suggestions'],
+            'fallback': False
+        }
+        if missing:
+            result['missing_fields'] = missing
+        return result
+    
+    def _analyze_filler_words(self, text: str, language: Optional[str] = None) -> Dict[str, Any]:
+        """Analyze filler words in the response (single pass over the text)"""
+        filler_count = get_filler_matcher(language or Config.FILLER_LANGUAGE).count(text)
+        total_fillers = sum(filler_count.values())
         
         word_count = len(text.split())
         filler_percentage = (total_fillers / word_count * 100) if word_count > 0 else 0
@@ -266,5 +1478,6 @@ class AnalysisService:
                 'suggestions': ['Please try submitting your response again']
             },
             'suggestions': ['Please try submitting your response again'],
-            'overall_score': 7.0
+            'overall_score': 7.0,
+            'fallback': True
         }
\ No newline at end of file
@@ -0,0 +1,58 @@
+"""
+Word-level diff between two attempts at the same interview question
+"""
+
+import difflib
+import re
+from typing import Any, Dict, List
+
+WORD_PATTERN = re.compile(r'\S+')
+
+def diff_answers(previous: str, current: str, context_words: int = 6) -> Dict[str, Any]:
+    """
+    Find the passages that changed between two versions of an answer
+    
+    Words are compared exactly, so punctuation and casing edits count as
+    changes while whitespace-only edits do not.
+    
+    Args:
+        previous: Earlier version of the answer
+        current: Revised version of the answer
+        context_words: Unchanged words kept on each side of a change
+    
+    Returns:
+        Dict with 'changed_ratio' (share of words touched by edits, 0-1)
+        and 'spans', a list of dicts with 'before', 'after' and the
+        surrounding 'context_before' and 'context_after' words
+    """
+    old_words = WORD_PATTERN.findall(previous or '')
+    new_words = WORD_PATTERN.findall(current or '')
+    matcher = difflib.SequenceMatcher(None, old_words, new_words, autojunk=False)
+    
+    spans = []
+    changed = 0
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        changed += max(i2 - i1, j2 - j1)
+        spans.append({
+            'before': ' '.join(old_words[i1:i2]),
+            'after': ' '.join(new_words[j1:j2]),
+            'context_before': ' '.join(new_words[max(0, j1 - context_words):j1]),
+            'context_after': ' '.join(new_words[j2:j2 + context_words])
+        })
+    
+    total = max(len(old_words), len(new_words))
+    return {
+        'changed_ratio': round(changed / total, 3) if total else 0.0,
+        'spans': spans
+    }
+
+def format_spans(spans: List[Dict[str, str]]) -> str:
+    """Render changed spans as numbered lines for a prompt"""
+    lines = []
+    for number, span in enumerate(spans, 1):
+        before = f"\"{span['before']}\"" if span['before'] else '(nothing)'
+        after = f"\"{span['after']}\"" if span['after'] else '(removed)'
+        lines.append(f"{number}. ...{span['context_before']} [{before} -> {after}] {span['context_after']}...")
+    return '\n'.join(lines)
\ No newline at end of file
@@ -0,0 +1,288 @@
+"""
+Content-addressed result cache for AI analysis calls
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Iterator
+
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class MemoryStore:
+    """Bounded in-memory LRU store with per-entry TTL"""
+    
+    def __init__(self, max_entries: int = 1024):
+        """
+        Initialize the store
+        
+        Args:
+            max_entries: Maximum number of entries kept before evicting the least recently used
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Get a value, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """Store a value for ttl seconds, evicting the oldest entries if full"""
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                metrics.increment('cache.evictions')
+    
+    def delete(self, key: str) -> None:
+        """Remove a value if present"""
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+class SQLiteStore:
+    """
+    On-disk store backed by SQLite, shareable between gunicorn workers
+    
+    Every prune_every writes, the writing worker deletes expired entries
+    and, above max_entries, the entries closest to expiring.
+    """
+    
+    def __init__(self, path: str, max_entries: Optional[int] = None, prune_every: int = 100):
+        """
+        Initialize the store and create the cache table if needed
+        
+        Args:
+            path: Path of the SQLite database file
+            max_entries: Maximum number of entries kept on disk (None for no limit)
+            prune_every: Number of writes by this process between prunes
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache_entries '
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS cache_entries_expires_at ON cache_entries (expires_at)')
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Get a value, or None if missing or expired"""
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT value, expires_at FROM cache_entries WHERE key = ?', (key,)
+            ).fetchone()
+        
+        if row is None:
+            return None
+        
+        value, expires_at = row
+        if expires_at <= time.time():
+            self.delete(key)
+            return None
+        
+        return json.loads(value)
+    
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """Store a JSON-serializable value for ttl seconds"""
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, json.dumps(value), time.time() + ttl)
+            )
+        
+        with self._lock:
+            self._writes += 1
+            due = self._writes >= self.prune_every
+            if due:
+                self._writes = 0
+        if due:
+            removed = self.prune()
+            if removed:
+                metrics.increment('cache.disk_pruned', removed)
+    
+    def delete(self, key: str) -> None:
+        """Remove a value if present"""
+        with self._connect() as conn:
+            conn.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+    
+    def prune(self) -> int:
+        """Delete expired entries and any beyond max_entries, and return how many were removed"""
+        with self._connect() as conn:
+            removed = conn.execute('DELETE FROM cache_entries WHERE expires_at <= ?', (time.time(),)).rowcount
+            if self.max_entries is not None:
+                removed += conn.execute(
+                    'DELETE FROM cache_entries WHERE key IN '
+                    '(SELECT key FROM cache_entries ORDER BY expires_at DESC LIMIT -1 OFFSET ?)',
+                    (self.max_entries,)
+                ).rowcount
+            return removed
+    
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a short-lived connection (safe across threads and forked workers)"""
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+class AnalysisCache:
+    """Two-tier (memory, optional disk) cache keyed on normalized analysis inputs"""
+    
+    def __init__(self, memory_store: MemoryStore, disk_store: Optional[SQLiteStore] = None,
+                 ttl: float = 86400):
+        """
+        Initialize the cache
+        
+        Args:
+            memory_store: Fast in-process tier
+            disk_store: Optional persistent tier shared between workers
+            ttl: Entry lifetime in seconds
+        """
+        self.memory_store = memory_store
+        self.disk_store = disk_store
+        self.ttl = ttl
+    
+    @staticmethod
+    def make_key(kind: str, text: str, question: str, category: str, model: str, prompt_version: str) -> str:
+        """
+        Build a content-addressed cache key
+        
+        Args:
+            kind: Kind of cached result (e.g. 'analysis', 'follow_up')
+            text: User's interview response
+            question: Original interview question
+            category: Question category
+            model: OpenAI model name
+            prompt_version: Version of the prompts used to produce the result
+        
+        Returns:
+            Hex SHA-256 digest of the normalized inputs
+        """
+        payload = json.dumps(
+            [kind, normalize_text(text), normalize_text(question), category, model, prompt_version],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Look up a key in memory, then on disk (promoting disk hits to memory)"""
+        value = self.memory_store.get(key)
+        
+        if value is None and self.disk_store is not None:
+            try:
+                value = self.disk_store.get(key)
+            except sqlite3.Error as e:
+                logger.warning(f"Disk cache read failed: {str(e)}")
+                value = None
+            
+            if value is not None:
+                metrics.increment('cache.disk_hits')
+                self.memory_store.set(key, value, self.ttl)
+        
+        if value is None:
+            metrics.increment('cache.misses')
+            return None
+        
+        metrics.increment('cache.hits')
+        return copy.deepcopy(value)
+    
+    def on_disk(self, key: str) -> bool:
+        """Check the disk tier alone for a key (e.g. one another worker just stored)"""
+        if self.disk_store is None:
+            return False
+        try:
+            return self.disk_store.get(key) is not None
+        except sqlite3.Error as e:
+            logger.warning(f"Disk cache read failed: {str(e)}")
+            return False
+    
+    def set(self, key: str, value: Any) -> None:
+        """Store a value in every tier"""
+        self.memory_store.set(key, copy.deepcopy(value), self.ttl)
+        metrics.set_gauge('cache.size', len(self.memory_store))
+        
+        if self.disk_store is not None:
+            try:
+                self.disk_store.set(key, value, self.ttl)
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                logger.warning(f"Disk cache write failed: {str(e)}")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and current size"""
+        hits = metrics.counter('cache.hits')
+        misses = metrics.counter('cache.misses')
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'disk_hits': metrics.counter('cache.disk_hits'),
+            'evictions': metrics.counter('cache.evictions'),
+            'hit_rate': round(hits / total, 3) if total else 0.0,
+            'size': len(self.memory_store)
+        }
+
+def normalize_text(text: str) -> str:
+    """Normalize text for hashing: Unicode NFKC, trimmed, whitespace collapsed"""
+    text = unicodedata.normalize('NFKC', text or '')
+    return re.sub(r'\s+', ' ', text).strip()
+
+def create_analysis_cache(max_entries: int, ttl: float, disk_path: Optional[str] = None,
+                          disk_max_entries: Optional[int] = None) -> AnalysisCache:
+    """
+    Create an analysis cache from configuration values
+    
+    Args:
+        max_entries: Maximum entries in the in-memory tier
+        ttl: Entry lifetime in seconds
+        disk_path: Optional SQLite path for the on-disk tier
+        disk_max_entries: Maximum entries in the on-disk tier (None for no limit)
+    
+    Returns:
+        Configured AnalysisCache
+    """
+    disk_store = None
+    if disk_path:
+        try:
+            disk_store = SQLiteStore(disk_path, max_entries=disk_max_entries)
+        except sqlite3.Error as e:
+            logger.warning(f"Disk cache unavailable, using memory only: {str(e)}")
+    
+    return AnalysisCache(MemoryStore(max_entries), disk_store, ttl)
\ No newline at end of file
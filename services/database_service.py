@@ -12,6 +12,54 @@ import json
 
 logger = logging.getLogger(__name__)
 
+# Served when Firestore has no practice questions for a category and difficulty
+DEFAULT_QUESTIONS = {
+    'general': {
+        'beginner': [
+            {'id': 'gen_1', 'question': 'Tell me about yourself.', 'category': 'general', 'difficulty': 'beginner'},
+            {'id': 'gen_2', 'question': 'Why are you interested in this position?', 'category': 'general', 'difficulty': 'beginner'},
+            {'id': 'gen_3', 'question': 'What are your greatest strengths?', 'category': 'general', 'difficulty': 'beginner'},
+        ],
+        'intermediate': [
+            {'id': 'gen_4', 'question': 'Describe a challenging situation you faced and how you handled it.', 'category': 'general', 'difficulty': 'intermediate'},
+            {'id': 'gen_5', 'question': 'Where do you see yourself in 5 years?', 'category': 'general', 'difficulty': 'intermediate'},
+            {'id': 'gen_6', 'question': 'Why should we hire you over other candidates?', 'category': 'general', 'difficulty': 'intermediate'},
+        ],
+        'advanced': [
+            {'id': 'gen_7', 'question': 'How would you handle a situation where you disagree with your manager?', 'category': 'general', 'difficulty': 'advanced'},
+            {'id': 'gen_8', 'question': 'Describe a time when you had to make a difficult decision with limited information.', 'category': 'general', 'difficulty': 'advanced'},
+        ]
+    },
+    'behavioral': {
+        'beginner': [
+            {'id': 'beh_1', 'question': 'Tell me about a time you worked in a team.', 'category': 'behavioral', 'difficulty': 'beginner'},
+            {'id': 'beh_2', 'question': 'Describe a time when you helped a colleague.', 'category': 'behavioral', 'difficulty': 'beginner'},
+        ],
+        'intermediate': [
+            {'id': 'beh_3', 'question': 'Tell me about a time you had to deal with a difficult customer.', 'category': 'behavioral', 'difficulty': 'intermediate'},
+            {'id': 'beh_4', 'question': 'Describe a situation where you had to adapt to change.', 'category': 'behavioral', 'difficulty': 'intermediate'},
+        ],
+        'advanced': [
+            {'id': 'beh_5', 'question': 'Tell me about a time you had to influence someone without authority.', 'category': 'behavioral', 'difficulty': 'advanced'},
+            {'id': 'beh_6', 'question': 'Describe a time when you had to make an unpopular decision.', 'category': 'behavioral', 'difficulty': 'advanced'},
+        ]
+    },
+    'technical': {
+        'beginner': [
+            {'id': 'tech_1', 'question': 'What programming languages are you familiar with?', 'category': 'technical', 'difficulty': 'beginner'},
+            {'id': 'tech_2', 'question': 'Explain what a database is.', 'category': 'technical', 'difficulty': 'beginner'},
+        ],
+        'intermediate': [
+            {'id': 'tech_3', 'question': 'How would you optimize a slow-performing application?', 'category': 'technical', 'difficulty': 'intermediate'},
+            {'id': 'tech_4', 'question': 'Explain the difference between SQL and NoSQL databases.', 'category': 'technical', 'difficulty': 'intermediate'},
+        ],
+        'advanced': [
+            {'id': 'tech_5', 'question': 'Design a system that can handle millions of users.', 'category': 'technical', 'difficulty': 'advanced'},
+            {'id': 'tech_6', 'question': 'How would you implement a caching strategy for a web application?', 'category': 'technical', 'difficulty': 'advanced'},
+        ]
+    }
+}
+
 class DatabaseService:
     def __init__(self):
         """Initialize Firebase Firestore connection"""
@@ -151,6 +199,100 @@ class DatabaseService:
             logger.error(f"Failed to get session by ID: {str(e)}")
             raise
     
+    def get_latest_session_for_question(self, user_id: str, question: str,
+                                        max_age_hours: float = 24) -> Optional[Dict[str, Any]]:
+        """
+        Get the user's most recent session answering a question
+        
+        Only equality filters are used, so no composite index is needed;
+        the newest session is picked locally (a user answers the same
+        question a handful of times).
+        
+        Args:
+            user_id: User identifier
+            question: Question text, matched exactly
+            max_age_hours: Ignore sessions older than this
+            
+        Returns:
+            Session data or None if there is no recent session
+        """
+        try:
+            query = (self.db.collection('practice_sessions')
+                    .where('user_id', '==', user_id)
+                    .where('question', '==', question))
+            
+            cutoff = datetime.utcnow() - timedelta(hours=max_age_hours)
+            latest, latest_timestamp = None, None
+            for doc in query.stream():
+                session_data = doc.to_dict()
+                timestamp = session_data.get('timestamp')
+                if not isinstance(timestamp, datetime):
+                    continue
+                # Firestore returns timezone-aware UTC timestamps
+                timestamp = timestamp.replace(tzinfo=None)
+                if timestamp >= cutoff and (latest_timestamp is None or timestamp > latest_timestamp):
+                    latest, latest_timestamp = dict(session_data, id=doc.id), timestamp
+            
+            return self._prepare_from_firestore(latest) if latest else None
+            
+        except Exception as e:
+            logger.error(f"Failed to get latest session for question: {str(e)}")
+            raise
+    
+    def get_sessions_page(self, after_id: Optional[str] = None, limit: int = 200) -> List[Dict[str, Any]]:
+        """
+        Get one page of all users' practice sessions in document id order
+        
+        Args:
+            after_id: Id of the last session of the previous page (None for the first page)
+            limit: Maximum number of sessions to return
+            
+        Returns:
+            List of raw session documents with their 'id'
+        """
+        try:
+            query = self.db.collection('practice_sessions').order_by('__name__').limit(limit)
+            if after_id:
+                query = query.start_after({'__name__': after_id})
+            
+            return [dict(doc.to_dict(), id=doc.id) for doc in query.stream()]
+            
+        except Exception as e:
+            logger.error(f"Failed to get sessions page: {str(e)}")
+            raise
+    
+    def count_sessions(self) -> Optional[int]:
+        """Count all practice sessions, or None if the count aggregation is unavailable"""
+        try:
+            result = self.db.collection('practice_sessions').count().get()
+            return int(result[0][0].value)
+        except Exception as e:
+            logger.warning(f"Failed to count sessions: {str(e)}")
+            return None
+    
+    def save_session_rescores(self, version: str, rescores: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Store re-scored analyses of sessions under their rescores.<version> field
+        
+        Args:
+            version: Prompt version label (letters, digits, '-' and '_' only)
+            rescores: Session id -> re-scored analysis
+        """
+        try:
+            collection = self.db.collection('practice_sessions')
+            items = list(rescores.items())
+            # A Firestore batch holds at most 500 writes
+            for start in range(0, len(items), 500):
+                batch = self.db.batch()
+                for session_id, rescore in items[start:start + 500]:
+                    batch.update(collection.document(session_id),
+                                 {f"rescores.{version}": self._prepare_for_firestore(rescore)})
+                batch.commit()
+            
+        except Exception as e:
+            logger.error(f"Failed to save session rescores: {str(e)}")
+            raise
+    
     def get_user_statistics(self, user_id: str, period: str = 'month') -> Dict[str, Any]:
         """
         Get user's practice statistics for a given period
@@ -186,54 +328,7 @@ class DatabaseService:
             if not sessions:
                 return self._get_empty_stats()
             
-            # Calculate statistics
-            total_sessions = len(sessions)
-            scores = [s.get('analysis', {}).get('overall_score', 0) for s in sessions if s.get('analysis')]
-            average_score = sum(scores) / len(scores) if scores else 0
-            
-            # Calculate improvement trend (compare first half vs second half)
-            mid_point = len(scores) // 2
-            if mid_point > 0:
-                first_half_avg = sum(scores[:mid_point]) / mid_point
-                second_half_avg = sum(scores[mid_point:]) / (len(scores) - mid_point)
-                improvement_trend = ((second_half_avg - first_half_avg) / first_half_avg) * 100
-            else:
-                improvement_trend = 0
-            
-            # Category breakdown
-            category_breakdown = {}
-            for session in sessions:
-                category = session.get('category', 'general')
-                if category not in category_breakdown:
-                    category_breakdown[category] = {'count': 0, 'avg_score': 0, 'scores': []}
-                
-                category_breakdown[category]['count'] += 1
-                score = session.get('analysis', {}).get('overall_score', 0)
-                category_breakdown[category]['scores'].append(score)
-            
-            # Calculate average scores for each category
-            for category in category_breakdown:
-                scores_list = category_breakdown[category]['scores']
-                category_breakdown[category]['avg_score'] = sum(scores_list) / len(scores_list) if scores_list else 0
-                del category_breakdown[category]['scores']  # Remove raw scores from response
-            
-            # Recent scores for trend visualization
-            recent_scores = [
-                {
-                    'date': s.get('timestamp', now).isoformat() if isinstance(s.get('timestamp'), datetime) else str(s.get('timestamp', now)),
-                    'score': s.get('analysis', {}).get('overall_score', 0)
-                }
-                for s in sessions[-10:]  # Last 10 sessions
-            ]
-            
-            return {
-                'total_sessions': total_sessions,
-                'average_score': round(average_score, 1),
-                'improvement_trend': round(improvement_trend, 1),
-                'category_breakdown': category_breakdown,
-                'recent_scores': recent_scores,
-                'period': period
-            }
+            return summarize_sessions(sessions, period, now)
             
         except Exception as e:
             logger.error(f"Failed to get user statistics: {str(e)}")
@@ -277,6 +372,56 @@ class DatabaseService:
             logger.error(f"Failed to get practice questions: {str(e)}")
             return self._get_default_questions(category, difficulty, limit)
     
+    def get_all_practice_questions(self) -> List[Dict[str, Any]]:
+        """
+        Get the whole practice question catalog: Firestore questions and the defaults
+        
+        Returns:
+            List of question objects, one per distinct question text
+        """
+        questions = []
+        try:
+            for doc in self.db.collection('practice_questions').stream():
+                question_data = doc.to_dict()
+                question_data['id'] = doc.id
+                questions.append(question_data)
+        except Exception as e:
+            logger.error(f"Failed to list practice questions: {str(e)}")
+        
+        for levels in DEFAULT_QUESTIONS.values():
+            for level_questions in levels.values():
+                questions.extend(dict(question) for question in level_questions)
+        
+        unique = {}
+        for question in questions:
+            unique.setdefault(question['question'].strip().lower(), question)
+        return list(unique.values())
+    
+    def get_follow_up_pool(self) -> List[Dict[str, Any]]:
+        """
+        Get all precomputed follow-up pool entries
+        
+        Returns:
+            List of entries with 'question', 'category' and 'candidates'
+        """
+        return [doc.to_dict() for doc in self.db.collection('follow_up_pool').stream()]
+    
+    def save_follow_up_pool_entry(self, entry_id: str, entry: Dict[str, Any]) -> None:
+        """
+        Store (or replace) the precomputed follow-ups of one practice question
+        
+        Args:
+            entry_id: Document id derived from the question text
+            entry: Dict with 'question', 'category' and 'candidates'
+        """
+        try:
+            entry = self._prepare_for_firestore({**entry, 'updated_at': datetime.utcnow()})
+            self.db.collection('follow_up_pool').document(entry_id).set(entry)
+            
+        except Exception as e:
+            logger.error(f"Failed to save follow-up pool entry: {str(e)}")
+            raise
+    
     def save_feedback(self, feedback_data: Dict[str, Any]) -> str:
         """
         Save user feedback to Firestore
@@ -306,6 +451,44 @@ class DatabaseService:
             logger.error(f"Failed to save feedback: {str(e)}")
             raise
     
+    def save_usage_records(self, records: List[Dict[str, Any]]) -> None:
+        """
+        Store a batch of usage ledger records
+        
+        Args:
+            records: Ledger records (see services/usage_ledger.py)
+        """
+        try:
+            collection = self.db.collection('llm_usage')
+            # A Firestore batch holds at most 500 writes
+            for start in range(0, len(records), 500):
+                batch = self.db.batch()
+                for record in records[start:start + 500]:
+                    batch.set(collection.document(), self._prepare_for_firestore(record))
+                batch.commit()
+            
+        except Exception as e:
+            logger.error(f"Failed to save usage records: {str(e)}")
+            raise
+    
+    def get_usage_records(self, user_id: str, days: int = 7) -> List[Dict[str, Any]]:
+        """
+        Get a user's usage ledger records of the last days
+        
+        Args:
+            user_id: User identifier
+            days: Number of days to look back
+            
+        Returns:
+            List of records with datetime 'created_at', oldest first
+        """
+        start_date = datetime.utcnow() - timedelta(days=days)
+        query = (self.db.collection('llm_usage')
+                .where('user_id', '==', user_id)
+                .where('created_at', '>=', start_date)
+                .order_by('created_at'))
+        return [doc.to_dict() for doc in query.stream()]
+    
     def _prepare_for_firestore(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Prepare data for Firestore by converting datetime objects"""
         if isinstance(data, dict):
@@ -349,52 +532,66 @@ class DatabaseService:
     
     def _get_default_questions(self, category: str, difficulty: str, limit: int) -> List[Dict[str, Any]]:
         """Return default questions if none found in database"""
-        default_questions = {
-            'general': {
-                'beginner': [
-                    {'id': 'gen_1', 'question': 'Tell me about yourself.', 'category': 'general', 'difficulty': 'beginner'},
-                    {'id': 'gen_2', 'question': 'Why are you interested in this position?', 'category': 'general', 'difficulty': 'beginner'},
-                    {'id': 'gen_3', 'question': 'What are your greatest strengths?', 'category': 'general', 'difficulty': 'beginner'},
-                ],
-                'intermediate': [
-                    {'id': 'gen_4', 'question': 'Describe a challenging situation you faced and how you handled it.', 'category': 'general', 'difficulty': 'intermediate'},
-                    {'id': 'gen_5', 'question': 'Where do you see yourself in 5 years?', 'category': 'general', 'difficulty': 'intermediate'},
-                    {'id': 'gen_6', 'question': 'Why should we hire you over other candidates?', 'category': 'general', 'difficulty': 'intermediate'},
-                ],
-                'advanced': [
-                    {'id': 'gen_7', 'question': 'How would you handle a situation where you disagree with your manager?', 'category': 'general', 'difficulty': 'advanced'},
-                    {'id': 'gen_8', 'question': 'Describe a time when you had to make a difficult decision with limited information.', 'category': 'general', 'difficulty': 'advanced'},
-                ]
-            },
-            'behavioral': {
-                'beginner': [
-                    {'id': 'beh_1', 'question': 'Tell me about a time you worked in a team.', 'category': 'behavioral', 'difficulty': 'beginner'},
-                    {'id': 'beh_2', 'question': 'Describe a time when you helped a colleague.', 'category': 'behavioral', 'difficulty': 'beginner'},
-                ],
-                'intermediate': [
-                    {'id': 'beh_3', 'question': 'Tell me about a time you had to deal with a difficult customer.', 'category': 'behavioral', 'difficulty': 'intermediate'},
-                    {'id': 'beh_4', 'question': 'Describe a situation where you had to adapt to change.', 'category': 'behavioral', 'difficulty': 'intermediate'},
-                ],
-                'advanced': [
-                    {'id': 'beh_5', 'question': 'Tell me about a time you had to influence someone without authority.', 'category': 'behavioral', 'difficulty': 'advanced'},
-                    {'id': 'beh_6', 'question': 'Describe a time when you had to make an unpopular decision.', 'category': 'behavioral', 'difficulty': 'advanced'},
-                ]
-            },
-            'technical': {
-                'beginner': [
-                    {'id': 'tech_1', 'question': 'What programming languages are you familiar with?', 'category': 'technical', 'difficulty': 'beginner'},
-                    {'id': 'tech_2', 'question': 'Explain what a database is.', 'category': 'technical', 'difficulty': 'beginner'},
-                ],
-                'intermediate': [
-                    {'id': 'tech_3', 'question': 'How would you optimize a slow-performing application?', 'category': 'technical', 'difficulty': 'intermediate'},
-                    {'id': 'tech_4', 'question': 'Explain the difference between SQL and NoSQL databases.', 'category': 'technical', 'difficulty': 'intermediate'},
-                ],
-                'advanced': [
-                    {'id': 'tech_5', 'question': 'Design a system that can handle millions of users.', 'category': 'technical', 'difficulty': 'advanced'},
-                    {'id': 'tech_6', 'question': 'How would you implement a caching strategy for a web application?', 'category': 'technical', 'difficulty': 'advanced'},
-                ]
-            }
-        }
+        questions = DEFAULT_QUESTIONS.get(category, {}).get(difficulty, [])
+        return questions[:limit]
+
+def summarize_sessions(sessions: List[Dict[str, Any]], period: str, now: datetime) -> Dict[str, Any]:
+    """
+    Aggregate practice statistics from sessions ordered by timestamp
+    
+    Args:
+        sessions: Non-empty list of session documents, oldest first
+        period: Time period the sessions were selected for
+        now: Reference time used for sessions without a timestamp
+        
+    Returns:
+        Dictionary containing statistics
+    """
+    # Calculate statistics
+    total_sessions = len(sessions)
+    scores = [s.get('analysis', {}).get('overall_score', 0) for s in sessions if s.get('analysis')]
+    average_score = sum(scores) / len(scores) if scores else 0
+    
+    # Calculate improvement trend (compare first half vs second half)
+    mid_point = len(scores) // 2
+    if mid_point > 0:
+        first_half_avg = sum(scores[:mid_point]) / mid_point
+        second_half_avg = sum(scores[mid_point:]) / (len(scores) - mid_point)
+        improvement_trend = ((second_half_avg - first_half_avg) / first_half_avg) * 100
+    else:
+        improvement_trend = 0
+    
+    # Category breakdown
+    category_breakdown = {}
+    for session in sessions:
+        category = session.get('category', 'general')
+        if category not in category_breakdown:
+            category_breakdown[category] = {'count': 0, 'avg_score': 0, 'scores': []}
         
-        questions = default_questions.get(category, {}).get(difficulty, [])
-        return questions[:limit]
\ No newline at end of file
+        category_breakdown[category]['count'] += 1
+        score = session.get('analysis', {}).get('overall_score', 0)
+        category_breakdown[category]['scores'].append(score)
+    
+    # Calculate average scores for each category
+    for category in category_breakdown:
+        scores_list = category_breakdown[category]['scores']
+        category_breakdown[category]['avg_score'] = sum(scores_list) / len(scores_list) if scores_list else 0
+        del category_breakdown[category]['scores']  # Remove raw scores from response
+    
+    # Recent scores for trend visualization
+    recent_scores = [
+        {
+            'date': s.get('timestamp', now).isoformat() if isinstance(s.get('timestamp'), datetime) else str(s.get('timestamp', now)),
+            'score': s.get('analysis', {}).get('overall_score', 0)
+        }
+        for s in sessions[-10:]  # Last 10 sessions
+    ]
+    
+    return {
+        'total_sessions': total_sessions,
+        'average_score': round(average_score, 1),
+        'improvement_trend': round(improvement_trend, 1),
+        'category_breakdown': category_breakdown,
+        'recent_scores': recent_scores,
+        'period': period
+    }
\ No newline at end of file
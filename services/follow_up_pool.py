@@ -0,0 +1,184 @@
+"""
+Precomputed follow-up questions per practice question, matched to answers by keyword overlap
+"""
+
+import hashlib
+import logging
+import re
+import threading
+import time
+from typing import Dict, Any, List, Optional, Callable, FrozenSet
+
+from services.cache_service import normalize_text
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Common English words that say nothing about what an answer is about
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below
+between both but by can could did do does doing done down during each even ever every few for from further
+get got had has have having he her here hers him his how i if in into is it its itself just know like make
+made me more most much my myself no nor not now of off on once only or other our ours out over own really
+same she should so some such than that the their them then there these they thing things think this those
+through to too under until up us very was way we well were what when where which while who whom why will
+with would yes you your yours
+""".split())
+
+def extract_keywords(text: str) -> FrozenSet[str]:
+    """
+    Reduce text to a set of lowercase content-word stems
+    
+    Stopwords and words shorter than three letters are dropped and common
+    inflections are stripped, so 'managed', 'managing' and 'manages' match.
+    """
+    words = re.findall(r"[a-z]+", (text or '').lower())
+    return frozenset(_stem(word) for word in words if len(word) >= 3 and word not in STOPWORDS)
+
+def question_key(question: str) -> str:
+    """Stable document id for a practice question, independent of case and whitespace"""
+    return hashlib.sha256(normalize_text(question).lower().encode('utf-8')).hexdigest()[:32]
+
+def _stem(word: str) -> str:
+    """Strip a common English suffix, keeping at least a four-letter stem"""
+    for suffix in ('ing', 'ed', 'es', 's'):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[:-len(suffix)]
+    return word
+
+class FollowUpPool:
+    """
+    In-memory index of pre-generated follow-up candidates, refreshed from storage
+    
+    Each pool entry holds the candidates generated for one practice
+    question. A candidate matches an answer when enough of its trigger
+    keywords appear in the answer; words that occur in the practice
+    question itself are ignored since answers routinely echo them.
+    """
+    
+    def __init__(self, loader: Callable[[], List[Dict[str, Any]]], refresh_seconds: float = 3600,
+                 min_score: float = 0.25, min_overlap: int = 2):
+        """
+        Initialize the pool
+        
+        Args:
+            loader: Callable returning all stored pool entries
+            refresh_seconds: Seconds between reloads from storage
+            min_score: Minimum share of a candidate's keywords found in the answer
+            min_overlap: Minimum number of a candidate's keywords found in the answer
+        """
+        self.loader = loader
+        self.refresh_seconds = refresh_seconds
+        self.min_score = min_score
+        self.min_overlap = min_overlap
+        self._index = {}
+        self._loaded_at = None
+        self._refresh_lock = threading.Lock()
+    
+    def match(self, question: str, answer: str) -> Optional[Dict[str, Any]]:
+        """
+        Find the precomputed follow-up that best fits an answer
+        
+        Args:
+            question: Original interview question
+            answer: User's response
+        
+        Returns:
+            Dict with the follow-up 'question' and its match 'score', or None if
+            the question has no pool entry or no candidate matches well enough
+        """
+        candidates = self._candidates(question)
+        if not candidates:
+            metrics.increment('follow_up_pool.unknown_question')
+            return None
+        
+        best = self._best(candidates, extract_keywords(answer))
+        if best['overlap'] < self.min_overlap or best['score'] < self.min_score:
+            metrics.increment('follow_up_pool.misses')
+            return None
+        
+        metrics.increment('follow_up_pool.hits')
+        return {'question': best['question'], 'score': best['score']}
+    
+    def fallback(self, question: str, answer: str) -> Optional[str]:
+        """
+        Get the closest precomputed follow-up regardless of match quality
+        
+        Used when a live follow-up cannot be produced: a question-specific
+        candidate is still better than a generic one.
+        
+        Args:
+            question: Original interview question
+            answer: User's response
+        
+        Returns:
+            Follow-up question, or None if the question has no pool entry
+        """
+        candidates = self._candidates(question)
+        if not candidates:
+            return None
+        return self._best(candidates, extract_keywords(answer))['question']
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get the number of indexed questions and candidates"""
+        index = self._index
+        return {
+            'questions': len(index),
+            'candidates': sum(len(candidates) for candidates in index.values()),
+            'loaded_at': self._loaded_at
+        }
+    
+    def refresh(self) -> None:
+        """Reload all entries from storage, keeping the current index if loading fails"""
+        try:
+            entries = self.loader()
+        except Exception as e:
+            logger.warning(f"Failed to load follow-up pool: {str(e)}")
+            self._loaded_at = time.time()
+            return
+        
+        index = {}
+        for entry in entries:
+            ignored = extract_keywords(entry['question'])
+            index[question_key(entry['question'])] = [
+                {
+                    'question': candidate['question'],
+                    'keywords': (extract_keywords(' '.join(candidate.get('keywords', []))) |
+                                 extract_keywords(candidate['question'])) - ignored
+                }
+                for candidate in entry.get('candidates', [])
+                if candidate.get('question')
+            ]
+        
+        self._index = index
+        self._loaded_at = time.time()
+        logger.info(f"Loaded follow-up pool for {len(index)} questions")
+    
+    def _candidates(self, question: str) -> List[Dict[str, Any]]:
+        """Candidates stored for a question, reloading the index when it is stale"""
+        if not question:
+            return []
+        
+        if self._stale():
+            # One thread reloads; the others keep serving the current index (or wait for the first load)
+            if self._refresh_lock.acquire(blocking=self._loaded_at is None):
+                try:
+                    if self._stale():
+                        self.refresh()
+                finally:
+                    self._refresh_lock.release()
+        
+        return self._index.get(question_key(question), [])
+    
+    def _stale(self) -> bool:
+        """True if the index was never loaded or is older than the refresh interval"""
+        return self._loaded_at is None or time.time() - self._loaded_at > self.refresh_seconds
+    
+    def _best(self, candidates: List[Dict[str, Any]], answer_keywords: FrozenSet[str]) -> Dict[str, Any]:
+        """Candidate sharing the most keywords with the answer, relative to its own keyword count"""
+        scored = []
+        for candidate in candidates:
+            overlap = len(candidate['keywords'] & answer_keywords)
+            score = overlap / len(candidate['keywords']) if candidate['keywords'] else 0.0
+            scored.append({'question': candidate['question'], 'score': round(score, 3), 'overlap': overlap})
+        return max(scored, key=lambda candidate: (candidate['score'], candidate['overlap']))
\ No newline at end of file
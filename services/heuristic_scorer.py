@@ -0,0 +1,272 @@
+"""
+Deterministic local scoring of interview responses, used for provisional and degraded-mode results
+"""
+
+import math
+import re
+import statistics
+from typing import Dict, Any, List, Optional
+
+from utils.filler_words import TermMatcher
+
+# STAR-structure cue phrases (Situation, Task, Action, Result)
+STAR_CUES = {
+    'situation': [
+        'when i was', 'at my previous', 'at my last', 'in my previous', 'in my last', 'situation',
+        'while working', 'we were', 'the project', 'the company', 'last year', 'once'
+    ],
+    'task': [
+        'my role', 'i was responsible', 'responsible for', 'my goal', 'the goal', 'task', 'needed to',
+        'had to', 'challenge was', 'objective', 'i was asked'
+    ],
+    'action': [
+        'i decided', 'i implemented', 'i led', 'i built', 'i created', 'i organized', 'i proposed',
+        'i designed', 'i worked with', 'i reached out', 'i analyzed', 'i started', 'i set up', 'i took'
+    ],
+    'result': [
+        'as a result', 'resulted in', 'result', 'outcome', 'increased', 'reduced', 'improved',
+        'saved', 'delivered', 'achieved', 'learned', 'in the end', 'percent', '%'
+    ]
+}
+
+HEDGING_PHRASES = [
+    'i think', 'i guess', 'maybe', 'probably', 'kind of', 'sort of', 'not sure', 'i suppose',
+    'hopefully', 'i believe', 'might', 'perhaps'
+]
+
+INFORMAL_TERMS = [
+    'gonna', 'wanna', 'gotta', 'kinda', 'sorta', 'yeah', 'nope', 'stuff', 'dude', 'awesome',
+    'cool', 'crap', 'damn', 'lol', 'whatever'
+]
+
+# Ideal answer length in words per category (lower, upper)
+IDEAL_WORD_COUNT = {
+    'technical': (150, 500),
+    'behavioral': (150, 400),
+    'general': (100, 350)
+}
+
+class HeuristicScorer:
+    def __init__(self):
+        """Compile the cue matchers once"""
+        self.star_matchers = {stage: TermMatcher(cues) for stage, cues in STAR_CUES.items()}
+        self.hedging_matcher = TermMatcher(HEDGING_PHRASES)
+        self.informal_matcher = TermMatcher(INFORMAL_TERMS)
+    
+    def score(self, text: str, question: str = "", category: str = "general",
+              filler_analysis: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Score a response locally with the same shape as an LLM analysis
+        
+        Args:
+            text: User's interview response
+            question: Original interview question
+            category: Question category
+            filler_analysis: Result of the filler word analysis, if already computed
+        
+        Returns:
+            Dict with 'detailed_feedback', 'suggestions', 'overall_score' and
+            'provisional' set to True
+        """
+        features = self.extract_features(text)
+        filler_score = filler_analysis['score'] if filler_analysis else 10
+        
+        content = self._score_content(features, category)
+        clarity = self._score_clarity(features)
+        confidence = self._score_confidence(features, filler_score)
+        structure = self._score_structure(features, category)
+        professionalism = self._score_professionalism(features, filler_score)
+        
+        detailed_feedback = {
+            'content_quality': content,
+            'communication_clarity': clarity,
+            'confidence_level': confidence,
+            'structure_organization': structure,
+            'professionalism': professionalism,
+            'strengths': self._strengths(features, detailed=[content, clarity, confidence, structure, professionalism]),
+            'areas_for_improvement': self._improvements(features, category),
+            'suggestions': self._suggestions(features, category)
+        }
+        if filler_analysis:
+            detailed_feedback['filler_words'] = filler_analysis
+        
+        scores = [value['score'] for value in detailed_feedback.values() if isinstance(value, dict) and 'score' in value]
+        
+        return {
+            'detailed_feedback': detailed_feedback,
+            'suggestions': detailed_feedback['suggestions'],
+            'overall_score': round(sum(scores) / len(scores), 1),
+            'provisional': True
+        }
+    
+    def extract_features(self, text: str) -> Dict[str, Any]:
+        """
+        Compute the text features the scores are based on
+        
+        Args:
+            text: User's interview response
+        
+        Returns:
+            Dict of word count, lexical diversity, sentence statistics and cue counts
+        """
+        words = re.findall(r"[a-zA-Z']+", text.lower())
+        word_count = len(words)
+        sentences = [s for s in re.split(r'[.!?]+', text) if s.strip()]
+        sentence_lengths = [len(s.split()) for s in sentences] or [word_count]
+        
+        star_stages = {stage: matcher.total(text) for stage, matcher in self.star_matchers.items()}
+        
+        return {
+            'word_count': word_count,
+            # Root type-token ratio is far less length-sensitive than plain TTR
+            'lexical_diversity': len(set(words)) / math.sqrt(word_count) if word_count else 0.0,
+            'sentence_count': len(sentences),
+            'mean_sentence_length': statistics.mean(sentence_lengths),
+            'sentence_length_stdev': statistics.pstdev(sentence_lengths),
+            'star_stages': star_stages,
+            'star_coverage': sum(1 for count in star_stages.values() if count > 0),
+            'hedges': self.hedging_matcher.total(text),
+            'informal_terms': self.informal_matcher.total(text),
+            'specifics': len(re.findall(r'\d+', text)),
+            'first_person_actions': star_stages['action']
+        }
+    
+    def _score_content(self, features: Dict[str, Any], category: str) -> Dict[str, Any]:
+        """Score content quality from length, specifics and lexical diversity"""
+        lower, upper = IDEAL_WORD_COUNT.get(category, IDEAL_WORD_COUNT['general'])
+        word_count = features['word_count']
+        
+        score = 6.0
+        if word_count < lower * 0.4:
+            score -= 3
+            feedback = 'The answer is very short; add more substance and concrete detail.'
+        elif word_count < lower:
+            score -= 1
+            feedback = 'The answer could use more depth and supporting detail.'
+        elif word_count > upper * 1.5:
+            score -= 1
+            feedback = 'The answer is long; focus on the most relevant points.'
+        else:
+            score += 1
+            feedback = 'The answer has a good amount of substance.'
+        
+        score += min(features['specifics'], 3) * 0.5
+        score += self._clamp((features['lexical_diversity'] - 5) / 2, -1, 1.5)
+        return {'score': self._to_score(score), 'feedback': feedback}
+    
+    def _score_clarity(self, features: Dict[str, Any]) -> Dict[str, Any]:
+        """Score communication clarity from sentence length and its variance"""
+        mean_length = features['mean_sentence_length']
+        stdev = features['sentence_length_stdev']
+        
+        score = 8.0
+        if mean_length > 30:
+            score -= 3
+            feedback = 'Sentences are very long; break ideas into shorter sentences.'
+        elif mean_length > 22:
+            score -= 1.5
+            feedback = 'Some sentences run long; shorter sentences would be easier to follow.'
+        elif mean_length < 6:
+            score -= 1.5
+            feedback = 'Sentences are very short and choppy; connect related ideas.'
+        else:
+            feedback = 'Sentence length is easy to follow.'
+        
+        # Some variety keeps the answer engaging, extreme variance reads as rambling
+        if features['sentence_count'] > 2:
+            if stdev < 2:
+                score -= 0.5
+            elif stdev > 15:
+                score -= 1
+        return {'score': self._to_score(score), 'feedback': feedback}
+    
+    def _score_confidence(self, features: Dict[str, Any], filler_score: float) -> Dict[str, Any]:
+        """Score confidence from first-person actions, hedging and fillers"""
+        hedge_rate = features['hedges'] / max(features['word_count'], 1) * 100
+        
+        score = 7.0 + min(features['first_person_actions'], 3) * 0.5
+        score -= min(hedge_rate, 5) * 0.6
+        score -= (10 - filler_score) * 0.25
+        
+        if hedge_rate > 2:
+            feedback = 'Frequent hedging ("I think", "maybe") weakens your message; state your points directly.'
+        elif features['first_person_actions']:
+            feedback = 'You describe your own actions with conviction.'
+        else:
+            feedback = 'Describe what you personally did to sound more confident.'
+        return {'score': self._to_score(score), 'feedback': feedback}
+    
+    def _score_structure(self, features: Dict[str, Any], category: str) -> Dict[str, Any]:
+        """Score structure from STAR cue coverage"""
+        coverage = features['star_coverage']
+        
+        if category in ('behavioral', 'situational', 'leadership'):
+            score = 3.0 + coverage * 1.5
+        else:
+            score = 5.0 + coverage
+        if features['sentence_count'] >= 3:
+            score += 0.5
+        
+        if coverage >= 3:
+            feedback = 'The answer follows a clear situation-task-action-result structure.'
+        else:
+            missing = [stage for stage, count in features['star_stages'].items() if count == 0]
+            feedback = f"Consider structuring with STAR; missing: {', '.join(missing)}."
+        return {'score': self._to_score(score), 'feedback': feedback}
+    
+    def _score_professionalism(self, features: Dict[str, Any], filler_score: float) -> Dict[str, Any]:
+        """Score professionalism from informal language and fillers"""
+        score = 9.0 - min(features['informal_terms'], 4) - (10 - filler_score) * 0.2
+        
+        if features['informal_terms']:
+            feedback = 'Avoid informal language and slang in interview answers.'
+        else:
+            feedback = 'Tone and language are professional.'
+        return {'score': self._to_score(score), 'feedback': feedback}
+    
+    def _strengths(self, features: Dict[str, Any], detailed: List[Dict[str, Any]]) -> List[str]:
+        """List strengths found in the features"""
+        strengths = []
+        if features['star_coverage'] >= 3:
+            strengths.append('Well-structured answer')
+        if features['specifics']:
+            strengths.append('Uses concrete numbers or specifics')
+        if features['first_person_actions']:
+            strengths.append('Clearly describes personal actions')
+        if not strengths:
+            best = max(detailed, key=lambda value: value['score'])
+            strengths.append(best['feedback'])
+        return strengths
+    
+    def _improvements(self, features: Dict[str, Any], category: str) -> List[str]:
+        """List areas for improvement found in the features"""
+        improvements = []
+        if features['star_coverage'] < 3:
+            improvements.append('Cover situation, task, action and result')
+        if not features['specifics']:
+            improvements.append('Quantify your impact')
+        if features['hedges']:
+            improvements.append('Reduce hedging language')
+        return improvements or ['Keep practicing to refine delivery']
+    
+    def _suggestions(self, features: Dict[str, Any], category: str) -> List[str]:
+        """List specific suggestions for the weakest features"""
+        suggestions = []
+        missing = [stage for stage, count in features['star_stages'].items() if count == 0]
+        if missing:
+            suggestions.append(f"Add the {' and '.join(missing)} part of your story using the STAR method")
+        if not features['specifics']:
+            suggestions.append('Include a measurable result, such as a percentage or time saved')
+        if features['mean_sentence_length'] > 22:
+            suggestions.append('Break long sentences into shorter ones')
+        if features['hedges']:
+            suggestions.append('Replace phrases like "I think" with direct statements')
+        return suggestions or ['Practice delivering this answer aloud to polish your pacing']
+    
+    def _to_score(self, value: float) -> int:
+        """Round and clamp a raw value to an integer score between 1 and 10"""
+        return int(round(self._clamp(value, 1, 10)))
+    
+    def _clamp(self, value: float, lower: float, upper: float) -> float:
+        """Clamp a value to the range [lower, upper]"""
+        return max(lower, min(upper, value))
\ No newline at end of file
@@ -0,0 +1,347 @@
+"""
+Background job queue for slow analysis and transcription requests
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Callable, Iterator, Tuple
+from urllib.parse import urlparse
+
+import requests
+
+from utils.metrics import metrics
+from utils.validators import is_allowed_callback_host
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+
+FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED)
+
+class JobQueueFullError(Exception):
+    """Raised when too many jobs are waiting for a worker; answered with HTTP 503"""
+    
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class MemoryJobStore:
+    """In-process job store (jobs are only visible to the worker that accepted them)"""
+    
+    def __init__(self, ttl: float = 86400):
+        """
+        Initialize the store
+        
+        Args:
+            ttl: Seconds a job is kept after its last update
+        """
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+    
+    def create(self, job: Dict[str, Any]) -> None:
+        """Store a new job"""
+        with self._lock:
+            self._prune()
+            self._jobs[job['id']] = dict(job)
+    
+    def update(self, job_id: str, **fields) -> None:
+        """Update fields of a job"""
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields, updated_at=time.time())
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a copy of a job, or None if unknown or expired"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+    
+    def _prune(self) -> None:
+        """Drop jobs not updated within the TTL"""
+        cutoff = time.time() - self.ttl
+        for job_id in [job_id for job_id, job in self._jobs.items() if job['updated_at'] < cutoff]:
+            del self._jobs[job_id]
+
+class SQLiteJobStore:
+    """On-disk job store shared between gunicorn workers"""
+    
+    def __init__(self, path: str, ttl: float = 86400):
+        """
+        Initialize the store and create the jobs table if needed
+        
+        Args:
+            path: Path of the SQLite database file
+            ttl: Seconds a job is kept after its last update
+        """
+        self.path = path
+        self.ttl = ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs '
+                '(id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)'
+            )
+    
+    def create(self, job: Dict[str, Any]) -> None:
+        """Store a new job and prune expired ones"""
+        with self._connect() as conn:
+            conn.execute('DELETE FROM jobs WHERE updated_at < ?', (time.time() - self.ttl,))
+            conn.execute(
+                'INSERT INTO jobs (id, data, updated_at) VALUES (?, ?, ?)',
+                (job['id'], json.dumps(job), job['updated_at'])
+            )
+    
+    def update(self, job_id: str, **fields) -> None:
+        """Update fields of a job"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT data FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is None:
+                return
+            job = json.loads(row[0])
+            job.update(fields, updated_at=time.time())
+            conn.execute(
+                'UPDATE jobs SET data = ?, updated_at = ? WHERE id = ?',
+                (json.dumps(job), job['updated_at'], job_id)
+            )
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job, or None if unknown"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT data FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a short-lived connection (safe across threads and forked workers)"""
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+class JobService:
+    """Run callables on a local worker pool and track them as pollable jobs"""
+    
+    def __init__(self, store, max_workers: int = 4, callback_timeout: float = 10,
+                 callback_secret: Optional[str] = None, callback_allowed_hosts: Tuple[str, ...] = (),
+                 max_queued: int = 100):
+        """
+        Initialize the job service
+        
+        Args:
+            store: MemoryJobStore or SQLiteJobStore
+            max_workers: Number of jobs run concurrently per process
+            max_queued: Number of jobs allowed to wait for a worker per process before refusing new ones
+            callback_timeout: Timeout in seconds for webhook deliveries
+            callback_secret: Optional key used to sign webhook payloads (HMAC-SHA256)
+            callback_allowed_hosts: Host names webhooks are restricted to (empty for any public host)
+        """
+        self.store = store
+        self.callback_timeout = callback_timeout
+        self.callback_secret = callback_secret
+        self.callback_allowed_hosts = callback_allowed_hosts
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._queued = 0
+        self._lock = threading.Lock()
+    
+    def submit(self, kind: str, func: Callable[..., Any], *args, user_id: Optional[str] = None,
+               callback_url: Optional[str] = None, cleanup: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+        """
+        Queue a job and return immediately
+        
+        Args:
+            kind: Job type (e.g. 'analyze', 'transcribe')
+            func: Callable producing the JSON-serializable job result
+            *args: Arguments passed to func
+            user_id: Owner of the job, checked when it is polled
+            callback_url: Optional URL that receives the finished job as a POST
+            cleanup: Optional callable run after the job finishes (e.g. temp file removal)
+        
+        Returns:
+            The queued job record
+        
+        Raises:
+            JobQueueFullError: If max_queued jobs of this process are already waiting
+        """
+        with self._lock:
+            if self._queued >= self.max_queued:
+                metrics.increment(f"jobs.{kind}.rejected")
+                raise JobQueueFullError(f"{self._queued} jobs are waiting for a worker", self._drain_seconds(kind))
+            self._queued += 1
+            metrics.set_gauge('jobs.queued', self._queued)
+        
+        now = time.time()
+        job = {
+            'id': uuid.uuid4().hex,
+            'kind': kind,
+            'status': JOB_QUEUED,
+            'user_id': user_id,
+            'callback_url': callback_url,
+            'result': None,
+            'error': None,
+            'pid': os.getpid(),
+            'created_at': now,
+            'updated_at': now
+        }
+        try:
+            self.store.create(job)
+            self.executor.submit(self._run, job, func, args, cleanup)
+        except Exception:
+            self._dequeue()
+            raise
+        metrics.increment(f"jobs.{kind}.submitted")
+        return job
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a job by id
+        
+        Unfinished jobs owned by a worker process that no longer exists are
+        reported as failed, since nothing will ever finish them.
+        
+        Args:
+            job_id: Job id returned by submit
+        
+        Returns:
+            The job record, or None if unknown
+        """
+        job = self.store.get(job_id)
+        if job and job['status'] not in FINISHED_STATES and not self._process_alive(job['pid']):
+            self.store.update(job_id, status=JOB_FAILED, error='Worker exited before the job finished')
+            job = self.store.get(job_id)
+        return job
+    
+    def _run(self, job: Dict[str, Any], func: Callable[..., Any], args: tuple,
+             cleanup: Optional[Callable[[], None]]) -> None:
+        """Run one job, record its outcome and deliver the callback"""
+        self._dequeue()
+        kind = job['kind']
+        started = time.monotonic()
+        metrics.observe(f"jobs.{kind}.queue_ms", (time.time() - job['created_at']) * 1000)
+        self.store.update(job['id'], status=JOB_RUNNING)
+        
+        try:
+            result = func(*args)
+            self.store.update(job['id'], status=JOB_SUCCEEDED, result=result)
+            metrics.increment(f"jobs.{kind}.succeeded")
+        except Exception as e:
+            logger.error(f"Job {job['id']} ({kind}) failed: {str(e)}")
+            self.store.update(job['id'], status=JOB_FAILED, error=str(e))
+            metrics.increment(f"jobs.{kind}.failed")
+        finally:
+            metrics.observe(f"jobs.{kind}.run_ms", (time.monotonic() - started) * 1000)
+            if cleanup:
+                try:
+                    cleanup()
+                except Exception as e:
+                    logger.warning(f"Job {job['id']} cleanup failed: {str(e)}")
+        
+        if job['callback_url']:
+            self._deliver_callback(self.store.get(job['id']))
+    
+    def _deliver_callback(self, job: Dict[str, Any]) -> None:
+        """POST the finished job to its callback URL (best effort, no retries)"""
+        # The host may resolve differently than when the job was submitted
+        if not is_allowed_callback_host(urlparse(job['callback_url']).hostname or '', self.callback_allowed_hosts):
+            logger.warning(f"Callback for job {job['id']} refused: host is not public or not allowed")
+            metrics.increment('jobs.callbacks.refused')
+            return
+        
+        body = json.dumps(public_job(job))
+        headers = {'Content-Type': 'application/json'}
+        if self.callback_secret:
+            signature = hmac.new(self.callback_secret.encode('utf-8'), body.encode('utf-8'), hashlib.sha256)
+            headers['X-Signature-SHA256'] = signature.hexdigest()
+        
+        try:
+            # Redirects are not followed, so a callback cannot be bounced to an internal address
+            response = requests.post(job['callback_url'], data=body, headers=headers,
+                                     timeout=self.callback_timeout, allow_redirects=False)
+            response.raise_for_status()
+            metrics.increment('jobs.callbacks.delivered')
+        except requests.RequestException as e:
+            logger.warning(f"Callback for job {job['id']} failed: {str(e)}")
+            metrics.increment('jobs.callbacks.failed')
+    
+    def _dequeue(self) -> None:
+        """Release the queue slot of a job that started or was never queued"""
+        with self._lock:
+            self._queued -= 1
+            metrics.set_gauge('jobs.queued', self._queued)
+    
+    def _drain_seconds(self, kind: str) -> float:
+        """Estimated seconds for the workers to get through the current queue"""
+        run_ms = metrics.percentile(f"jobs.{kind}.run_ms", 50) or 1000
+        return run_ms / 1000 * self._queued / self.max_workers
+    
+    def _process_alive(self, pid: int) -> bool:
+        """Check whether a process exists"""
+        if pid == os.getpid():
+            return True
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+def public_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Job fields returned to clients (internal bookkeeping removed)"""
+    return {
+        'job_id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'result': job['result'],
+        'error': job['error'],
+        'created_at': job['created_at'],
+        'updated_at': job['updated_at']
+    }
+
+def create_job_service(max_workers: int, store_path: Optional[str] = None, ttl: float = 86400,
+                       callback_timeout: float = 10, callback_secret: Optional[str] = None,
+                       callback_allowed_hosts: str = '', max_queued: int = 100) -> JobService:
+    """
+    Create a job service from configuration values
+    
+    Args:
+        max_workers: Number of jobs run concurrently per process
+        store_path: SQLite path for a store shared between workers (memory only if empty)
+        ttl: Seconds a job is kept after its last update
+        callback_timeout: Timeout in seconds for webhook deliveries
+        callback_secret: Optional key used to sign webhook payloads
+        callback_allowed_hosts: Comma-separated host names webhooks are restricted to
+        max_queued: Number of jobs allowed to wait for a worker per process
+    
+    Returns:
+        Configured JobService
+    """
+    store = None
+    if store_path:
+        try:
+            store = SQLiteJobStore(store_path, ttl)
+        except sqlite3.Error as e:
+            logger.warning(f"Job store unavailable, using memory only: {str(e)}")
+    
+    allowed_hosts = tuple(host.strip().lower() for host in callback_allowed_hosts.split(',') if host.strip())
+    return JobService(store or MemoryJobStore(ttl), max_workers, callback_timeout, callback_secret, allowed_hosts,
+                      max_queued)
\ No newline at end of file
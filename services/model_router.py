@@ -0,0 +1,125 @@
+"""
+Per-call model selection from input size, category and observed latency and parse success
+"""
+
+import logging
+import random
+from typing import Dict, Any, List, Optional
+
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Categories whose long answers keep the quality model when it meets the SLO
+QUALITY_CATEGORIES = ('technical',)
+
+# Stages that always prefer the fast model (short, free-form output)
+FAST_STAGES = ('follow_up',)
+
+class ModelRouter:
+    def __init__(self, fast_model: Optional[str], quality_model: str, latency_slo_ms: float,
+                 long_answer_tokens: int = 350, min_parse_success: float = 0.95, min_samples: int = 20,
+                 explore_rate: float = 0.02):
+        """
+        Initialize the router
+        
+        Args:
+            fast_model: Lower-latency model (routing is disabled if empty)
+            quality_model: Model used for long answers in quality categories
+            latency_slo_ms: Target p95 latency per call
+            long_answer_tokens: Answer length from which the quality model is preferred
+            min_parse_success: Minimum share of parseable analysis responses for a model to be used
+            min_samples: Observations needed before a model's metrics are trusted
+            explore_rate: Share of calls sent to a model that was ruled out, so its metrics can recover
+        """
+        self.fast_model = fast_model or quality_model
+        self.quality_model = quality_model
+        self.latency_slo_ms = latency_slo_ms
+        self.long_answer_tokens = long_answer_tokens
+        self.min_parse_success = min_parse_success
+        self.min_samples = min_samples
+        self.explore_rate = explore_rate
+    
+    def choose(self, stage: str, answer_tokens: int, category: str) -> str:
+        """
+        Pick the model for one call
+        
+        The preferred model is the quality model for long answers in quality
+        categories and the fast model otherwise. Models whose recent parse
+        success is below the minimum are skipped, then the first preferred
+        model whose recent p95 latency meets the SLO is used. If none
+        meets it, the model with the lowest p95 is used. A small share of
+        calls goes to a ruled-out model so stale metrics do not exclude it
+        forever.
+        
+        Args:
+            stage: Pipeline stage ('analysis', 'combined', 'follow_up')
+            answer_tokens: Token count of the user's answer
+            category: Question category
+        
+        Returns:
+            Model name
+        """
+        candidates = self._preference(stage, answer_tokens, category)
+        
+        if len(candidates) > 1 and random.random() < self.explore_rate:
+            model = random.choice(candidates)
+            metrics.increment(f"model.{model}.explored")
+            return model
+        
+        if stage not in FAST_STAGES:
+            reliable = [model for model in candidates if self._parse_ok(model)]
+            candidates = reliable or [self.quality_model]
+        
+        model = next((model for model in candidates if self._meets_slo(model)), None)
+        if model is None:
+            model = min(candidates, key=lambda candidate: metrics.percentile(self._latency_series(candidate), 95))
+        
+        metrics.increment(f"model.{model}.routed.{stage}")
+        return model
+    
+    def record_latency(self, model: str, latency_ms: float) -> None:
+        """Record the latency of one completion"""
+        metrics.observe(self._latency_series(model), latency_ms)
+    
+    def record_parse(self, model: str, parsed: bool) -> None:
+        """Record whether an analysis response from a model could be used"""
+        metrics.observe(f"model.{model}.parse_ok", 1 if parsed else 0)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get the recent p95 latency and parse success rate of each model"""
+        return {
+            model: {
+                'p95_latency_ms': metrics.percentile(self._latency_series(model), 95),
+                'parse_success': metrics.mean(f"model.{model}.parse_ok")
+            }
+            for model in dict.fromkeys([self.fast_model, self.quality_model])
+        }
+    
+    def _preference(self, stage: str, answer_tokens: int, category: str) -> List[str]:
+        """Models in order of preference for a call, before metrics are considered"""
+        if self.fast_model == self.quality_model:
+            return [self.quality_model]
+        if stage in FAST_STAGES:
+            return [self.fast_model, self.quality_model]
+        if category in QUALITY_CATEGORIES and answer_tokens >= self.long_answer_tokens:
+            return [self.quality_model, self.fast_model]
+        return [self.fast_model, self.quality_model]
+    
+    def _meets_slo(self, model: str) -> bool:
+        """True if the model's recent p95 latency is within the SLO (or not yet known)"""
+        series = self._latency_series(model)
+        if metrics.count(series) < self.min_samples:
+            return True
+        return metrics.percentile(series, 95) <= self.latency_slo_ms
+    
+    def _parse_ok(self, model: str) -> bool:
+        """True if the model's recent parse success rate is acceptable (or not yet known)"""
+        series = f"model.{model}.parse_ok"
+        if metrics.count(series) < self.min_samples:
+            return True
+        return metrics.mean(series) >= self.min_parse_success
+    
+    def _latency_series(self, model: str) -> str:
+        """Metrics timing series holding a model's latencies"""
+        return f"model.{model}.latency_ms"
\ No newline at end of file
@@ -0,0 +1,247 @@
+"""
+MinHash LSH index finding previously analyzed answers that are near-duplicates of a new one
+"""
+
+import copy
+import hashlib
+import re
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from services.cache_service import normalize_text
+from utils.metrics import metrics
+
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+# Signatures of the most recent answers, so the lookup and the store of one request hash it once
+RECENT_SIGNATURES = 64
+
+def shingles(text: str, size: int = 3) -> Set[str]:
+    """
+    Word shingles of an answer, ignoring case, punctuation and whitespace
+    
+    Args:
+        text: Answer text
+        size: Words per shingle
+    
+    Returns:
+        Set of space-joined word n-grams (a single shingle for shorter texts)
+    """
+    words = WORD_PATTERN.findall(normalize_text(text).lower())
+    if len(words) <= size:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+class MinHasher:
+    """
+    Turns shingle sets into MinHash signatures with one permutation hashing
+    
+    Each shingle is hashed once and the hash picks the signature slot it
+    competes for, so signing costs one hash per shingle rather than one per
+    shingle and slot. Empty slots borrow the value of the next filled one
+    (offset by the distance) so signatures stay comparable slot by slot.
+    """
+    
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        """
+        Initialize the hasher
+        
+        Args:
+            num_perm: Signature length (more is more accurate)
+            seed: Key of the shingle hash, fixed so signatures are comparable
+        """
+        self.num_perm = num_perm
+        self.key = seed.to_bytes(8, 'little')
+        # Larger than any slot value, so borrowed values never equal a slot's own
+        self.rotation = (1 << 64) // num_perm + 1
+    
+    def signature(self, items: Set[str]) -> Tuple[int, ...]:
+        """MinHash signature of a non-empty set of shingles"""
+        slots: List[Optional[int]] = [None] * self.num_perm
+        for item in items:
+            h = struct.unpack('<Q', hashlib.blake2b(item.encode('utf-8'), digest_size=8, key=self.key).digest())[0]
+            value, slot = divmod(h, self.num_perm)
+            if slots[slot] is None or value < slots[slot]:
+                slots[slot] = value
+        
+        signature = []
+        for slot in range(self.num_perm):
+            for distance in range(self.num_perm):
+                value = slots[(slot + distance) % self.num_perm]
+                if value is not None:
+                    signature.append(value + distance * self.rotation)
+                    break
+        return tuple(signature)
+    
+    @staticmethod
+    def similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+        """Estimated Jaccard similarity of the sets behind two signatures"""
+        return sum(1 for x, y in zip(first, second) if x == y) / len(first)
+
+class NearDuplicateIndex:
+    """
+    Bounded LRU index of analysis results, looked up by answer similarity
+    
+    Answers are indexed per scope (the kind of result, question, category,
+    model and prompt version), so only answers to the same question are
+    compared. Signatures are split into bands; answers sharing any band
+    are candidates, and a candidate is a match if its estimated Jaccard
+    similarity over word shingles reaches the threshold.
+    """
+    
+    def __init__(self, threshold: float = 0.85, max_entries: int = 2048, ttl: float = 86400,
+                 num_perm: int = 128, bands: int = 16, min_words: int = 20):
+        """
+        Initialize the index
+        
+        Args:
+            threshold: Minimum estimated similarity (0-1) for a match
+            max_entries: Maximum number of answers kept before evicting the least recently used
+            ttl: Seconds an answer is kept
+            num_perm: MinHash signature length (must be divisible by bands)
+            bands: Number of LSH bands
+            min_words: Shorter answers are not indexed (exact caching covers them)
+        """
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.min_words = min_words
+        self.hasher = MinHasher(num_perm)
+        
+        # entry id -> (scope, signature, value, expires_at)
+        self._entries: OrderedDict = OrderedDict()
+        # (scope, band number, band hash) -> ids of entries sharing that band
+        self._buckets: Dict[Tuple[str, int, int], Set[int]] = {}
+        self._next_id = 0
+        # text digest -> signature of recently seen answers
+        self._recent: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def lookup(self, scope: str, text: str) -> Optional[Tuple[Any, float]]:
+        """
+        Find the most similar indexed answer in a scope
+        
+        Args:
+            scope: Key of the question and result kind the answer belongs to
+            text: Answer text
+        
+        Returns:
+            Tuple of a copy of the stored value and the estimated similarity, or None
+        """
+        signature = self._signature(text)
+        if signature is None:
+            return None
+        
+        now = time.time()
+        with self._lock:
+            best_id, best_similarity = None, 0.0
+            for entry_id in self._candidates(scope, signature):
+                _, other, _, expires_at = self._entries[entry_id]
+                if expires_at <= now:
+                    continue
+                similarity = MinHasher.similarity(signature, other)
+                if similarity > best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+            
+            if best_id is None or best_similarity < self.threshold:
+                metrics.increment('near_duplicate.misses')
+                return None
+            
+            self._entries.move_to_end(best_id)
+            value = self._entries[best_id][2]
+        
+        metrics.increment('near_duplicate.hits')
+        metrics.observe('near_duplicate.similarity', best_similarity)
+        return copy.deepcopy(value), best_similarity
+    
+    def add(self, scope: str, text: str, value: Any) -> None:
+        """Index an answer with its value, evicting the oldest answers if full"""
+        signature = self._signature(text)
+        if signature is None:
+            return
+        
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (scope, signature, copy.deepcopy(value), time.time() + self.ttl)
+            for band in self._bands(scope, signature):
+                self._buckets.setdefault(band, set()).add(entry_id)
+            
+            while len(self._entries) > self.max_entries:
+                oldest_id = next(iter(self._entries))
+                self._remove(oldest_id)
+                metrics.increment('near_duplicate.evictions')
+            metrics.set_gauge('near_duplicate.size', len(self._entries))
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and current size"""
+        hits = metrics.counter('near_duplicate.hits')
+        misses = metrics.counter('near_duplicate.misses')
+        total = hits + misses
+        with self._lock:
+            size = len(self._entries)
+        return {
+            'hits': hits,
+            'misses': misses,
+            'evictions': metrics.counter('near_duplicate.evictions'),
+            'hit_rate': round(hits / total, 3) if total else 0.0,
+            'size': size,
+            'threshold': self.threshold
+        }
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+    
+    def _signature(self, text: str) -> Optional[Tuple[int, ...]]:
+        """Signature of an answer, or None if it is too short to index"""
+        key = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+        with self._lock:
+            if key in self._recent:
+                self._recent.move_to_end(key)
+                return self._recent[key]
+        
+        items = shingles(text)
+        # A text of n >= 3 words has n - 2 shingles (fewer if phrases repeat)
+        if len(items) + 2 < self.min_words:
+            signature = None
+        else:
+            signature = self.hasher.signature(items)
+        
+        with self._lock:
+            self._recent[key] = signature
+            while len(self._recent) > RECENT_SIGNATURES:
+                self._recent.popitem(last=False)
+        return signature
+    
+    def _bands(self, scope: str, signature: Tuple[int, ...]) -> List[Tuple[str, int, int]]:
+        """Bucket keys of a signature's bands"""
+        return [
+            (scope, band, hash(signature[band * self.rows:(band + 1) * self.rows]))
+            for band in range(self.bands)
+        ]
+    
+    def _candidates(self, scope: str, signature: Tuple[int, ...]) -> Set[int]:
+        """Ids of entries sharing at least one band with a signature"""
+        candidates = set()
+        for band in self._bands(scope, signature):
+            candidates |= self._buckets.get(band, set())
+        return candidates
+    
+    def _remove(self, entry_id: int) -> None:
+        """Drop an entry and its band memberships (lock must be held)"""
+        scope, signature, _, _ = self._entries.pop(entry_id)
+        for band in self._bands(scope, signature):
+            members = self._buckets.get(band)
+            if members is not None:
+                members.discard(entry_id)
+                if not members:
+                    del self._buckets[band]
\ No newline at end of file
@@ -0,0 +1,164 @@
+"""
+Shared OpenAI client with a tuned HTTP connection pool, quota governor and retry budget, one per worker process
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+import httpx
+import openai
+
+from config import Config
+from utils.quota import QuotaGovernor, QuotaExceededError, create_quota_governor
+from utils.resilience import RetryBudget
+
+logger = logging.getLogger(__name__)
+
+# Shortest timeout worth sending a request with; a quota wait must leave at least this much
+MIN_REQUEST_SECONDS = 1.0
+
+# Keyed by process id: a client inherited through fork() shares sockets with its parent
+_clients: Dict[int, openai.OpenAI] = {}
+_lock = threading.Lock()
+_governor: Optional[QuotaGovernor] = None
+_retry_budget: Optional[RetryBudget] = None
+
+def get_openai_client() -> openai.OpenAI:
+    """
+    Get the OpenAI client of the current process, creating it on first use
+    
+    Every service in a worker shares this client and therefore one
+    connection pool. A process forked after the client was created gets
+    its own client instead of reusing the parent's sockets.
+    
+    Returns:
+        Shared openai.OpenAI client
+    """
+    pid = os.getpid()
+    client = _clients.get(pid)
+    if client is not None:
+        return client
+    
+    with _lock:
+        if pid not in _clients:
+            _clients.clear()
+            _clients[pid] = _create_client()
+        return _clients[pid]
+
+def reset_openai_client() -> None:
+    """Forget clients, quota and retry state inherited from a parent process (call from gunicorn's post_fork hook)"""
+    global _governor, _retry_budget
+    with _lock:
+        _clients.clear()
+        _governor = None
+        _retry_budget = None
+
+def get_quota_governor() -> QuotaGovernor:
+    """Get the quota governor of the current process, creating it on first use"""
+    global _governor
+    if _governor is None:
+        with _lock:
+            if _governor is None:
+                _governor = create_quota_governor(
+                    Config.RATELIMIT_STORAGE_URL,
+                    rpm=Config.OPENAI_RPM_LIMIT,
+                    tpm=Config.OPENAI_TPM_LIMIT,
+                    model_limits=Config.OPENAI_MODEL_LIMITS,
+                    max_wait=Config.OPENAI_QUOTA_MAX_WAIT_SECONDS
+                )
+    return _governor
+
+def get_retry_budget() -> RetryBudget:
+    """Get the retry budget shared by every OpenAI caller of the current process, creating it on first use"""
+    global _retry_budget
+    if _retry_budget is None:
+        with _lock:
+            if _retry_budget is None:
+                _retry_budget = RetryBudget(ratio=Config.OPENAI_RETRY_BUDGET_RATIO)
+    return _retry_budget
+
+def admit_openai_call(model: str, tokens: int, timeout: float) -> float:
+    """
+    Wait for the shared OpenAI quota before sending one request attempt
+    
+    Args:
+        model: OpenAI model name
+        tokens: Estimated tokens of the request (prompt plus max_tokens)
+        timeout: Seconds left for the attempt
+    
+    Returns:
+        Seconds of the attempt timeout left for the request itself
+    
+    Raises:
+        QuotaExceededError: If the quota will not allow the request with MIN_REQUEST_SECONDS to spare
+    """
+    waited = get_quota_governor().acquire(model, tokens, max_wait=timeout - MIN_REQUEST_SECONDS)
+    if waited and timeout - waited < MIN_REQUEST_SECONDS:
+        # The wait overran: an instant client timeout would be counted as an upstream failure
+        raise QuotaExceededError(f"OpenAI quota wait for {model} left no time for the request",
+                                 retry_after=MIN_REQUEST_SECONDS)
+    return timeout - waited
+
+def warm_up_openai_client(connections: int, timeout: float = 5) -> int:
+    """
+    Open keep-alive connections to the API ahead of the first request
+    
+    Each connection is opened with a lightweight unauthenticated request;
+    the response status is irrelevant, only the TCP and TLS handshakes
+    matter. Connections are opened concurrently so the pool keeps several.
+    
+    Args:
+        connections: Number of connections to open
+        timeout: Timeout in seconds per warm-up request
+    
+    Returns:
+        Number of connections that were opened
+    """
+    client = get_openai_client()
+    http_client = client._client
+    url = str(client.base_url).rstrip('/') + '/models'
+    
+    def open_connection(_) -> bool:
+        try:
+            http_client.get(url, timeout=timeout)
+            return True
+        except httpx.HTTPError as e:
+            logger.warning(f"OpenAI connection warm-up failed: {str(e)}")
+            return False
+    
+    with ThreadPoolExecutor(max_workers=max(connections, 1)) as executor:
+        opened = sum(executor.map(open_connection, range(connections)))
+    
+    logger.info(f"Warmed {opened} OpenAI connections in process {os.getpid()}")
+    return opened
+
+def _create_client() -> openai.OpenAI:
+    """Create an OpenAI client with the configured connection pool"""
+    http2 = Config.OPENAI_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("OPENAI_HTTP2 is set but the 'h2' package is not installed, using HTTP/1.1")
+            http2 = False
+    
+    http_client = httpx.Client(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=Config.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=Config.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=Config.OPENAI_KEEPALIVE_EXPIRY_SECONDS
+        ),
+        timeout=httpx.Timeout(Config.ANALYSIS_TIMEOUT_SECONDS, connect=Config.OPENAI_CONNECT_TIMEOUT_SECONDS)
+    )
+    
+    # Retries are handled by the resilient caller, not the SDK
+    return openai.OpenAI(
+        api_key=os.getenv('OPENAI_API_KEY'),
+        base_url=Config.OPENAI_BASE_URL,
+        max_retries=0,
+        http_client=http_client
+    )
\ No newline at end of file
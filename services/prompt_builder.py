@@ -0,0 +1,470 @@
+"""
+Prompt construction with local token counting and per-request token budgets
+"""
+
+import math
+import re
+from typing import Dict, Any, List, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # Listed in requirements.txt; without it, fall back to a character-based estimate
+    tiktoken = None
+
+ANALYSIS_SYSTEM_PROMPT = """
+You are an expert interview coach and HR professional. Your job is to analyze interview responses and provide constructive feedback.
+
+Analyze the response across these dimensions:
+1. Content Quality (0-10): Relevance, depth, and substance of the answer
+2. Communication Clarity (0-10): How clearly and effectively the message is conveyed
+3. Confidence Level (0-10): Apparent confidence and conviction in the response
+4. Structure & Organization (0-10): Logical flow and organization of thoughts
+5. Professionalism (0-10): Professional tone and appropriate language use
+
+Provide your analysis in this exact JSON format:
+{
+    "content_quality": {"score": X, "feedback": "detailed feedback"},
+    "communication_clarity": {"score": X, "feedback": "detailed feedback"},
+    "confidence_level": {"score": X, "feedback": "detailed feedback"},
+    "structure_organization": {"score": X, "feedback": "detailed feedback"},
+    "professionalism": {"score": X, "feedback": "detailed feedback"},
+    "strengths": ["strength 1", "strength 2"],
+    "areas_for_improvement": ["improvement 1", "improvement 2"],
+    "suggestions": ["specific suggestion 1", "specific suggestion 2", "specific suggestion 3"]
+}
+
+Be constructive, specific, and encouraging in your feedback.
+"""
+
+COMBINED_SYSTEM_ADDENDUM = """
+Also include a "follow_up_question" field in the same JSON object containing ONE thoughtful
+follow-up question that digs deeper into the candidate's experience, tests their problem-solving,
+is relevant to the question category and encourages specific examples or details.
+"""
+
+FOLLOW_UP_SYSTEM_PROMPT = """
+You are an expert interviewer who asks insightful follow-up questions.
+
+Based on the interview exchange you are given, generate ONE thoughtful follow-up question that:
+1. Digs deeper into the candidate's experience
+2. Tests their problem-solving or critical thinking
+3. Is relevant to the question category
+4. Encourages specific examples or details
+
+Reply with the single, well-crafted follow-up question only.
+"""
+
+FOLLOW_UP_POOL_SYSTEM_PROMPT = """
+You are an expert interviewer preparing follow-up questions in advance.
+
+For the interview question you are given, anticipate the different directions a candidate's answer
+could take. For each direction write ONE follow-up question that digs deeper into that kind of
+answer, together with 4-8 lowercase keywords a candidate's answer in that direction would likely
+contain (concrete nouns and verbs, not words from the original question).
+
+Reply in this exact JSON format:
+{"follow_ups": [{"question": "follow-up question", "keywords": ["keyword 1", "keyword 2"]}]}
+"""
+
+REVISION_SYSTEM_PROMPT = """
+You are an expert interview coach re-scoring a revised interview response.
+
+You are given the scores (0-10) you gave the candidate's previous attempt and only the passages
+they changed, with a few surrounding words. Re-score only the dimensions the edits affect, and
+replace strengths, areas_for_improvement or suggestions only if they no longer fit.
+
+Reply with a JSON object containing only the members that change, e.g.:
+{"content_quality": {"score": X, "feedback": "detailed feedback"}, "suggestions": ["specific suggestion 1", "specific suggestion 2"]}
+
+Dimensions: content_quality, communication_clarity, confidence_level, structure_organization, professionalism.
+"""
+
+REDUCE_SYSTEM_PROMPT = """
+You are an expert interview coach. A long interview response was analyzed in parts, and you are
+given the scores and feedback of every part together with the combined scores.
+
+Merge the part feedback into one analysis of the whole response: one feedback text per dimension
+that covers the response as a whole, and deduplicated strengths, areas for improvement and
+suggestions (at most 4 each). Keep the combined scores exactly as given.
+
+Reply in this exact JSON format:
+{
+    "content_quality": {"score": X, "feedback": "detailed feedback"},
+    "communication_clarity": {"score": X, "feedback": "detailed feedback"},
+    "confidence_level": {"score": X, "feedback": "detailed feedback"},
+    "structure_organization": {"score": X, "feedback": "detailed feedback"},
+    "professionalism": {"score": X, "feedback": "detailed feedback"},
+    "strengths": ["strength 1", "strength 2"],
+    "areas_for_improvement": ["improvement 1", "improvement 2"],
+    "suggestions": ["specific suggestion 1", "specific suggestion 2", "specific suggestion 3"]
+}
+"""
+
+# Static instructions come first so every request shares the longest possible prefix
+ANALYSIS_USER_PROMPT = """Analyze this interview response following the JSON format specified in your instructions.
+
+Question Category: {category}
+Original Question: {question}
+
+Candidate's Response:
+"{text}\""""
+
+# Shares the analysis system prompt (and its cached prefix) with full analyses
+CHUNK_USER_PROMPT = """Analyze this part of a long interview response following the JSON format specified in your instructions. Score the part on its own; the parts are merged afterwards.
+
+Question Category: {category}
+Original Question: {question}
+
+Candidate's Response (part {index} of {total}):
+"{text}\""""
+
+REDUCE_USER_PROMPT = """Merge the analyses of the parts of this response following the JSON format specified in your instructions.
+
+Question Category: {category}
+Original Question: {question}
+
+Combined scores:
+{scores}
+
+{parts}"""
+
+FOLLOW_UP_USER_PROMPT = """Question Category: {category}
+Original Question: {question}
+Candidate's Response: {text}"""
+
+REVISION_USER_PROMPT = """Re-score this revised response following the JSON format specified in your instructions.
+
+Question Category: {category}
+Original Question: {question}
+
+Previous scores:
+{scores}
+
+Edits ("before -> after" with surrounding words):
+{edits}"""
+
+FOLLOW_UP_POOL_USER_PROMPT = """Write {count} follow-up questions for this interview question.
+
+Question Category: {category}
+Original Question: {question}"""
+
+TRUNCATION_MARKER = ' [...] '
+
+# Chat format overhead per message and per request (OpenAI cookbook values)
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REQUEST = 3
+
+class PromptBuilder:
+    def __init__(self, model: str = "gpt-4"):
+        """
+        Precompute the static prompt parts once
+        
+        Args:
+            model: Model whose tokenizer is used for counting (if tiktoken is installed)
+        """
+        self.encoding = self._load_encoding(model)
+        self.system_prompt = compact_prompt(ANALYSIS_SYSTEM_PROMPT)
+        self.combined_system_prompt = compact_prompt(ANALYSIS_SYSTEM_PROMPT + COMBINED_SYSTEM_ADDENDUM)
+        self.follow_up_system_prompt = compact_prompt(FOLLOW_UP_SYSTEM_PROMPT)
+        self.follow_up_pool_system_prompt = compact_prompt(FOLLOW_UP_POOL_SYSTEM_PROMPT)
+        self.revision_system_prompt = compact_prompt(REVISION_SYSTEM_PROMPT)
+        self.reduce_system_prompt = compact_prompt(REDUCE_SYSTEM_PROMPT)
+        
+        self._static_tokens = {
+            'analysis': self._static_cost(self.system_prompt, ANALYSIS_USER_PROMPT),
+            'combined': self._static_cost(self.combined_system_prompt, ANALYSIS_USER_PROMPT),
+            'chunk': self._static_cost(self.system_prompt, CHUNK_USER_PROMPT),
+            'follow_up': self._static_cost(self.follow_up_system_prompt, FOLLOW_UP_USER_PROMPT)
+        }
+    
+    def analysis_messages(self, text: str, question: str, category: str, budget: int,
+                          combined: bool = False) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """
+        Build the analysis chat messages within a prompt token budget
+        
+        Args:
+            text: User's interview response
+            question: Original interview question
+            category: Question category
+            budget: Maximum prompt tokens for the whole request
+            combined: Ask for the follow-up question in the same completion
+        
+        Returns:
+            Tuple of the messages and metadata ('prompt_tokens' estimate, 'truncated')
+        """
+        kind = 'combined' if combined else 'analysis'
+        system_prompt = self.combined_system_prompt if combined else self.system_prompt
+        question = question or "Not provided"
+        
+        text, truncated = self._fit(text, budget - self._static_tokens[kind] - self.count_tokens(question))
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": ANALYSIS_USER_PROMPT.format(category=category, question=question, text=text)}
+        ]
+        return messages, {'prompt_tokens': self.count_message_tokens(messages), 'truncated': truncated}
+    
+    def chunk_messages(self, text: str, question: str, category: str, index: int, total: int,
+                       budget: int) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """
+        Build the analysis chat messages for one part of a long answer
+        
+        Args:
+            text: Part of the user's interview response (see split_into_chunks)
+            question: Original interview question
+            category: Question category
+            index: Number of the part, starting at 1
+            total: Number of parts
+            budget: Maximum prompt tokens for the whole request
+        
+        Returns:
+            Tuple of the messages and metadata ('prompt_tokens' estimate, 'truncated')
+        """
+        question = question or "Not provided"
+        text, truncated = self._fit(text, budget - self._static_tokens['chunk'] - self.count_tokens(question))
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": CHUNK_USER_PROMPT.format(category=category, question=question,
+                                                                 index=index, total=total, text=text)}
+        ]
+        return messages, {'prompt_tokens': self.count_message_tokens(messages), 'truncated': truncated}
+    
+    def reduce_messages(self, question: str, category: str, scores: str, parts: str,
+                        budget: int) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """
+        Build the chat messages merging the part analyses of a long answer
+        
+        Args:
+            question: Original interview question
+            category: Question category
+            scores: Combined scores, one line per dimension
+            parts: Scores and feedback of every part
+            budget: Maximum prompt tokens for the whole request
+        
+        Returns:
+            Tuple of the messages and metadata ('prompt_tokens' estimate, 'truncated')
+        """
+        question = question or "Not provided"
+        fixed = self.count_message_tokens([
+            {"role": "system", "content": self.reduce_system_prompt},
+            {"role": "user", "content": REDUCE_USER_PROMPT.format(category=category, question=question,
+                                                                  scores=scores, parts='')}
+        ])
+        parts, truncated = self._fit(parts, budget - fixed)
+        messages = [
+            {"role": "system", "content": self.reduce_system_prompt},
+            {"role": "user", "content": REDUCE_USER_PROMPT.format(category=category, question=question,
+                                                                  scores=scores, parts=parts)}
+        ]
+        return messages, {'prompt_tokens': self.count_message_tokens(messages), 'truncated': truncated}
+    
+    def follow_up_messages(self, question: str, text: str, category: str,
+                           budget: int) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """
+        Build the follow-up question chat messages within a prompt token budget
+        
+        Args:
+            question: Original interview question
+            text: User's interview response
+            category: Question category
+            budget: Maximum prompt tokens for the whole request
+        
+        Returns:
+            Tuple of the messages and metadata ('prompt_tokens' estimate, 'truncated')
+        """
+        text, truncated = self._fit(text, budget - self._static_tokens['follow_up'] - self.count_tokens(question))
+        messages = [
+            {"role": "system", "content": self.follow_up_system_prompt},
+            {"role": "user", "content": FOLLOW_UP_USER_PROMPT.format(category=category, question=question, text=text)}
+        ]
+        return messages, {'prompt_tokens': self.count_message_tokens(messages), 'truncated': truncated}
+    
+    def revision_messages(self, question: str, category: str, scores: str, edits: str,
+                          budget: int) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """
+        Build the chat messages re-scoring a revised answer from its edits
+        
+        Args:
+            question: Original interview question
+            category: Question category
+            scores: Compact previous scores and feedback
+            edits: Changed passages of the answer (see answer_diff.format_spans)
+            budget: Maximum prompt tokens for the whole request
+        
+        Returns:
+            Tuple of the messages and metadata ('prompt_tokens' estimate, 'truncated')
+        """
+        question = question or "Not provided"
+        fixed = self.count_message_tokens([
+            {"role": "system", "content": self.revision_system_prompt},
+            {"role": "user", "content": REVISION_USER_PROMPT.format(category=category, question=question,
+                                                                    scores=scores, edits='')}
+        ])
+        edits, truncated = self._fit(edits, budget - fixed)
+        messages = [
+            {"role": "system", "content": self.revision_system_prompt},
+            {"role": "user", "content": REVISION_USER_PROMPT.format(category=category, question=question,
+                                                                    scores=scores, edits=edits)}
+        ]
+        return messages, {'prompt_tokens': self.count_message_tokens(messages), 'truncated': truncated}
+    
+    def follow_up_pool_messages(self, question: str, category: str,
+                                count: int) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """
+        Build the chat messages that pre-generate follow-up candidates for a practice question
+        
+        Args:
+            question: Practice question
+            category: Question category
+            count: Number of follow-up candidates to ask for
+        
+        Returns:
+            Tuple of the messages and metadata ('prompt_tokens' estimate, 'truncated')
+        """
+        messages = [
+            {"role": "system", "content": self.follow_up_pool_system_prompt},
+            {"role": "user", "content": FOLLOW_UP_POOL_USER_PROMPT.format(count=count, category=category, question=question)}
+        ]
+        return messages, {'prompt_tokens': self.count_message_tokens(messages), 'truncated': False}
+    
+    def count_tokens(self, text: str) -> int:
+        """
+        Count tokens locally
+        
+        Uses tiktoken when installed, otherwise estimates one token per
+        short word or punctuation mark and one per four characters of
+        longer words.
+        """
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text))
+        return sum(max(1, math.ceil(len(piece) / 4)) for piece in re.findall(r"\w+|[^\w\s]", text))
+    
+    def count_message_tokens(self, messages: List[Dict[str, str]]) -> int:
+        """Count the prompt tokens of a list of chat messages"""
+        return TOKENS_PER_REQUEST + sum(
+            TOKENS_PER_MESSAGE + self.count_tokens(message['content']) for message in messages
+        )
+    
+    def split_into_chunks(self, text: str, max_tokens: int) -> List[str]:
+        """
+        Split a long answer into chunks of similar size, each at most about max_tokens
+        
+        Chunks end at a paragraph break when they are at least half full and
+        the next paragraph would not fit, otherwise at a sentence boundary,
+        so each one reads as a coherent passage. Sizes are balanced over the
+        rest of the answer (rather than filling every chunk but the last) so
+        the concurrent chunk analyses take about equally long. A single
+        sentence longer than max_tokens is cut by characters.
+        """
+        if self.count_tokens(text) <= max_tokens:
+            return [text.strip()]
+        
+        paragraphs = [
+            [(sentence, self.count_tokens(sentence)) for sentence in re.split(r'(?<=[.!?])\s+', paragraph.strip()) if sentence]
+            for paragraph in re.split(r'\n\s*\n', text.strip())
+        ]
+        remaining = sum(tokens for paragraph in paragraphs for _, tokens in paragraph)
+        target = self._chunk_target(remaining, max_tokens)
+        
+        chunks, current, current_tokens = [], [], 0
+        for paragraph in paragraphs:
+            size = sum(tokens for _, tokens in paragraph)
+            for position, (sentence, tokens) in enumerate(paragraph):
+                at_break = position == 0 and current_tokens >= target / 2 and current_tokens + size > target
+                if current and (at_break or current_tokens + tokens > target):
+                    chunks.append(' '.join(current))
+                    remaining -= current_tokens
+                    target = self._chunk_target(remaining, max_tokens)
+                    current, current_tokens = [], 0
+                if tokens > max_tokens:
+                    chunks.extend(self._split_characters(sentence, max_tokens))
+                    remaining -= tokens
+                    continue
+                current.append(sentence)
+                current_tokens += tokens
+        if current:
+            chunks.append(' '.join(current))
+        return chunks
+    
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """
+        Shorten text to about max_tokens, keeping whole sentences from the start and the end
+        
+        The opening (context) and closing (result) of an answer carry most of
+        its signal, so roughly 60% of the budget goes to leading sentences and
+        40% to trailing ones, joined by a truncation marker.
+        """
+        sentences = re.split(r'(?<=[.!?])\s+', text.strip())
+        marker_tokens = self.count_tokens(TRUNCATION_MARKER)
+        head_budget = int((max_tokens - marker_tokens) * 0.6)
+        tail_budget = max_tokens - marker_tokens - head_budget
+        
+        head, head_tokens = [], 0
+        for sentence in sentences:
+            tokens = self.count_tokens(sentence)
+            if head_tokens + tokens > head_budget:
+                break
+            head.append(sentence)
+            head_tokens += tokens
+        
+        tail, tail_tokens = [], 0
+        for sentence in reversed(sentences[len(head):]):
+            tokens = self.count_tokens(sentence)
+            if tail_tokens + tokens > tail_budget + (head_budget - head_tokens):
+                break
+            tail.insert(0, sentence)
+            tail_tokens += tokens
+        
+        if not head and not tail:
+            # A single run-on sentence: cut by characters instead
+            return self._cut_characters(text, max_tokens)
+        
+        return ' '.join(head) + TRUNCATION_MARKER + ' '.join(tail)
+    
+    def _fit(self, text: str, max_tokens: int) -> Tuple[str, bool]:
+        """Return text unchanged if it fits max_tokens, otherwise a truncated copy"""
+        max_tokens = max(max_tokens, 1)
+        if self.count_tokens(text) <= max_tokens:
+            return text, False
+        return self.truncate(text, max_tokens), True
+    
+    def _cut_characters(self, text: str, max_tokens: int) -> str:
+        """Keep the start and end of text sized to max_tokens at roughly four characters per token"""
+        max_chars = max_tokens * 4
+        head = int(max_chars * 0.6)
+        return text[:head] + TRUNCATION_MARKER + text[-(max_chars - head):]
+    
+    def _chunk_target(self, remaining: int, max_tokens: int) -> int:
+        """Chunk size spreading the remaining tokens evenly over as few chunks as fit max_tokens"""
+        return math.ceil(remaining / max(math.ceil(remaining / max_tokens), 1)) if remaining > 0 else max_tokens
+    
+    def _split_characters(self, text: str, max_tokens: int) -> List[str]:
+        """Cut text into pieces of roughly max_tokens at four characters per token"""
+        size = max_tokens * 4
+        return [text[start:start + size] for start in range(0, len(text), size)]
+    
+    def _static_cost(self, system_prompt: str, user_template: str) -> int:
+        """Tokens used by a request before the variable parts are filled in"""
+        template = user_template.format(category='', question='', text='', index=0, total=0)
+        return self.count_message_tokens([
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": template}
+        ]) + 3  # category name
+    
+    def _load_encoding(self, model: str):
+        """Load the tiktoken encoding for a model, or None if unavailable"""
+        if tiktoken is None:
+            return None
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding('cl100k_base')
+        except Exception:
+            # Encodings are downloaded on first use; estimate when that is not possible
+            return None
+
+def compact_prompt(prompt: str) -> str:
+    """Strip indentation and blank-line padding so the prompt is byte-stable and token-lean"""
+    lines = [line.strip() for line in prompt.strip().splitlines()]
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines))
\ No newline at end of file
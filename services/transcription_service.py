@@ -2,19 +2,33 @@
 Audio Transcription Service using OpenAI Whisper API
 """
 
-import openai
 import os
 import tempfile
 import logging
+import time
 from pydub import AudioSegment
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+from config import Config
+from services.openai_client import get_openai_client, admit_openai_call, get_retry_budget
+from services.usage_ledger import record_usage
+from utils.filler_words import get_unclear_marker_matcher
+from utils.quota import QuotaExceededError
+from utils.resilience import ResilientCaller
 
 logger = logging.getLogger(__name__)
 
+TRANSCRIPTION_MODEL = "whisper-1"
+
 class TranscriptionService:
     def __init__(self):
         """Initialize the transcription service with OpenAI API key"""
-        self.client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self.caller = ResilientCaller('openai.audio', get_retry_budget(), max_retries=Config.OPENAI_MAX_RETRIES)
+    
+    @property
+    def client(self):
+        """OpenAI client shared by all services in this worker process"""
+        return get_openai_client()
         
     def transcribe(self, audio_file) -> Dict[str, Any]:
         """
@@ -26,42 +40,87 @@ class TranscriptionService:
         Returns:
             Dict containing transcription text, duration, and confidence
         """
+        # Save uploaded file temporarily
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_file:
+            audio_file.save(temp_file.name)
+        
         try:
-            # Save uploaded file temporarily
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_file:
-                audio_file.save(temp_file.name)
-                
-                # Convert to supported format if needed
-                audio_path = self._convert_audio_format(temp_file.name)
-                
+            return self.transcribe_path(temp_file.name)
+        finally:
+            os.unlink(temp_file.name)
+    
+    def transcribe_path(self, audio_path: str) -> Dict[str, Any]:
+        """
+        Transcribe an audio file on disk using OpenAI Whisper API
+        
+        The file itself is left in place; a converted copy is removed.
+        
+        Args:
+            audio_path: Path to the audio file
+            
+        Returns:
+            Dict containing transcription text, duration, and confidence
+        """
+        try:
+            # Convert to supported format if needed
+            converted_path = self._convert_audio_format(audio_path)
+            
+            try:
                 # Get audio duration
-                duration = self._get_audio_duration(audio_path)
+                duration = self._get_audio_duration(converted_path)
                 
                 # Transcribe using OpenAI Whisper
-                with open(audio_path, 'rb') as audio:
-                    transcript = self.client.audio.transcriptions.create(
-                        model="whisper-1",
-                        file=audio,
-                        response_format="verbose_json",
-                        language="en"  # Can be made configurable
+                started = time.monotonic()
+                try:
+                    transcript = self.caller.call(
+                        lambda attempt_timeout: self._create_transcription(converted_path, attempt_timeout),
+                        deadline=Config.TRANSCRIPTION_TIMEOUT_SECONDS
                     )
-                
+                except Exception as e:
+                    self._record_usage(duration, started, e)
+                    raise
+                self._record_usage(duration, started)
+            finally:
                 # Clean up temporary files
-                os.unlink(temp_file.name)
-                if audio_path != temp_file.name:
-                    os.unlink(audio_path)
-                
-                return {
-                    'text': transcript.text.strip(),
-                    'duration': duration,
-                    'confidence': self._calculate_confidence(transcript),
-                    'language': getattr(transcript, 'language', 'en')
-                }
+                if converted_path != audio_path:
+                    os.unlink(converted_path)
+            
+            return {
+                'text': transcript.text.strip(),
+                'duration': duration,
+                'confidence': self._calculate_confidence(transcript),
+                'language': getattr(transcript, 'language', 'en')
+            }
                 
+        except QuotaExceededError:
+            raise
         except Exception as e:
             logger.error(f"Transcription failed: {str(e)}")
             raise Exception(f"Failed to transcribe audio: {str(e)}")
     
+    def _create_transcription(self, audio_path: str, timeout: float):
+        """Send one Whisper request (the file is reopened so every attempt uploads it in full)"""
+        # Whisper is limited by requests per minute only
+        timeout = admit_openai_call(TRANSCRIPTION_MODEL, 0, timeout)
+        with open(audio_path, 'rb') as audio:
+            return self.client.audio.transcriptions.create(
+                model=TRANSCRIPTION_MODEL,
+                file=audio,
+                response_format="verbose_json",
+                language="en",  # Can be made configurable
+                timeout=timeout
+            )
+    
+    def _record_usage(self, duration: float, started: float, error: Optional[Exception] = None) -> None:
+        """Record a Whisper call, billed by audio duration, in the usage ledger"""
+        if isinstance(error, QuotaExceededError):
+            return  # Rejected locally, never sent
+        record_usage({
+            'stage': 'transcription',
+            'model': TRANSCRIPTION_MODEL,
+            'latency_ms': round((time.monotonic() - started) * 1000, 1)
+        }, audio_seconds=None if error else duration, cache='miss', error=type(error).__name__ if error else None)
+    
     def _convert_audio_format(self, input_path: str) -> str:
         """
         Convert audio to a format supported by Whisper API
@@ -131,8 +190,8 @@ class TranscriptionService:
                 confidence -= 0.1
             
             # Reduce confidence for responses with many unclear markers
-            unclear_markers = ['[inaudible]', '[unclear]', '...', 'um', 'uh']
-            unclear_count = sum(text.lower().count(marker) for marker in unclear_markers)
+            language = getattr(transcript, 'language', None) or 'en'
+            unclear_count = get_unclear_marker_matcher(language).total(text)
             confidence -= min(unclear_count * 0.05, 0.3)
             
             return max(confidence, 0.1)  # Minimum confidence of 0.1
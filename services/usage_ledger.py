@@ -0,0 +1,262 @@
+"""
+Ledger of token usage, audio seconds and latency of every upstream OpenAI call, one per worker process
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from config import Config
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Fields copied from a call's usage dict into its ledger record
+LEDGER_FIELDS = ('stage', 'model', 'prompt_tokens', 'completion_tokens', 'audio_seconds', 'latency_ms', 'cache', 'error')
+
+# Totals summed by summarize_usage
+TOTAL_FIELDS = ('prompt_tokens', 'completion_tokens', 'audio_seconds', 'latency_ms')
+
+# User the current request is made for; copied into executor tasks by submit_in_context
+_user_id: contextvars.ContextVar = contextvars.ContextVar('usage_user_id', default=None)
+
+# Keyed by process id: the flusher thread does not survive fork()
+_ledgers: Dict[int, 'UsageLedger'] = {}
+_lock = threading.Lock()
+_sink: Optional[Callable[[List[Dict[str, Any]]], None]] = None
+
+@contextmanager
+def usage_context(user_id: Optional[str]) -> Iterator[None]:
+    """Attribute the upstream calls made inside the block (and in tasks submitted from it) to user_id"""
+    token = _user_id.set(user_id)
+    try:
+        yield
+    finally:
+        _user_id.reset(token)
+
+def current_user_id() -> Optional[str]:
+    """User the current upstream calls are attributed to, if any"""
+    return _user_id.get()
+
+def submit_in_context(executor: Executor, fn: Callable[..., Any], *args, **kwargs) -> Future:
+    """Submit a task that sees the caller's context variables (executor threads otherwise start empty)"""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+class UsageLedger:
+    """
+    Append-only record of upstream calls
+    
+    Each record is appended to a daily JSONL file right away (all workers
+    append to the same file, one line per write) and queued for the sink,
+    which a background thread calls with batches every flush_interval
+    seconds or once batch_size records are pending. Batches that fail are
+    retried on the next flush; beyond max_pending the oldest are dropped,
+    as they are still in the local file.
+    """
+    
+    def __init__(self, directory: str, sink: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+                 flush_interval: float = 10, batch_size: int = 200, max_pending: int = 10000):
+        """
+        Initialize the ledger and start its flusher thread if there is a sink
+        
+        Args:
+            directory: Directory of the daily usage-YYYY-MM-DD.jsonl files (empty for none)
+            sink: Callable storing a batch of records, e.g. DatabaseService.save_usage_records
+            flush_interval: Seconds between flushes to the sink
+            batch_size: Pending records that trigger an early flush
+            max_pending: Most records kept for the sink before the oldest are dropped
+        """
+        self.directory = directory
+        self.sink = sink
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending = deque(maxlen=max_pending)
+        self._file = None
+        self._file_date = None
+        self._file_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if sink is not None:
+            threading.Thread(target=self._run, name='usage-ledger', daemon=True).start()
+            atexit.register(self.flush)
+    
+    def record(self, usage: Dict[str, Any], **extra) -> Dict[str, Any]:
+        """
+        Record one upstream call (or a result served without one)
+        
+        Args:
+            usage: Usage dict of the call (see LEDGER_FIELDS)
+            **extra: Further fields, e.g. audio_seconds
+        
+        Returns:
+            The stored record
+        """
+        entry = {field: usage[field] for field in LEDGER_FIELDS if usage.get(field) is not None}
+        entry.update({key: value for key, value in extra.items() if value is not None})
+        entry['user_id'] = current_user_id()
+        entry['created_at'] = datetime.utcnow()
+        
+        self._append(entry)
+        metrics.increment('usage_ledger.records')
+        if self.sink is not None:
+            with self._pending_lock:
+                if len(self._pending) == self._pending.maxlen:
+                    metrics.increment('usage_ledger.dropped')
+                self._pending.append(entry)
+                pending = len(self._pending)
+            metrics.set_gauge('usage_ledger.pending', pending)
+            if pending >= self.batch_size:
+                self._wake.set()
+        return entry
+    
+    def flush(self) -> int:
+        """
+        Send pending records to the sink in batches
+        
+        Returns:
+            Number of records sent
+        """
+        if self.sink is None:
+            return 0
+        
+        sent = 0
+        with self._flush_lock:
+            while True:
+                with self._pending_lock:
+                    batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                if not batch:
+                    break
+                try:
+                    self.sink(batch)
+                except Exception as e:
+                    logger.warning(f"Usage ledger flush failed, retrying later: {str(e)}")
+                    metrics.increment('usage_ledger.flush_errors')
+                    with self._pending_lock:
+                        # Put the batch back in front; the oldest records fall off if the queue is full
+                        for entry in reversed(batch):
+                            if len(self._pending) < self._pending.maxlen:
+                                self._pending.appendleft(entry)
+                            else:
+                                metrics.increment('usage_ledger.dropped')
+                    break
+                sent += len(batch)
+                metrics.increment('usage_ledger.flushed', len(batch))
+        
+        with self._pending_lock:
+            metrics.set_gauge('usage_ledger.pending', len(self._pending))
+        return sent
+    
+    def _run(self) -> None:
+        """Flush every flush_interval seconds, or earlier when a full batch is pending"""
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+    
+    def _append(self, entry: Dict[str, Any]) -> None:
+        """Append a record to today's JSONL file"""
+        if not self.directory:
+            return
+        line = json.dumps(dict(entry, created_at=entry['created_at'].isoformat())) + '\n'
+        try:
+            with self._file_lock:
+                today = entry['created_at'].strftime('%Y-%m-%d')
+                if self._file_date != today:
+                    if self._file is not None:
+                        self._file.close()
+                    self._file = open(os.path.join(self.directory, f"usage-{today}.jsonl"), 'a')
+                    self._file_date = today
+                self._file.write(line)
+                self._file.flush()
+        except OSError as e:
+            logger.warning(f"Could not append to the usage ledger: {str(e)}")
+            metrics.increment('usage_ledger.write_errors')
+
+def configure_usage_ledger(sink: Optional[Callable[[List[Dict[str, Any]]], None]]) -> None:
+    """Set the batch sink (e.g. Firestore) of ledgers created from now on"""
+    global _sink
+    _sink = sink
+
+def get_usage_ledger() -> Optional[UsageLedger]:
+    """Get the usage ledger of the current process, creating it on first use (None if disabled)"""
+    if not Config.USAGE_LEDGER_ENABLED:
+        return None
+    
+    pid = os.getpid()
+    ledger = _ledgers.get(pid)
+    if ledger is not None:
+        return ledger
+    
+    with _lock:
+        if pid not in _ledgers:
+            _ledgers.clear()
+            _ledgers[pid] = UsageLedger(
+                Config.USAGE_LEDGER_DIR,
+                sink=_sink,
+                flush_interval=Config.USAGE_LEDGER_FLUSH_SECONDS,
+                batch_size=Config.USAGE_LEDGER_BATCH_SIZE
+            )
+        return _ledgers[pid]
+
+def record_usage(usage: Optional[Dict[str, Any]], **extra) -> None:
+    """Record an upstream call in the ledger of this process, if enabled; never raises"""
+    if not usage:
+        return
+    try:
+        ledger = get_usage_ledger()
+        if ledger is not None:
+            ledger.record(usage, **extra)
+    except Exception as e:
+        logger.warning(f"Usage ledger record failed: {str(e)}")
+
+def summarize_usage(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Aggregate ledger records into totals, per-day totals and per-stage totals
+    
+    Args:
+        records: Ledger records with a datetime 'created_at'
+    
+    Returns:
+        Dict with 'total', 'by_day' (oldest first) and 'by_stage'; each
+        total has 'calls' (upstream calls), 'cached' (results served
+        without a call), 'errors' and the sums of TOTAL_FIELDS
+    """
+    def empty() -> Dict[str, Any]:
+        return dict({'calls': 0, 'cached': 0, 'errors': 0}, **{field: 0 for field in TOTAL_FIELDS})
+    
+    total = empty()
+    by_day: Dict[str, Dict[str, Any]] = {}
+    by_stage: Dict[str, Dict[str, Any]] = {}
+    for record in records:
+        day = record['created_at'].strftime('%Y-%m-%d')
+        for bucket in (total, by_day.setdefault(day, empty()), by_stage.setdefault(record.get('stage', 'unknown'), empty())):
+            if record.get('cache', 'miss') != 'miss':
+                bucket['cached'] += 1
+            else:
+                bucket['calls'] += 1
+            if record.get('error'):
+                bucket['errors'] += 1
+            for field in TOTAL_FIELDS:
+                bucket[field] += record.get(field) or 0
+    
+    for bucket in [total] + list(by_day.values()) + list(by_stage.values()):
+        bucket['latency_ms'] = round(bucket['latency_ms'], 1)
+        bucket['audio_seconds'] = round(bucket['audio_seconds'], 1)
+    
+    return {
+        'total': total,
+        'by_day': [dict(totals, date=day) for day, totals in sorted(by_day.items())],
+        'by_stage': by_stage
+    }
\ No newline at end of file
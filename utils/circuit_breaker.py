@@ -0,0 +1,210 @@
+"""
+Circuit breaker failing upstream calls fast while the upstream API is failing or too slow
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Tuple, Type
+
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+HALF_OPEN = 'half_open'
+OPEN = 'open'
+
+# Gauge values of the states, so /metrics can be graphed and alerted on
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+class CircuitOpenError(Exception):
+    """Raised instead of making a call while the circuit is open"""
+    
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit breaker over a sliding window of call outcomes
+    
+    While closed, calls pass and their outcomes are recorded. Once the
+    window holds at least min_calls outcomes and the share of failures
+    or of slow calls reaches its threshold, the circuit opens: calls are
+    rejected with CircuitOpenError without being made. After open_seconds
+    it half-opens and lets a few probe calls through; a successful,
+    fast probe closes it again and any other outcome reopens it.
+    """
+    
+    def __init__(self, name: str, failure_rate: float = 0.5, slow_call_ms: float = 20000,
+                 slow_call_rate: float = 0.8, min_calls: int = 10, window_seconds: float = 60,
+                 open_seconds: float = 30, half_open_max_calls: int = 1,
+                 failure_types: Tuple[Type[BaseException], ...] = (Exception,)):
+        """
+        Initialize the breaker
+        
+        Args:
+            name: Name used in metrics and logs
+            failure_rate: Share of failed calls (0-1) that opens the circuit
+            slow_call_ms: Calls taking at least this long count as slow
+            slow_call_rate: Share of slow calls (0-1) that opens the circuit
+            min_calls: Calls needed in the window before the rates are evaluated
+            window_seconds: Length of the sliding window of outcomes
+            open_seconds: Time the circuit stays open before probing
+            half_open_max_calls: Concurrent probe calls while half-open
+            failure_types: Exceptions counted as failures; others say nothing about upstream health
+        """
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call_ms = slow_call_ms
+        self.slow_call_rate = slow_call_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self.failure_types = failure_types
+        
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        # (monotonic time, failed, slow) per finished call while closed
+        self._outcomes = deque()
+        self._lock = threading.Lock()
+        metrics.set_gauge(f"circuit.{name}.state", STATE_VALUES[CLOSED])
+    
+    @property
+    def state(self) -> str:
+        """Current state, moving from open to half-open once the open period is over"""
+        with self._lock:
+            self._advance(time.monotonic())
+            return self._state
+    
+    def call(self, fn: Callable[[], Any]) -> Any:
+        """
+        Make a call through the breaker
+        
+        Args:
+            fn: Callable making the upstream call
+        
+        Returns:
+            Result of fn
+        
+        Raises:
+            CircuitOpenError: If the circuit is open (or half-open with all probes in flight)
+            Exception: Whatever fn raised
+        """
+        probe = self._admit()
+        started = time.monotonic()
+        try:
+            result = fn()
+        except self.failure_types:
+            self._record(probe, failed=True, latency_ms=(time.monotonic() - started) * 1000)
+            raise
+        except BaseException:
+            self._release(probe)
+            raise
+        self._record(probe, failed=False, latency_ms=(time.monotonic() - started) * 1000)
+        return result
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get the state and the failure and slow-call rates of the current window"""
+        with self._lock:
+            now = time.monotonic()
+            self._advance(now)
+            self._expire(now)
+            calls = len(self._outcomes)
+            failures = sum(1 for _, failed, _ in self._outcomes if failed)
+            slow = sum(1 for _, _, is_slow in self._outcomes if is_slow)
+            return {
+                'state': self._state,
+                'calls': calls,
+                'failure_rate': round(failures / calls, 3) if calls else 0.0,
+                'slow_call_rate': round(slow / calls, 3) if calls else 0.0,
+                'retry_after': round(self._retry_after(now), 1) if self._state == OPEN else 0.0,
+                'opened': metrics.counter(f"circuit.{self.name}.opened"),
+                'rejected': metrics.counter(f"circuit.{self.name}.rejected")
+            }
+    
+    def _admit(self) -> bool:
+        """Let a call through or raise CircuitOpenError; returns whether the call is a half-open probe"""
+        with self._lock:
+            now = time.monotonic()
+            self._advance(now)
+            if self._state == CLOSED:
+                return False
+            if self._state == HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                metrics.increment(f"circuit.{self.name}.probes")
+                return True
+            retry_after = self._retry_after(now)
+        
+        metrics.increment(f"circuit.{self.name}.rejected")
+        raise CircuitOpenError(f"{self.name} circuit is open, retry in {retry_after:.0f}s", retry_after=retry_after)
+    
+    def _record(self, probe: bool, failed: bool, latency_ms: float) -> None:
+        """Record the outcome of a call and change state if it crosses a threshold"""
+        slow = latency_ms >= self.slow_call_ms
+        with self._lock:
+            now = time.monotonic()
+            if probe:
+                self._probes -= 1
+                if failed or slow:
+                    self._transition(OPEN, now, f"probe {'failed' if failed else 'was slow'}")
+                else:
+                    self._transition(CLOSED, now, 'probe succeeded')
+                return
+            
+            # Late results of calls admitted before the circuit opened do not count
+            if self._state != CLOSED:
+                return
+            self._outcomes.append((now, failed, slow))
+            self._expire(now)
+            calls = len(self._outcomes)
+            if calls < self.min_calls:
+                return
+            
+            failures = sum(1 for _, was_failed, _ in self._outcomes if was_failed)
+            slow_calls = sum(1 for _, _, was_slow in self._outcomes if was_slow)
+            if failures / calls >= self.failure_rate:
+                self._transition(OPEN, now, f"{failures}/{calls} calls failed")
+            elif slow_calls / calls >= self.slow_call_rate:
+                self._transition(OPEN, now, f"{slow_calls}/{calls} calls took over {self.slow_call_ms:.0f}ms")
+    
+    def _release(self, probe: bool) -> None:
+        """Free the probe slot of a call that ended with an error not counted as a failure"""
+        if probe:
+            with self._lock:
+                self._probes -= 1
+    
+    def _advance(self, now: float) -> None:
+        """Half-open the circuit once the open period is over (lock must be held)"""
+        if self._state == OPEN and self._retry_after(now) <= 0:
+            self._transition(HALF_OPEN, now, f"open for {self.open_seconds:.0f}s")
+    
+    def _transition(self, state: str, now: float, reason: str) -> None:
+        """Move to a new state (lock must be held)"""
+        if state == self._state:
+            if state == OPEN:
+                self._opened_at = now
+            return
+        
+        logger.warning(f"Circuit {self.name} {self._state} -> {state}: {reason}")
+        self._state = state
+        if state == OPEN:
+            self._opened_at = now
+            metrics.increment(f"circuit.{self.name}.opened")
+        elif state == CLOSED:
+            self._outcomes.clear()
+        metrics.set_gauge(f"circuit.{self.name}.state", STATE_VALUES[state])
+    
+    def _retry_after(self, now: float) -> float:
+        """Seconds until an open circuit half-opens"""
+        return max(0.0, self._opened_at + self.open_seconds - now)
+    
+    def _expire(self, now: float) -> None:
+        """Drop outcomes older than the window (lock must be held)"""
+        cutoff = now - self.window_seconds
+        while self._outcomes and self._outcomes[0][0] < cutoff:
+            self._outcomes.popleft()
\ No newline at end of file
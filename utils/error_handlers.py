@@ -4,8 +4,11 @@ Error handling utilities for Flask application
 
 from flask import jsonify, request
 import logging
+import math
 from werkzeug.exceptions import HTTPException
 
+from utils.quota import QuotaExceededError
+
 logger = logging.getLogger(__name__)
 
 def register_error_handlers(app):
@@ -74,6 +77,19 @@ def register_error_handlers(app):
             'status_code': 429
         }), 429
     
+    @app.errorhandler(QuotaExceededError)
+    def quota_exceeded(error):
+        logger.warning(f"OpenAI quota exceeded: {request.url} - {str(error)}")
+        retry_after = max(1, math.ceil(error.retry_after))
+        response = jsonify({
+            'error': 'Rate Limit Exceeded',
+            'message': 'The AI service is at capacity. Please try again shortly',
+            'retry_after': retry_after,
+            'status_code': 429
+        })
+        response.headers['Retry-After'] = str(retry_after)
+        return response, 429
+    
     @app.errorhandler(500)
     def internal_server_error(error):
         logger.error(f"Internal server error: {request.url} - {str(error)}")
@@ -0,0 +1,155 @@
+"""
+Single-pass filler word and hesitation marker matching
+"""
+
+import json
+import logging
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+# Per-language lexicons: 'fillers' are scored by the analysis service,
+# 'hesitations' lower the transcription confidence estimate
+FILLER_LEXICONS = {
+    'en': {
+        'fillers': ['um', 'uh', 'like', 'you know', 'so', 'well', 'actually', 'basically', 'literally'],
+        'hesitations': ['um', 'uh']
+    },
+    'es': {
+        'fillers': ['eh', 'em', 'este', 'pues', 'o sea', 'bueno', 'como', 'entonces', 'en plan'],
+        'hesitations': ['eh', 'em']
+    },
+    'fr': {
+        'fillers': ['euh', 'ben', 'bah', 'genre', 'en fait', 'du coup', 'voilà', 'quoi'],
+        'hesitations': ['euh', 'hum']
+    },
+    'de': {
+        'fillers': ['äh', 'ähm', 'also', 'halt', 'eigentlich', 'sozusagen', 'quasi'],
+        'hesitations': ['äh', 'ähm']
+    }
+}
+
+# Transcript markers that are language independent
+UNCLEAR_MARKERS = ['[inaudible]', '[unclear]', '...']
+
+# Whisper reports language names rather than codes in verbose_json responses
+LANGUAGE_ALIASES = {
+    'english': 'en',
+    'spanish': 'es',
+    'french': 'fr',
+    'german': 'de'
+}
+
+class TermMatcher:
+    """Count occurrences of many terms with one precompiled, trie-shaped regex"""
+    
+    def __init__(self, terms: Iterable[str]):
+        """
+        Compile the matcher
+        
+        Word terms are folded into a single trie-shaped alternation wrapped in
+        one pair of word boundaries, so 'um' does not match inside 'umbrella'
+        and the regex engine never backtracks across sibling terms. Terms
+        with non-word edges (e.g. '...') are appended as plain alternatives.
+        
+        Args:
+            terms: Terms to count (matched case-insensitively)
+        """
+        self.terms = sorted({term.lower() for term in terms if term}, key=len, reverse=True)
+        
+        word_terms = [term for term in self.terms if re.match(r'\w', term) and re.search(r'\w$', term)]
+        other_terms = [term for term in self.terms if term not in word_terms]
+        
+        alternatives = []
+        if word_terms:
+            alternatives.append(r'\b' + _trie_pattern(word_terms) + r'\b')
+        alternatives.extend(_edge_pattern(term) for term in other_terms)
+        
+        self.pattern = re.compile('|'.join(alternatives) or r'(?!x)x')
+    
+    def count(self, text: str) -> Dict[str, int]:
+        """
+        Count every term in a single scan of the text
+        
+        Args:
+            text: Text to scan
+        
+        Returns:
+            Dict of term to occurrence count (terms that do not occur are omitted)
+        """
+        return dict(Counter(self.pattern.findall(text.lower())))
+    
+    def total(self, text: str) -> int:
+        """Total number of term occurrences in the text"""
+        return len(self.pattern.findall(text.lower()))
+
+def _trie_pattern(terms: List[str]) -> str:
+    """Build a regex alternation shaped like a prefix trie of the terms"""
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    
+    def build(node: Dict[str, Any]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return '(?:' + body + ')?' if '' in node else body
+    
+    return build(trie)
+
+def _edge_pattern(term: str) -> str:
+    """Regex for a term with a non-word edge, anchored on whichever edge is a word character"""
+    pattern = re.escape(term)
+    if re.match(r'\w', term):
+        pattern = r'\b' + pattern
+    if re.search(r'\w$', term):
+        pattern = pattern + r'\b'
+    return pattern
+
+def normalize_language(language: str) -> str:
+    """Map a language code or Whisper language name to a lexicon key (default 'en')"""
+    language = (language or 'en').strip().lower()
+    language = LANGUAGE_ALIASES.get(language, language)
+    return language if language in _load_lexicons() else 'en'
+
+@lru_cache(maxsize=None)
+def get_filler_matcher(language: str = 'en') -> TermMatcher:
+    """Get the (cached) filler word matcher for a language"""
+    return TermMatcher(_load_lexicons()[normalize_language(language)]['fillers'])
+
+@lru_cache(maxsize=None)
+def get_unclear_marker_matcher(language: str = 'en') -> TermMatcher:
+    """Get the (cached) matcher for unclear transcript markers and hesitations"""
+    lexicon = _load_lexicons()[normalize_language(language)]
+    return TermMatcher(UNCLEAR_MARKERS + lexicon['hesitations'])
+
+@lru_cache(maxsize=1)
+def _load_lexicons() -> Dict[str, Dict[str, List[str]]]:
+    """
+    Load the built-in lexicons, overridden by FILLER_LEXICON_PATH if set
+    
+    The override file is JSON of the same shape as FILLER_LEXICONS, e.g.
+    {"en": {"fillers": ["um", "uh", "kind of"]}}
+    """
+    lexicons = {language: dict(lexicon) for language, lexicon in FILLER_LEXICONS.items()}
+    
+    path = os.getenv('FILLER_LEXICON_PATH')
+    if path:
+        try:
+            with open(path) as lexicon_file:
+                overrides = json.load(lexicon_file)
+            for language, lexicon in overrides.items():
+                merged = lexicons.setdefault(language, {'fillers': [], 'hesitations': []})
+                merged.update(lexicon)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load filler lexicon overrides from {path}: {str(e)}")
+    
+    return lexicons
\ No newline at end of file
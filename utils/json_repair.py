@@ -0,0 +1,101 @@
+"""
+Extraction and cheap repair of JSON objects in model completions
+"""
+
+import json
+from typing import Any, List, Optional, Tuple
+
+CLOSERS = {'{': '}', '[': ']'}
+
+def extract_json_object(text: str) -> Tuple[Optional[Any], bool]:
+    """
+    Decode the first JSON object in a completion, repairing it if truncated
+    
+    Text before the opening brace (e.g. a markdown fence or a preamble) and
+    after the matching closing brace is ignored.
+    
+    Args:
+        text: Completion text
+    
+    Returns:
+        Tuple of the decoded object (None if nothing could be decoded) and
+        whether a repair was needed
+    """
+    start = text.find('{')
+    if start == -1:
+        return None, False
+    
+    try:
+        value, _ = json.JSONDecoder().raw_decode(text, start)
+        return value, False
+    except ValueError:
+        pass
+    
+    for candidate in repair_candidates(text[start:]):
+        try:
+            return json.loads(candidate), True
+        except ValueError:
+            continue
+    return None, False
+
+def repair_candidates(text: str) -> List[str]:
+    """
+    Build closed variants of a truncated JSON object, cheapest first
+    
+    The first candidate closes an open string and every open bracket where
+    the text stops. The second cuts back to the last complete member and
+    closes the brackets open at that point, dropping a half-written key or
+    value.
+    
+    Args:
+        text: JSON text starting at its opening brace
+    
+    Returns:
+        List of candidate JSON strings (possibly empty)
+    """
+    stack = []
+    in_string = False
+    escape = False
+    last_complete = None
+    
+    for index, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+        
+        if char == '"':
+            in_string = True
+        elif char in CLOSERS:
+            stack.append(CLOSERS[char])
+        elif char in '}]':
+            if not stack:
+                break
+            stack.pop()
+            if not stack:
+                # The object is complete; whatever follows is not part of it
+                return [text[:index + 1]]
+            last_complete = (index + 1, list(stack))
+        elif char == ',':
+            last_complete = (index, list(stack))
+    
+    candidates = []
+    
+    tail = text.rstrip()
+    if escape:
+        tail = tail[:-1]
+    if in_string:
+        tail += '"'
+    tail = tail.rstrip().rstrip(',')
+    if not tail.endswith(':'):
+        candidates.append(tail + ''.join(reversed(stack)))
+    
+    if last_complete is not None:
+        end, open_brackets = last_complete
+        candidates.append(text[:end].rstrip().rstrip(',') + ''.join(reversed(open_brackets)))
+    
+    return candidates
\ No newline at end of file
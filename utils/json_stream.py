@@ -0,0 +1,90 @@
+"""
+Incremental parsing of JSON objects streamed token by token
+"""
+
+import json
+from typing import Any, Dict, List, Tuple
+
+class IncrementalObjectParser:
+    """Emit the top-level members of a streamed JSON object as soon as each one completes"""
+    
+    def __init__(self):
+        """Initialize an empty parser"""
+        self.result: Dict[str, Any] = {}
+        self._buffer: List[str] = []
+        self._depth = 0
+        self._started = False
+        self._in_string = False
+        self._escape = False
+    
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Feed the next chunk of streamed text
+        
+        Text before the opening brace (e.g. a markdown fence) is ignored.
+        
+        Args:
+            chunk: Next piece of the completion
+        
+        Returns:
+            List of (key, value) pairs for members completed by this chunk
+        """
+        completed = []
+        
+        for char in chunk:
+            if not self._started:
+                if char == '{':
+                    self._started = True
+                    self._depth = 1
+                continue
+            
+            if self._depth == 0:
+                continue
+            
+            if self._in_string:
+                self._buffer.append(char)
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            
+            if char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._flush(completed)
+                    continue
+            elif char == ',' and self._depth == 1:
+                self._flush(completed)
+                continue
+            
+            self._buffer.append(char)
+        
+        return completed
+    
+    @property
+    def finished(self) -> bool:
+        """True once the closing brace of the top-level object was seen"""
+        return self._started and self._depth == 0
+    
+    def _flush(self, completed: List[Tuple[str, Any]]) -> None:
+        """Parse the buffered member text and record it if valid"""
+        member_text = ''.join(self._buffer).strip()
+        self._buffer = []
+        if not member_text:
+            return
+        
+        try:
+            member = json.loads('{' + member_text + '}')
+        except ValueError:
+            return
+        
+        for key, value in member.items():
+            self.result[key] = value
+            completed.append((key, value))
\ No newline at end of file
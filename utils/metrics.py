@@ -0,0 +1,105 @@
+"""
+In-process metrics registry for counters and latency percentiles
+"""
+
+import threading
+from collections import defaultdict, deque
+from typing import Dict, Any, Optional
+
+class MetricsRegistry:
+    def __init__(self, window_size: int = 1000):
+        """
+        Initialize the registry
+        
+        Args:
+            window_size: Number of recent observations kept per timing series
+        """
+        self._lock = threading.Lock()
+        self._window_size = window_size
+        self._counters = defaultdict(int)
+        self._timings = {}
+        self._gauges = {}
+    
+    def increment(self, name: str, value: float = 1) -> None:
+        """Increment a counter by value"""
+        with self._lock:
+            self._counters[name] += value
+    
+    def observe(self, name: str, value: float) -> None:
+        """Record one observation (e.g. a latency in ms) for a timing series"""
+        with self._lock:
+            series = self._timings.get(name)
+            if series is None:
+                series = self._timings[name] = deque(maxlen=self._window_size)
+            series.append(value)
+    
+    def set_gauge(self, name: str, value: Any) -> None:
+        """Set a point-in-time value"""
+        with self._lock:
+            self._gauges[name] = value
+    
+    def counter(self, name: str) -> float:
+        """Get the current value of a counter"""
+        with self._lock:
+            return self._counters.get(name, 0)
+    
+    def percentile(self, name: str, pct: float) -> Optional[float]:
+        """
+        Get a percentile of the recent observations for a timing series
+        
+        Args:
+            name: Timing series name
+            pct: Percentile between 0 and 100
+        
+        Returns:
+            Percentile value or None if nothing was observed yet
+        """
+        with self._lock:
+            values = sorted(self._timings.get(name, ()))
+        return self._percentile(values, pct)
+    
+    def mean(self, name: str) -> Optional[float]:
+        """Get the mean of the recent observations for a timing series, or None if empty"""
+        with self._lock:
+            values = list(self._timings.get(name, ()))
+        return sum(values) / len(values) if values else None
+    
+    def count(self, name: str) -> int:
+        """Get the number of recent observations kept for a timing series"""
+        with self._lock:
+            return len(self._timings.get(name, ()))
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Return counters, gauges and timing summaries as plain dicts"""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            timings = {name: sorted(series) for name, series in self._timings.items()}
+        
+        summaries = {}
+        for name, values in timings.items():
+            if not values:
+                continue
+            summaries[name] = {
+                'count': len(values),
+                'mean': round(sum(values) / len(values), 1),
+                'p50': round(self._percentile(values, 50), 1),
+                'p95': round(self._percentile(values, 95), 1),
+                'p99': round(self._percentile(values, 99), 1)
+            }
+        
+        return {
+            'counters': counters,
+            'gauges': gauges,
+            'timings': summaries
+        }
+    
+    def _percentile(self, values, pct: float) -> Optional[float]:
+        """Nearest-rank percentile of an already sorted list"""
+        if not values:
+            return None
+        index = min(len(values) - 1, max(0, int(round(pct / 100 * len(values))) - 1))
+        return values[index]
+
+# Shared registry for the whole process
+metrics = MetricsRegistry()
\ No newline at end of file
@@ -0,0 +1,250 @@
+"""
+Token-bucket admission control for OpenAI requests-per-minute and tokens-per-minute quotas
+"""
+
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class QuotaExceededError(Exception):
+    """Raised when a call cannot be admitted within its deadline; answered with HTTP 429"""
+    
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def refill(tokens: float, updated_at: float, capacity: float, now: float) -> float:
+    """Level of a per-minute bucket after refilling it at capacity / 60 per second"""
+    return min(capacity, tokens + max(now - updated_at, 0) * capacity / 60)
+
+def shortfall_seconds(level: float, capacity: float, amount: float) -> float:
+    """Seconds until a per-minute bucket holds amount, or 0 if it already does"""
+    return max(amount - level, 0) / (capacity / 60)
+
+class MemoryBucketStore:
+    """In-process bucket state (each worker enforces the full quota on its own)"""
+    
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+    
+    def take(self, demands: Dict[str, Tuple[float, float]]) -> float:
+        """
+        Take from several buckets at once, or from none of them
+        
+        Args:
+            demands: Bucket key -> (capacity per minute, amount to take)
+        
+        Returns:
+            0 if everything was taken, else seconds until it would fit
+        """
+        with self._lock:
+            now = time.time()
+            levels = {
+                key: refill(*self._buckets.get(key, (capacity, now)), capacity, now)
+                for key, (capacity, _) in demands.items()
+            }
+            wait = max(shortfall_seconds(levels[key], capacity, amount) for key, (capacity, amount) in demands.items())
+            if wait > 0:
+                return wait
+            for key, (_, amount) in demands.items():
+                self._buckets[key] = (levels[key] - amount, now)
+            return 0.0
+
+class SQLiteBucketStore:
+    """On-disk bucket state shared between gunicorn workers"""
+    
+    def __init__(self, path: str):
+        """
+        Initialize the store and create the buckets table if needed
+        
+        Args:
+            path: Path of the SQLite database file
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        with self._transaction() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS quota_buckets '
+                '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)'
+            )
+    
+    def take(self, demands: Dict[str, Tuple[float, float]]) -> float:
+        """Take from several buckets at once, or from none of them (see MemoryBucketStore.take)"""
+        with self._transaction() as conn:
+            now = time.time()
+            levels = {}
+            for key, (capacity, _) in demands.items():
+                row = conn.execute('SELECT tokens, updated_at FROM quota_buckets WHERE key = ?', (key,)).fetchone()
+                levels[key] = refill(*(row or (capacity, now)), capacity, now)
+            
+            wait = max(shortfall_seconds(levels[key], capacity, amount) for key, (capacity, amount) in demands.items())
+            if wait > 0:
+                return wait
+            conn.executemany(
+                'INSERT OR REPLACE INTO quota_buckets (key, tokens, updated_at) VALUES (?, ?, ?)',
+                [(key, levels[key] - amount, now) for key, (_, amount) in demands.items()]
+            )
+            return 0.0
+    
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Open a short-lived connection holding the write lock, so read-modify-write is atomic across workers"""
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+
+class QuotaGovernor:
+    """
+    Admit OpenAI calls only while the per-model RPM and TPM buckets allow it
+    
+    A call takes one request and its token estimate (prompt plus max_tokens,
+    which is what OpenAI counts against TPM when the request arrives). If
+    the buckets are short, the call waits until they refill, unless that
+    would take longer than its deadline, in which case it is rejected with
+    QuotaExceededError instead of being sent only to come back as a 429.
+    """
+    
+    def __init__(self, store, rpm: int = 0, tpm: int = 0,
+                 model_limits: Optional[Dict[str, Tuple[int, int]]] = None, max_wait: float = 10):
+        """
+        Initialize the governor
+        
+        Args:
+            store: MemoryBucketStore or SQLiteBucketStore
+            rpm: Requests per minute per model (0 for no limit)
+            tpm: Tokens per minute per model (0 for no limit)
+            model_limits: Optional (rpm, tpm) overrides per model name
+            max_wait: Longest time a call may queue for quota, in seconds
+        """
+        self.store = store
+        self.rpm = rpm
+        self.tpm = tpm
+        self.model_limits = model_limits or {}
+        self.max_wait = max_wait
+    
+    def limits(self, model: str) -> Tuple[int, int]:
+        """RPM and TPM limits of a model"""
+        return self.model_limits.get(model, (self.rpm, self.tpm))
+    
+    def acquire(self, model: str, tokens: int = 0, max_wait: Optional[float] = None) -> float:
+        """
+        Wait until a call to model fits the quota and take its share
+        
+        Args:
+            model: OpenAI model name
+            tokens: Estimated tokens of the call (prompt plus max_tokens)
+            max_wait: Deadline for this call in seconds (capped by the governor's max_wait)
+        
+        Returns:
+            Seconds spent waiting
+        
+        Raises:
+            QuotaExceededError: If the quota will not allow the call before the deadline
+        """
+        rpm, tpm = self.limits(model)
+        demands = {}
+        if rpm:
+            demands[f"rpm:{model}"] = (rpm, 1)
+        if tpm and tokens:
+            # A call larger than the whole bucket could never fit; let it take everything instead
+            demands[f"tpm:{model}"] = (tpm, min(tokens, tpm))
+        if not demands:
+            return 0.0
+        
+        max_wait = self.max_wait if max_wait is None else min(max_wait, self.max_wait)
+        started = time.monotonic()
+        queued = False
+        while True:
+            wait = self._take(demands)
+            waited = time.monotonic() - started
+            if wait <= 0:
+                metrics.increment('quota.admitted')
+                if queued:
+                    metrics.increment('quota.waits')
+                    metrics.observe('quota.wait_ms', waited * 1000)
+                return waited
+            
+            if waited + wait > max_wait:
+                metrics.increment('quota.rejected')
+                metrics.increment(f"quota.{model}.rejected")
+                raise QuotaExceededError(f"OpenAI quota for {model} exhausted, retry in {wait:.1f}s", retry_after=wait)
+            
+            # Jitter spreads out waiters (in every worker) woken by the same refill
+            queued = True
+            time.sleep(wait + random.uniform(0, min(wait, 0.05)))
+    
+    def _take(self, demands: Dict[str, Tuple[float, float]]) -> float:
+        """Take from the store, admitting the call if the store is unavailable"""
+        try:
+            return self.store.take(demands)
+        except sqlite3.Error as e:
+            logger.warning(f"Quota store unavailable, admitting call: {str(e)}")
+            metrics.increment('quota.store_errors')
+            return 0.0
+
+def parse_model_limits(spec: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Parse per-model limits of the form 'gpt-4=500:10000,whisper-1=50:0'
+    
+    Args:
+        spec: Comma-separated model=rpm:tpm entries
+    
+    Returns:
+        Dict of model name to (rpm, tpm)
+    """
+    limits = {}
+    for entry in filter(None, (part.strip() for part in (spec or '').split(','))):
+        try:
+            model, values = entry.split('=', 1)
+            rpm, tpm = values.split(':', 1)
+            limits[model.strip()] = (int(rpm), int(tpm))
+        except ValueError:
+            logger.warning(f"Ignoring malformed model quota: {entry}")
+    return limits
+
+def create_quota_governor(storage_url: str, rpm: int = 0, tpm: int = 0, model_limits: str = '',
+                          max_wait: float = 10) -> QuotaGovernor:
+    """
+    Create a quota governor with the store named by storage_url
+    
+    Args:
+        storage_url: 'memory://' (per worker) or 'sqlite:///path' (shared by all workers)
+        rpm: Requests per minute per model (0 for no limit)
+        tpm: Tokens per minute per model (0 for no limit)
+        model_limits: Per-model overrides, see parse_model_limits
+        max_wait: Longest time a call may queue for quota, in seconds
+    
+    Returns:
+        Configured QuotaGovernor
+    """
+    store = MemoryBucketStore()
+    if storage_url and storage_url.startswith('sqlite:///'):
+        try:
+            store = SQLiteBucketStore(storage_url[len('sqlite:///'):])
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"Shared quota store unavailable, enforcing quotas per worker: {str(e)}")
+    elif storage_url and storage_url != 'memory://':
+        logger.warning(f"Unsupported quota storage '{storage_url.split('://')[0]}', enforcing quotas per worker")
+    
+    return QuotaGovernor(store, rpm=rpm, tpm=tpm, model_limits=parse_model_limits(model_limits), max_wait=max_wait)
\ No newline at end of file
@@ -0,0 +1,215 @@
+"""
+Deadlines, retries with backoff, a shared retry budget and request hedging for upstream API calls
+"""
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Optional
+
+import openai
+
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Errors worth another attempt: timeouts, dropped connections, 429 and 5xx
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError
+)
+
+class DeadlineExceededError(Exception):
+    """Raised when a call did not succeed before its deadline"""
+
+class RetryBudget:
+    """
+    Process-wide cap on retries and hedges relative to first attempts
+    
+    Over a sliding window, extra attempts may not exceed ratio times the
+    number of first attempts (plus a small floor), so an upstream outage
+    cannot be amplified into a retry storm.
+    """
+    
+    def __init__(self, ratio: float = 0.1, min_per_window: int = 10, window_seconds: float = 10):
+        """
+        Initialize the budget
+        
+        Args:
+            ratio: Allowed extra attempts per first attempt
+            min_per_window: Extra attempts always allowed per window
+            window_seconds: Length of the sliding window
+        """
+        self.ratio = ratio
+        self.min_per_window = min_per_window
+        self.window_seconds = window_seconds
+        self._requests = deque()
+        self._extra = deque()
+        self._lock = threading.Lock()
+    
+    def record_request(self) -> None:
+        """Record a first attempt"""
+        with self._lock:
+            self._requests.append(time.monotonic())
+    
+    def try_spend(self) -> bool:
+        """Take one extra attempt from the budget if available"""
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            if len(self._extra) >= self.min_per_window + self.ratio * len(self._requests):
+                return False
+            self._extra.append(now)
+            return True
+    
+    def _expire(self, now: float) -> None:
+        """Drop events older than the window"""
+        cutoff = now - self.window_seconds
+        for events in (self._requests, self._extra):
+            while events and events[0] < cutoff:
+                events.popleft()
+
+class ResilientCaller:
+    """Run upstream calls with a deadline, backoff retries and optional hedging"""
+    
+    def __init__(self, name: str, budget: RetryBudget, max_retries: int = 2, base_delay: float = 0.5,
+                 max_delay: float = 8, hedge: bool = False, hedge_percentile: float = 90,
+                 hedge_min_samples: int = 20):
+        """
+        Initialize the caller
+        
+        Args:
+            name: Name used as the metrics prefix
+            budget: Retry budget shared with other callers
+            max_retries: Retries after the first attempt
+            base_delay: Backoff base in seconds (doubled per retry, full jitter)
+            max_delay: Backoff cap in seconds
+            hedge: Send a second request once the first is slower than the hedge percentile
+            hedge_percentile: Latency percentile after which a hedge is sent
+            hedge_min_samples: Latency observations needed before hedging starts
+        """
+        self.name = name
+        self.budget = budget
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix=f"hedge-{name}") if hedge else None
+    
+    def call(self, fn: Callable[[float], Any], deadline: float, hedge: Optional[bool] = None) -> Any:
+        """
+        Call fn until it succeeds, fails permanently or the deadline passes
+        
+        Args:
+            fn: Callable taking the per-attempt timeout in seconds
+            deadline: Seconds the whole call (all attempts and backoff) may take
+            hedge: Override hedging for this call (e.g. off for streams)
+        
+        Returns:
+            Result of fn
+        
+        Raises:
+            DeadlineExceededError: If no attempt succeeded before the deadline
+            Exception: The last error if it is not retryable or retries are exhausted
+        """
+        started = time.monotonic()
+        expires_at = started + deadline
+        hedge = self.hedge if hedge is None else hedge
+        self.budget.record_request()
+        
+        attempt = 0
+        while True:
+            remaining = expires_at - time.monotonic()
+            if remaining <= 0:
+                metrics.increment(f"resilience.{self.name}.deadline_exceeded")
+                raise DeadlineExceededError(f"{self.name} call exceeded its {deadline:.0f}s deadline")
+            
+            attempt_started = time.monotonic()
+            try:
+                if hedge and self.executor is not None:
+                    result = self._hedged(fn, remaining)
+                else:
+                    result = fn(remaining)
+                metrics.observe(f"resilience.{self.name}.latency_ms", (time.monotonic() - attempt_started) * 1000)
+                return result
+            
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                if not self.budget.try_spend():
+                    metrics.increment(f"resilience.{self.name}.budget_exhausted")
+                    raise
+                
+                delay = self._backoff(attempt, e)
+                if time.monotonic() + delay >= expires_at:
+                    metrics.increment(f"resilience.{self.name}.deadline_exceeded")
+                    raise DeadlineExceededError(
+                        f"{self.name} call cannot be retried within its {deadline:.0f}s deadline: {str(e)}"
+                    )
+                
+                attempt += 1
+                metrics.increment(f"resilience.{self.name}.retries")
+                logger.warning(f"{self.name} attempt {attempt} failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+    
+    def _hedged(self, fn: Callable[[float], Any], remaining: float) -> Any:
+        """Run fn, sending a second copy if the first is slower than the hedge percentile"""
+        hedge_after = self._hedge_delay()
+        primary = self.executor.submit(fn, remaining)
+        if hedge_after is None or hedge_after >= remaining:
+            return primary.result()
+        
+        done, _ = wait([primary], timeout=hedge_after)
+        if done or not self.budget.try_spend():
+            return primary.result()
+        
+        metrics.increment(f"resilience.{self.name}.hedges")
+        secondary = self.executor.submit(fn, remaining - hedge_after)
+        pending = {primary, secondary}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is secondary:
+                        metrics.increment(f"resilience.{self.name}.hedge_wins")
+                    # The slower request cannot be aborted; it finishes in the background
+                    return future.result()
+                error = future.exception()
+        raise error
+    
+    def _hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None until enough latencies were observed"""
+        series = f"resilience.{self.name}.latency_ms"
+        if metrics.count(series) < self.hedge_min_samples:
+            return None
+        return metrics.percentile(series, self.hedge_percentile) / 1000
+    
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Full-jitter exponential backoff, never shorter than the server's Retry-After"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(delay, retry_after_seconds(error) or 0)
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read the Retry-After (or retry-after-ms) header from an API error response"""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    
+    headers = response.headers
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        if headers.get('retry-after'):
+            return float(headers['retry-after'])
+    except ValueError:
+        # HTTP-date form is not used by the OpenAI API
+        return None
+    return None
\ No newline at end of file
@@ -0,0 +1,130 @@
+"""
+Coalescing of identical concurrent calls, within a process and across worker processes
+"""
+
+import copy
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows: cross-process locking is disabled
+    fcntl = None
+
+class SingleFlight:
+    """Run a callable once per key while concurrent callers with the same key wait for its result"""
+    
+    def __init__(self):
+        """Initialize an empty in-flight registry"""
+        self._calls = {}
+        self._lock = threading.Lock()
+    
+    def do(self, key: str, fn: Callable[[], Any], timeout: Optional[float] = None) -> Tuple[Any, bool]:
+        """
+        Call fn, or wait for the identical call already in flight
+        
+        Every caller receives its own deep copy of the result, so callers may
+        mutate it freely. An exception raised by fn is raised for every caller.
+        
+        Args:
+            key: Identity of the call
+            fn: Callable to run if no call with this key is in flight
+            timeout: Seconds a waiting caller waits before concurrent.futures.TimeoutError
+        
+        Returns:
+            Tuple of the result and whether it was shared from another caller's call
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+        
+        if leader:
+            try:
+                future.set_result(fn())
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    del self._calls[key]
+        
+        return copy.deepcopy(future.result(timeout)), not leader
+    
+    def in_flight(self) -> int:
+        """Number of distinct calls currently running"""
+        with self._lock:
+            return len(self._calls)
+
+class StripedFileLock:
+    """
+    Cross-process mutual exclusion per key using a fixed set of lock files
+    
+    Keys are hashed onto a bounded number of stripes so lock files never
+    need to be deleted (deleting a lock file another process is waiting on
+    breaks mutual exclusion). Unrelated keys sharing a stripe are merely
+    serialized.
+    """
+    
+    def __init__(self, directory: str, stripes: int = 256, poll_interval: float = 0.05):
+        """
+        Initialize the lock set
+        
+        Args:
+            directory: Directory holding the lock files (created if missing)
+            stripes: Number of lock files
+            poll_interval: Seconds between attempts while waiting for a lock
+        """
+        self.directory = directory
+        self.stripes = stripes
+        self.poll_interval = poll_interval
+        os.makedirs(directory, exist_ok=True)
+    
+    @contextmanager
+    def hold(self, key: str, timeout: float) -> Iterator[bool]:
+        """
+        Hold the lock for a key
+        
+        If the lock cannot be taken within the timeout the block runs
+        anyway, unlocked, so a stuck worker never blocks the others.
+        
+        Args:
+            key: Identity of the call
+            timeout: Maximum seconds to wait for the lock
+        
+        Yields:
+            True if another process held the lock and we had to wait for it
+        """
+        if fcntl is None:
+            yield False
+            return
+        
+        stripe = int(hashlib.sha1(key.encode('utf-8')).hexdigest(), 16) % self.stripes
+        path = os.path.join(self.directory, f"singleflight-{stripe:03d}.lock")
+        
+        with open(path, 'a') as lock_file:
+            waited = False
+            acquired = False
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    acquired = True
+                    break
+                except BlockingIOError:
+                    waited = True
+                    if time.monotonic() >= deadline:
+                        break
+                    time.sleep(self.poll_interval)
+            
+            try:
+                yield waited
+            finally:
+                if acquired:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
\ No newline at end of file
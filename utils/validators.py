@@ -2,9 +2,12 @@
 Input validation utilities
 """
 
+import ipaddress
 import os
+import socket
+from urllib.parse import urlparse
 from werkzeug.datastructures import FileStorage
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Sequence
 
 def validate_audio_file(file: FileStorage) -> bool:
     """
@@ -37,12 +40,13 @@ def validate_audio_file(file: FileStorage) -> bool:
     
     return True
 
-def validate_text_input(data: Optional[Dict[str, Any]]) -> bool:
+def validate_text_input(data: Optional[Dict[str, Any]], max_length: int = 5000) -> bool:
     """
     Validate text input for analysis
     
     Args:
         data: Request JSON data
+        max_length: Maximum length of the text in characters
         
     Returns:
         True if valid, False otherwise
@@ -55,8 +59,8 @@ def validate_text_input(data: Optional[Dict[str, Any]]) -> bool:
     if not text or len(text) < 10:
         return False
     
-    # Check text length (max 5000 characters)
-    if len(text) > 5000:
+    # Check text length (max 5000 characters unless long-form answers are accepted)
+    if len(text) > max_length:
         return False
     
     # Validate optional fields
@@ -110,6 +114,57 @@ def validate_fcm_token(token: Optional[str]) -> bool:
     
     return True
 
+def validate_callback_url(url: Optional[str], allowed_hosts: Sequence[str] = ()) -> bool:
+    """
+    Validate a job callback (webhook) URL
+    
+    The host must be in allowed_hosts if any are configured; otherwise
+    every address it resolves to must be public, so callbacks cannot
+    reach loopback, private, link-local (cloud metadata) or reserved
+    addresses.
+    
+    Args:
+        url: Callback URL
+        allowed_hosts: Host names callbacks are restricted to (empty for any public host)
+        
+    Returns:
+        True if valid, False otherwise
+    """
+    if not url or not isinstance(url, str) or len(url) > 2048:
+        return False
+    
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        return False
+    return is_allowed_callback_host(parsed.hostname, allowed_hosts)
+
+def is_allowed_callback_host(host: str, allowed_hosts: Sequence[str] = ()) -> bool:
+    """
+    Check whether job callbacks may be sent to a host
+    
+    Args:
+        host: Host name or IP address
+        allowed_hosts: Host names callbacks are restricted to (empty for any public host)
+        
+    Returns:
+        True if the host is allowlisted, or resolves only to public addresses
+    """
+    if allowed_hosts:
+        return host.lower() in allowed_hosts
+    
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+    except (socket.gaierror, UnicodeError):
+        return False
+    return bool(addresses) and all(_is_public_address(address) for address in addresses)
+
+def _is_public_address(address: str) -> bool:
+    """Whether an IP address is globally routable (not loopback, private, link-local or reserved)"""
+    ip = ipaddress.ip_address(address.split('%')[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
 def validate_date_range(start_date: Optional[str], end_date: Optional[str]) -> bool:
     """
     Validate date range parameters